@@ -1,5 +1,6 @@
 # FastAPI 应用入口
 
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -7,7 +8,16 @@ from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
 from .routers import register_routers
 from .database import init_db, close_db
-from .services import close_vector_db, close_redis_service, close_supabase
+from .services import (
+    get_ai_service,
+    close_vector_db,
+    close_redis_service,
+    close_url_fetcher,
+    close_supabase,
+    run_similarity_graph_job,
+    run_inbox_workers,
+    run_inbox_reaper,
+)
 
 
 @asynccontextmanager
@@ -16,13 +26,30 @@ async def lifespan(app: FastAPI):
     # 启动时初始化数据库
     await init_db()
 
+    # 后台任务
+    background_tasks = []
+    if settings.similarity_graph_refresh_interval > 0:
+        background_tasks.append(
+            asyncio.create_task(run_similarity_graph_job(settings.similarity_graph_refresh_interval))
+        )
+    if settings.inbox_workers > 0:
+        background_tasks.append(
+            asyncio.create_task(run_inbox_workers(settings.inbox_workers, settings.inbox_poll_interval))
+        )
+    if settings.inbox_cleanup_interval > 0:
+        background_tasks.append(asyncio.create_task(run_inbox_reaper(settings.inbox_cleanup_interval)))
+
     yield
 
     # 关闭时清理资源
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
     await close_db()
     await close_supabase()
     await close_vector_db()
     await close_redis_service()
+    await close_url_fetcher()
 
 
 def create_app() -> FastAPI:
@@ -51,6 +78,11 @@ def create_app() -> FastAPI:
         """健康检查端点"""
         return {"status": "ok"}
 
+    @app.get("/health/ai")
+    async def ai_health_check():
+        """AI 调用指标：并发、重试、熔断状态、token 用量、缓存命中"""
+        return get_ai_service().metrics()
+
     return app
 
 
@@ -0,0 +1,156 @@
+# 文本字段压缩存储
+# zstd 压缩 + 共享训练字典，用于收集箱原始内容等大段文本（bytea 列）
+
+import logging
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+
+import zstandard
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# zstd 帧的魔数（小端 0xFD2FB528）；UTF-8 文本不可能以该序列开头（0xB5 是续字节），
+# 因此可以和未压缩的旧数据、短文本共存于同一列
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+DICTIONARY_SUFFIX = ".dict"
+
+
+class ContentCompressor:
+    """
+    文本压缩器
+
+    - 压缩：UTF-8 编码后用当前字典压缩；短于 min_size 或压缩后没有变小的文本原样保存
+    - 解压：按 zstd 帧头中的字典 ID 选择字典，非 zstd 帧按 UTF-8 文本读取
+    - 字典：dictionary_dir 下的 {dict_id}.dict，最新训练的为当前字典；
+      旧字典保留用于解压旧数据，多进程部署时该目录需共享
+    """
+
+    def __init__(
+        self,
+        dictionary_dir: Optional[str] = None,
+        level: int = 3,
+        min_size: int = 64,
+        enabled: bool = True,
+    ):
+        self.dictionary_dir = Path(dictionary_dir) if dictionary_dir else None
+        self.level = level
+        self.min_size = min_size
+        self.enabled = enabled
+        self._dictionaries: dict[int, zstandard.ZstdCompressionDict] = {}
+        self._decompressors: dict[int, zstandard.ZstdDecompressor] = {}
+        self._dictionary: Optional[zstandard.ZstdCompressionDict] = None
+        self._compressor = zstandard.ZstdCompressor(level=level)
+
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+        self._load_dictionaries()
+
+    @property
+    def dictionary_id(self) -> int:
+        """当前字典 ID，0 表示未使用字典"""
+        return self._dictionary.dict_id() if self._dictionary is not None else 0
+
+    @property
+    def dictionary(self) -> Optional[zstandard.ZstdCompressionDict]:
+        """当前字典，未使用字典时为 None"""
+        return self._dictionary
+
+    def compress(self, text: str) -> bytes:
+        data = text.encode("utf-8")
+        self.raw_bytes += len(data)
+        if self.enabled and len(data) >= self.min_size:
+            compressed = self._compressor.compress(data)
+            if len(compressed) < len(data):
+                data = compressed
+        self.stored_bytes += len(data)
+        return data
+
+    def decompress(self, data: bytes) -> str:
+        data = bytes(data)
+        if not data.startswith(ZSTD_MAGIC):
+            return data.decode("utf-8")
+        dict_id = zstandard.get_frame_parameters(data).dict_id
+        return self._decompressor(dict_id).decompress(data).decode("utf-8")
+
+    def train(self, samples: Iterable[str], dict_size: int = 112640) -> int:
+        """
+        用样本训练新字典并设为当前字典
+
+        Returns:
+            新字典 ID
+        """
+        dictionary = zstandard.train_dictionary(
+            dict_size,
+            [sample.encode("utf-8") for sample in samples if sample],
+            level=self.level,
+        )
+        if self.dictionary_dir is not None:
+            self.dictionary_dir.mkdir(parents=True, exist_ok=True)
+            path = self.dictionary_dir / f"{dictionary.dict_id()}{DICTIONARY_SUFFIX}"
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(dictionary.as_bytes())
+            os.replace(tmp_path, path)
+        self._use(dictionary)
+        return dictionary.dict_id()
+
+    def stats(self) -> dict:
+        return {
+            "dictionary_id": self.dictionary_id,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "ratio": self.raw_bytes / self.stored_bytes if self.stored_bytes else 0.0,
+        }
+
+    # ========== 内部方法 ==========
+
+    def _load_dictionaries(self) -> None:
+        if self.dictionary_dir is None or not self.dictionary_dir.is_dir():
+            return
+        paths = sorted(self.dictionary_dir.glob(f"*{DICTIONARY_SUFFIX}"), key=lambda path: path.stat().st_mtime)
+        dictionary = None
+        for path in paths:
+            dictionary = zstandard.ZstdCompressionDict(path.read_bytes())
+            self._dictionaries[dictionary.dict_id()] = dictionary
+        if dictionary is not None:
+            self._use(dictionary)
+            logger.info(
+                "Loaded %d compression dictionaries, current id %d", len(paths), self.dictionary_id
+            )
+
+    def _use(self, dictionary: zstandard.ZstdCompressionDict) -> None:
+        self._dictionaries[dictionary.dict_id()] = dictionary
+        self._dictionary = dictionary
+        self._compressor = zstandard.ZstdCompressor(level=self.level, dict_data=dictionary)
+
+    def _decompressor(self, dict_id: int) -> zstandard.ZstdDecompressor:
+        decompressor = self._decompressors.get(dict_id)
+        if decompressor is None:
+            if dict_id == 0:
+                decompressor = zstandard.ZstdDecompressor()
+            elif dict_id in self._dictionaries:
+                decompressor = zstandard.ZstdDecompressor(dict_data=self._dictionaries[dict_id])
+            else:
+                # 其他进程刚训练的字典
+                self._load_dictionaries()
+                if dict_id not in self._dictionaries:
+                    raise ValueError(f"Compression dictionary {dict_id} not found")
+                decompressor = zstandard.ZstdDecompressor(dict_data=self._dictionaries[dict_id])
+            self._decompressors[dict_id] = decompressor
+        return decompressor
+
+
+@lru_cache
+def get_content_compressor() -> ContentCompressor:
+    """获取文本压缩器单例"""
+    return ContentCompressor(
+        dictionary_dir=settings.inbox_compression_dictionary_dir or None,
+        level=settings.inbox_compression_level,
+        enabled=settings.inbox_compression_enabled,
+    )
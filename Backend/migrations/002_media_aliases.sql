@@ -0,0 +1,5 @@
+-- Zoetrope 数据库迁移脚本
+-- 媒体别名：收集箱标题匹配时同时检索标题和别名（译名、原名等）
+
+-- JSON 数组，例如 ["The Matrix", "廿二世纪杀人网络"]
+ALTER TABLE media_items ADD COLUMN IF NOT EXISTS aliases TEXT;
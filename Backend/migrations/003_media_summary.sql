@@ -0,0 +1,7 @@
+-- Zoetrope 数据库迁移脚本
+-- 增量 AI 总结：每个媒体保存滚动总结和水位线，重新生成时只融入新评论
+
+ALTER TABLE media_items ADD COLUMN IF NOT EXISTS ai_summary TEXT;
+-- 已融入总结的最大 comments.id
+ALTER TABLE media_items ADD COLUMN IF NOT EXISTS ai_summary_comment_id INTEGER;
+ALTER TABLE media_items ADD COLUMN IF NOT EXISTS ai_summary_updated_at TIMESTAMP;
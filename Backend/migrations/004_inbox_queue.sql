@@ -0,0 +1,14 @@
+-- Zoetrope 数据库迁移脚本
+-- 收集箱处理队列：worker 通过 SELECT ... FOR UPDATE SKIP LOCKED 领取待处理条目
+-- 注：应用按 ORM 建表，收集箱表名为 inbox_items
+
+ALTER TABLE inbox_items ADD COLUMN IF NOT EXISTS status VARCHAR(20) NOT NULL DEFAULT 'pending';
+ALTER TABLE inbox_items ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE inbox_items ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP;
+ALTER TABLE inbox_items ADD COLUMN IF NOT EXISTS locked_by VARCHAR(64);
+ALTER TABLE inbox_items ADD COLUMN IF NOT EXISTS locked_at TIMESTAMP;
+
+-- 已处理的历史条目不再进入队列
+UPDATE inbox_items SET status = 'done' WHERE processed = TRUE AND status = 'pending';
+
+CREATE INDEX IF NOT EXISTS idx_inbox_items_queue ON inbox_items(status, next_attempt_at);
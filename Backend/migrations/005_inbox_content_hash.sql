@@ -0,0 +1,6 @@
+-- Zoetrope 数据库迁移脚本
+-- 收集箱内容去重：归一化内容（NFKC、小写、合并空白）的 SHA-256，唯一索引
+-- 已有条目保持 NULL（归一化在应用层计算，不在 SQL 中回填）
+
+ALTER TABLE inbox_items ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_inbox_items_content_hash ON inbox_items(content_hash);
@@ -0,0 +1,12 @@
+-- Zoetrope 数据库迁移脚本
+-- 收集箱原始内容/提取评论改为 zstd 压缩存储（bytea）
+-- 已有数据按 UTF-8 字节保存，应用读取时识别为未压缩文本；之后写入的数据为 zstd 帧
+-- 内容已由应用压缩，关闭 TOAST 的 pglz 压缩（EXTERNAL 仍允许行外存储）
+
+ALTER TABLE inbox_items
+    ALTER COLUMN raw_content TYPE BYTEA USING convert_to(raw_content, 'UTF8'),
+    ALTER COLUMN extracted_comments TYPE BYTEA USING convert_to(extracted_comments, 'UTF8');
+
+ALTER TABLE inbox_items
+    ALTER COLUMN raw_content SET STORAGE EXTERNAL,
+    ALTER COLUMN extracted_comments SET STORAGE EXTERNAL;
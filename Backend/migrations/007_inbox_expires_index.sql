@@ -0,0 +1,5 @@
+-- Zoetrope 数据库迁移脚本
+-- 收集箱过期清理：后台按 expires_at 顺序分批删除，需要 expires_at 索引
+-- 注：001 中的 idx_inbox_expires 建在 inbox 表上，应用实际使用的表为 inbox_items
+
+CREATE INDEX IF NOT EXISTS idx_inbox_items_expires ON inbox_items(expires_at);
@@ -1,14 +1,25 @@
 # 收集箱模型
 # TODO: 实现完整的 ORM 模型
 
-from datetime import datetime, timedelta, timezone
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Optional
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Index, LargeBinary
 from sqlalchemy.sql.elements import ColumnElement
 
+from ..database.compression import get_content_compressor
 from ..database.connection import Base
 from ..config import settings
 
 
+class InboxStatus(str, Enum):
+    """收集箱处理状态（处理队列）"""
+    PENDING = "pending"  # 等待处理（含等待重试）
+    PROCESSING = "processing"  # 已被 worker 领取
+    DONE = "done"  # 处理完成
+    FAILED = "failed"  # 重试次数用尽
+
+
 class InboxItem(Base):
     """
     收集箱表
@@ -20,31 +31,76 @@ class InboxItem(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
 
-    # 原始内容
-    raw_content = Column(Text, nullable=False)
+    # 原始内容（zstd 压缩存储，通过 raw_content 属性读写）
+    _raw_content = Column("raw_content", LargeBinary, nullable=False)
     url = Column(String(500), nullable=True)  # 可选的原始 URL
+    # 归一化内容的 SHA-256，相同内容在保留期内只保存/处理一次
+    content_hash = Column(String(64), nullable=True)
 
     # 处理状态
     processed = Column(Boolean, default=False)  # 是否已处理
     processing_error = Column(Text, nullable=True)  # 处理失败的错误信息
 
+    # 处理队列（worker 用 SELECT ... FOR UPDATE SKIP LOCKED 领取）
+    status = Column(String(20), nullable=False, default=InboxStatus.PENDING.value)
+    attempts = Column(Integer, nullable=False, default=0)  # 已尝试次数
+    next_attempt_at = Column(DateTime, nullable=True)  # 失败后的下次重试时间
+    locked_by = Column(String(64), nullable=True)  # 领取该任务的 worker
+    locked_at = Column(DateTime, nullable=True)  # 领取时间，超过租约视为 worker 已退出
+
     # AI 处理结果（临时存储）
     extracted_titles = Column(Text, nullable=True)  # JSON: 提取的标题列表
-    extracted_comments = Column(Text, nullable=True)  # JSON: 提取的评论列表
+    _extracted_comments = Column("extracted_comments", LargeBinary, nullable=True)  # JSON: 提取的评论列表（压缩存储）
 
-    # 时间戳
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    # 时间戳（与其他模型一致，均为不带时区的 UTC 时间）
+    created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(
         DateTime,
-        default=lambda: datetime.now(timezone.utc) + timedelta(days=settings.inbox_retention_days)
+        default=lambda: datetime.utcnow() + timedelta(days=settings.inbox_retention_days)
     )
 
+    __table_args__ = (
+        Index("idx_inbox_items_queue", "status", "next_attempt_at"),
+        Index("idx_inbox_items_content_hash", "content_hash", unique=True),
+        Index("idx_inbox_items_expires", "expires_at"),
+    )
+
+    # ========== 压缩字段 ==========
+    # 写入时压缩；读取时才解压（列表查询等不读内容的场景不解压），解压结果按压缩数据缓存
+
+    @property
+    def raw_content(self) -> str:
+        return self._decompressed("_raw_content")
+
+    @raw_content.setter
+    def raw_content(self, value: str) -> None:
+        self._raw_content = get_content_compressor().compress(value)
+
+    @property
+    def extracted_comments(self) -> Optional[str]:
+        return self._decompressed("_extracted_comments")
+
+    @extracted_comments.setter
+    def extracted_comments(self, value: Optional[str]) -> None:
+        self._extracted_comments = get_content_compressor().compress(value) if value is not None else None
+
+    def _decompressed(self, attr: str) -> Optional[str]:
+        data = getattr(self, attr)
+        if data is None:
+            return None
+        cache = self.__dict__.setdefault("_decompressed_cache", {})
+        cached = cache.get(attr)
+        if cached is None or cached[0] is not data:
+            cached = (data, get_content_compressor().decompress(data))
+            cache[attr] = cached
+        return cached[1]
+
     def __repr__(self) -> str:
-        return f"<InboxItem(id={self.id}, processed={self.processed})>"
+        return f"<InboxItem(id={self.id}, status={self.status})>"
 
     @property
     def is_expired(self) -> bool | ColumnElement[bool]:
         """检查是否已过期"""
         if self.expires_at is None:
             return False
-        return datetime.now(timezone.utc) > self.expires_at
+        return datetime.utcnow() > self.expires_at
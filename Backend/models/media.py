@@ -30,6 +30,7 @@ class MediaItem(Base):
     # 基础字段
     id = Column(Integer, primary_key=True, autoincrement=True)
     title = Column(String(255), nullable=False, index=True)
+    aliases = Column(Text, nullable=True)  # JSON: 别名/译名列表，用于标题匹配
     type = Column(SQLEnum(MediaType), nullable=False, default=MediaType.MOVIE)
 
     # 外部数据源 ID
@@ -49,6 +50,11 @@ class MediaItem(Base):
     priority_score = Column(Float, default=0.0)  # 系统计算的优先级分数
     sentiment_score = Column(Float, nullable=True)  # AI 分析的情感分数
 
+    # AI 总结（增量更新）
+    ai_summary = Column(Text, nullable=True)  # 滚动总结
+    ai_summary_comment_id = Column(Integer, nullable=True)  # 水位线：已融入总结的最大评论 ID
+    ai_summary_updated_at = Column(DateTime, nullable=True)
+
     # 统计数据
     mention_count = Column(Integer, default=0)  # 被提到次数
     view_count = Column(Integer, default=0)  # 用户查看次数
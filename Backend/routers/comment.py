@@ -1,10 +1,20 @@
 # 评论路由
 # 提供评论的 CRUD 接口
 
-from typing import Optional, List
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+import json
+from typing import AsyncIterator, Optional, List
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from ..database.connection import get_db
+from ..models.comment import Comment, CommentSource
+from ..models.media import MediaItem
+from ..services.ai import AIService, AIServiceError, get_ai_service
+from ..services.summarizer import IncrementalSummarizer, SummaryUpdate, get_summarizer
 
 router = APIRouter()
 
@@ -31,6 +41,9 @@ class CommentResponse(BaseModel):
     sentiment_score: Optional[float]
     created_at: datetime
 
+    class Config:
+        from_attributes = True
+
 
 class CommentListResponse(BaseModel):
     """评论列表响应"""
@@ -106,16 +119,114 @@ async def delete_comment(comment_id: int):
     )
 
 
-@router.post("/{media_id}/generate-summary")
-async def generate_ai_summary(media_id: int):
+@router.post("/{media_id}/generate-summary", response_model=CommentResponse)
+async def generate_ai_summary(
+    media_id: int,
+    request: Request,
+    stream: bool = Query(False, description="是否以 SSE 流式返回"),
+    db: AsyncSession = Depends(get_db),
+    ai: AIService = Depends(get_ai_service),
+    summarizer: IncrementalSummarizer = Depends(get_summarizer),
+):
     """
     为媒体生成 AI 总结评论
 
-    基于已有评论生成总结性评论
+    在媒体的滚动总结上增量融入上次总结之后的新评论（不含 AI 评论），
+    结果保存为 source=ai 的评论；没有新评论时直接返回最近一次的总结评论
 
-    TODO: 实现具体逻辑
+    stream=true 时返回 text/event-stream：
+    - event: token  data: {"text": "..."}  模型输出的增量文本
+    - event: done   data: CommentResponse  完整总结保存后发送
+    - event: error  data: {"detail": "..."}
+    客户端断开时取消上游请求，不保存部分结果
     """
-    raise HTTPException(
-        status_code=status.HTTP_501_NOT_IMPLEMENTED,
-        detail="TODO: 实现 AI 总结生成"
+    media = await db.get(MediaItem, media_id)
+    if media is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="媒体不存在")
+
+    try:
+        update = await summarizer.prepare(db, media)
+    except AIServiceError as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=e.message)
+
+    if update is None:
+        stmt = (
+            select(Comment)
+            .where(Comment.media_id == media_id, Comment.source == CommentSource.AI)
+            .order_by(Comment.id.desc())
+            .limit(1)
+        )
+        latest = (await db.execute(stmt)).scalar_one_or_none()
+        if latest is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="没有可总结的评论")
+        if stream:
+            return StreamingResponse(
+                _single_event("done", CommentResponse.model_validate(latest).model_dump(mode="json")),
+                media_type="text/event-stream",
+            )
+        return latest
+
+    if stream:
+        return StreamingResponse(
+            _summary_events(request, ai, media_id, update),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    try:
+        summary = await ai.generate_summary(
+            update.media_title, update.comments, previous_summary=update.previous_summary
+        )
+    except AIServiceError as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=e.message)
+    summarizer.apply(media, update, summary)
+    comment = Comment(media_id=media_id, content=summary, source=CommentSource.AI)
+    db.add(comment)
+    await db.flush()
+    return comment
+
+
+# ========== 内部方法 ==========
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _single_event(event: str, data: dict) -> AsyncIterator[str]:
+    yield _sse(event, data)
+
+
+async def _summary_events(
+    request: Request,
+    ai: AIService,
+    media_id: int,
+    update: SummaryUpdate,
+) -> AsyncIterator[str]:
+    """转发模型增量输出，完成后保存一次总结"""
+    parts = []
+    deltas = ai.stream_summary(
+        update.media_title, update.comments, previous_summary=update.previous_summary
     )
+    try:
+        async for delta in deltas:
+            if await request.is_disconnected():
+                return
+            parts.append(delta)
+            yield _sse("token", {"text": delta})
+    except AIServiceError as e:
+        yield _sse("error", {"detail": e.message})
+        return
+    finally:
+        # 提前退出（断开/取消/出错）时关闭上游流式请求
+        await deltas.aclose()
+
+    # 请求级会话在流式响应开始前已关闭，这里单独开会话保存
+    summary = "".join(parts).strip()
+    comment = Comment(media_id=media_id, content=summary, source=CommentSource.AI)
+    async for db in get_db():
+        media = await db.get(MediaItem, media_id)
+        if media is not None:
+            IncrementalSummarizer.apply(media, update, summary)
+        db.add(comment)
+        await db.flush()
+    yield _sse("done", CommentResponse.model_validate(comment).model_dump(mode="json"))
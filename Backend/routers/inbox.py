@@ -1,19 +1,39 @@
 # 收集箱路由
 # 提供内容粘贴和处理接口
 
-from typing import Optional, List
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+import asyncio
+import json
+from typing import AsyncIterator, Optional, List
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from ..config import settings
+from ..database.connection import get_db
+from ..models.inbox import InboxItem, InboxStatus
+from ..services.inbox_events import TERMINAL_STAGES, get_inbox_event_broker
+from ..services.inbox_queue import (
+    InboxQueue,
+    get_inbox_queue,
+    notify_inbox_workers,
+    run_inbox_job,
+)
+from ..services.inbox_reaper import InboxReaper, get_inbox_reaper
 
 router = APIRouter()
 
+# 进度事件流在没有新事件时查询数据库状态的间隔（秒），兼作心跳
+EVENTS_POLL_INTERVAL = 2.0
+
 
 # ========== 请求/响应模型 ==========
 
 class InboxSubmitRequest(BaseModel):
     """提交内容到收集箱"""
-    content: str  # 粘贴的文本内容
+    content: str = ""  # 粘贴的文本内容；为空时处理阶段抓取 url 指向的网页正文
     url: Optional[str] = None  # 可选的原始 URL
 
 
@@ -23,10 +43,13 @@ class InboxItemResponse(BaseModel):
     raw_content: str
     url: Optional[str]
     processed: bool
+    status: str  # pending / processing / done / failed
+    attempts: int
     processing_error: Optional[str]
     extracted_titles: Optional[List[str]]
     created_at: datetime
     expires_at: datetime
+    duplicate: bool = False  # 是否为重复提交（返回的是已有条目）
 
 
 class InboxProcessResult(BaseModel):
@@ -41,94 +64,218 @@ class InboxProcessResult(BaseModel):
 # ========== 路由端点 ==========
 
 @router.post("/submit", response_model=InboxItemResponse, status_code=status.HTTP_201_CREATED)
-async def submit_to_inbox(request: InboxSubmitRequest):
+async def submit_to_inbox(
+    request: InboxSubmitRequest,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    queue: InboxQueue = Depends(get_inbox_queue),
+):
     """
     提交内容到收集箱
 
     流程：
-    1. 保存原始内容到 Inbox
-    2. 异步触发 AI 分析
-    3. 返回 Inbox 条目 ID
-
-    TODO: 实现具体逻辑
+    0. 可以只提交链接（content 为空），处理时先抓取网页正文
+    1. 按归一化内容哈希（只有链接时按 URL）去重：保留期内提交过相同内容时直接返回已有条目（200，duplicate=true），
+       复用其处理结果，不再重复处理
+    2. 保存原始内容到 Inbox（status=pending，即进入处理队列）
+    3. 唤醒 worker 异步处理（提取 → 匹配 → 创建/更新条目 → 重新评分）
+    4. 立即返回 Inbox 条目，可通过 GET /{inbox_id} 查看处理状态
     """
-    raise HTTPException(
-        status_code=status.HTTP_501_NOT_IMPLEMENTED,
-        detail="TODO: 实现内容提交"
-    )
+    if not request.content.strip():
+        if not request.url:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="content 和 url 不能同时为空")
+        if not settings.url_fetch_enabled:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="未开启网页抓取，请粘贴文本内容")
+    item, duplicate = await queue.submit(db, request.content, request.url)
+    queued = not duplicate or item.status == InboxStatus.PENDING.value
+    await db.commit()
+    if duplicate:
+        response.status_code = status.HTTP_200_OK
+    if queued:
+        get_inbox_event_broker().publish(item.id, "queued")
+        notify_inbox_workers()
+    return _to_response(item, duplicate=duplicate)
 
 
 @router.get("/", response_model=List[InboxItemResponse])
 async def list_inbox_items(
     processed: Optional[bool] = Query(None, description="过滤处理状态"),
     limit: int = Query(50, ge=1, le=100, description="返回数量"),
+    db: AsyncSession = Depends(get_db),
 ):
-    """
-    获取收集箱列表
-
-    TODO: 实现具体逻辑
-    """
-    raise HTTPException(
-        status_code=status.HTTP_501_NOT_IMPLEMENTED,
-        detail="TODO: 实现收集箱列表查询"
-    )
+    """获取收集箱列表（按提交时间倒序）"""
+    stmt = select(InboxItem).order_by(InboxItem.id.desc()).limit(limit)
+    if processed is not None:
+        stmt = stmt.where(InboxItem.processed == processed)
+    return [_to_response(item) for item in (await db.execute(stmt)).scalars()]
 
 
 @router.get("/{inbox_id}", response_model=InboxItemResponse)
-async def get_inbox_item(inbox_id: int):
+async def get_inbox_item(inbox_id: int, db: AsyncSession = Depends(get_db)):
+    """获取单个收集箱条目"""
+    item = await db.get(InboxItem, inbox_id)
+    if item is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="收集箱条目不存在")
+    return _to_response(item)
+
+
+@router.get("/{inbox_id}/events")
+async def stream_inbox_events(inbox_id: int, request: Request, db: AsyncSession = Depends(get_db)):
     """
-    获取单个收集箱条目
+    收集箱条目处理进度（SSE）
 
-    TODO: 实现具体逻辑
+    事件（event 为阶段名，data 为 JSON）：
+    - queued      已进入队列
+    - fetching    {"url"} 只提交了链接，正在抓取页面
+    - fetched     {"url", "title", "truncated", "cached"} 页面抓取完成
+    - extracting  正在提取标题和评论
+    - resolving   {"resolved": n, "total": m, "title", "source", "tmdb_id"} 每个标题有结果时一次，
+                  source 为 library（本地库匹配）/ tmdb（TMDB 解析）/ null（未找到，将新建）
+    - scoring     {"total": n} 正在重新评分
+    - done        {"created_media_ids", "updated_media_ids", "errors"} 事务提交后发布，结束
+    - error       {"error", "retry_at"} 本次失败，稍后重试
+    - failed      {"error", "attempts"} 重试次数用尽，结束
+
+    先回放已发生的事件；由其他进程的 worker 处理时收不到实时事件，按 EVENTS_POLL_INTERVAL 查库，
+    处理结束后补发 done / failed
     """
-    raise HTTPException(
-        status_code=status.HTTP_501_NOT_IMPLEMENTED,
-        detail="TODO: 实现收集箱条目查询"
+    item = await db.get(InboxItem, inbox_id)
+    if item is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="收集箱条目不存在")
+    return StreamingResponse(
+        _inbox_events(request, inbox_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
 @router.post("/{inbox_id}/process", response_model=InboxProcessResult)
-async def process_inbox_item(inbox_id: int):
+async def process_inbox_item(
+    inbox_id: int,
+    db: AsyncSession = Depends(get_db),
+    queue: InboxQueue = Depends(get_inbox_queue),
+):
     """
-    手动触发处理收集箱条目
+    手动触发处理收集箱条目（同步等待结果；已完成/失败的条目会重新处理）
 
     流程：
     1. 调用 AI 分析内容
     2. 提取标题和评论
-    3. 查询是否已存在条目（RAG/向量搜索）
+    3. 查询是否已存在条目（TitleMatcher：标题/别名词法检索 + 向量检索融合）
     4. 创建或更新媒体条目
     5. 更新评分
     6. 标记为已处理
 
-    TODO: 实现具体逻辑
+    与 worker 共用队列领取逻辑，正在被 worker 处理的条目返回 409
     """
-    raise HTTPException(
-        status_code=status.HTTP_501_NOT_IMPLEMENTED,
-        detail="TODO: 实现收集箱处理"
+    if await db.get(InboxItem, inbox_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="收集箱条目不存在")
+    if not await queue.claim(db, "manual", inbox_id=inbox_id):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="条目正在处理中")
+    await db.commit()
+    get_inbox_event_broker().publish(inbox_id, "queued")
+
+    try:
+        result = await run_inbox_job(inbox_id)
+    except Exception as e:
+        return InboxProcessResult(
+            success=False,
+            message=f"处理失败：{e}",
+            created_media_ids=[],
+            updated_media_ids=[],
+            errors=[str(e)],
+        )
+    return InboxProcessResult(
+        success=True,
+        message=f"新建 {len(result['created_media_ids'])} 个条目，更新 {len(result['updated_media_ids'])} 个条目",
+        **result,
     )
 
 
 @router.delete("/{inbox_id}")
-async def delete_inbox_item(inbox_id: int):
-    """
-    删除收集箱条目
-
-    TODO: 实现具体逻辑
-    """
-    raise HTTPException(
-        status_code=status.HTTP_501_NOT_IMPLEMENTED,
-        detail="TODO: 实现收集箱删除"
-    )
+async def delete_inbox_item(inbox_id: int, db: AsyncSession = Depends(get_db)):
+    """删除收集箱条目"""
+    item = await db.get(InboxItem, inbox_id)
+    if item is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="收集箱条目不存在")
+    await db.delete(item)
+    return {"deleted": inbox_id}
 
 
 @router.post("/cleanup")
-async def cleanup_expired_items():
+async def cleanup_expired_items(reaper: InboxReaper = Depends(get_inbox_reaper)):
     """
     清理过期的收集箱条目
 
-    TODO: 实现具体逻辑
+    与后台定时清理相同：按 expires_at 索引分批删除，每批单独提交。
+    后台清理已开启时一般无需调用，可用于关闭后台清理时由外部定时任务触发
+
+    Returns:
+        本次删除行数、批次数、耗时，以及累计统计
     """
-    raise HTTPException(
-        status_code=status.HTTP_501_NOT_IMPLEMENTED,
-        detail="TODO: 实现过期清理"
+    result = await reaper.reap()
+    return {**result, "stats": reaper.stats()}
+
+
+# ========== 内部方法 ==========
+
+def _to_response(item: InboxItem, duplicate: bool = False) -> InboxItemResponse:
+    return InboxItemResponse(
+        id=item.id,
+        raw_content=item.raw_content,
+        url=item.url,
+        processed=bool(item.processed),
+        status=item.status or InboxStatus.PENDING.value,
+        attempts=item.attempts or 0,
+        processing_error=item.processing_error,
+        extracted_titles=json.loads(item.extracted_titles) if item.extracted_titles else None,
+        created_at=item.created_at,
+        expires_at=item.expires_at,
+        duplicate=duplicate,
     )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _terminal_event(inbox_id: int) -> Optional[dict]:
+    """根据数据库状态生成结束事件，未结束时返回 None"""
+    async for db in get_db():
+        item = await db.get(InboxItem, inbox_id)
+    if item is None:
+        return {"inbox_id": inbox_id, "stage": "failed", "error": "收集箱条目已删除"}
+    if item.status == InboxStatus.DONE.value:
+        return {
+            "inbox_id": inbox_id,
+            "stage": "done",
+            "extracted_titles": json.loads(item.extracted_titles) if item.extracted_titles else [],
+        }
+    if item.status == InboxStatus.FAILED.value:
+        return {"inbox_id": inbox_id, "stage": "failed", "error": item.processing_error, "attempts": item.attempts}
+    return None
+
+
+async def _inbox_events(request: Request, inbox_id: int) -> AsyncIterator[str]:
+    broker = get_inbox_event_broker()
+    async with broker.subscribe(inbox_id) as queue:
+        history = broker.history(inbox_id)
+        if not history:
+            # 不是本进程处理的，或事件已过期：已结束的条目直接返回结果
+            event = await _terminal_event(inbox_id)
+            history = [event] if event is not None else []
+        for event in history:
+            yield _sse(event["stage"], event)
+            if event["stage"] in TERMINAL_STAGES:
+                return
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), EVENTS_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                event = await _terminal_event(inbox_id)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+            yield _sse(event["stage"], event)
+            if event["stage"] in TERMINAL_STAGES:
+                return
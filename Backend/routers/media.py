@@ -10,6 +10,7 @@ from sqlalchemy import select
 
 from ..database.connection import get_db
 from ..models.media import MediaItem, MediaType
+from ..services.similarity_graph import SimilarityGraph, get_similarity_graph
 
 router = APIRouter()
 
@@ -66,6 +67,12 @@ class MediaResponse(BaseModel):
         from_attributes = True
 
 
+class SimilarMediaResponse(BaseModel):
+    """相似条目响应"""
+    media: MediaResponse
+    score: float  # 余弦相似度
+
+
 class MediaListResponse(BaseModel):
     """媒体列表响应"""
     items: List[MediaResponse]
@@ -188,6 +195,34 @@ async def get_media(media_id: int):
     )
 
 
+@router.get("/{media_id}/similar", response_model=List[SimilarMediaResponse])
+async def get_similar_media(
+    media_id: int,
+    limit: int = Query(10, ge=1, le=50, description="返回数量"),
+    db: AsyncSession = Depends(get_db),
+    graph: SimilarityGraph = Depends(get_similarity_graph),
+):
+    """
+    获取相似条目（更多类似内容）
+
+    从预计算的 k 近邻图查表，不发起向量检索；已隐藏的条目不返回
+    """
+    neighbors = graph.neighbors(media_id)
+    if not neighbors:
+        return []
+
+    stmt = select(MediaItem).where(
+        MediaItem.id.in_([neighbor_id for neighbor_id, _ in neighbors]),
+        MediaItem.is_hidden == 0,
+    )
+    items = {item.id: item for item in (await db.execute(stmt)).scalars()}
+    return [
+        SimilarMediaResponse(media=MediaResponse.model_validate(items[neighbor_id]), score=score)
+        for neighbor_id, score in neighbors
+        if neighbor_id in items
+    ][:limit]
+
+
 @router.post("/", response_model=MediaResponse, status_code=status.HTTP_201_CREATED)
 async def create_media(request: MediaCreateRequest):
     """
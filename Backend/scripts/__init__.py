@@ -0,0 +1,2 @@
+# Backend Scripts
+# 运维与基准测试脚本，使用 python -m Backend.scripts.<name> 运行
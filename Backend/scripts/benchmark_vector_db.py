@@ -0,0 +1,167 @@
+# 本地向量数据库基准测试
+# 对比精确检索、HNSW 近似检索和量化存储的召回率、查询延迟与向量内存
+#
+# 参考结果（--n 20000 --dim 128，默认参数）：flat p50 约 1ms；hnsw ef=128 召回率约 0.95、p50 约 2ms。
+# --n 100000 时 flat p50 约 6ms，hnsw ef=128 p50 约 3ms、召回率约 0.6
+# 默认参数下 int8 召回率约 0.98（rerank=4 时 1.0）；pq 约 0.2（rerank=4 时约 0.4）
+#
+# 用法:
+#   python -m Backend.scripts.benchmark_vector_db --n 100000 --dim 256 --ef 32 64 128
+#   python -m Backend.scripts.benchmark_vector_db --modes flat int8 pq --rerank 0 4
+#   python -m Backend.scripts.benchmark_vector_db --modes flat --filter-years 1 5 20
+
+import argparse
+import asyncio
+import tempfile
+import time
+from typing import Optional
+
+import numpy as np
+
+from ..services.local_vector_db import LocalNumpyVectorDB
+
+
+def make_dataset(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """生成带聚类结构的合成向量（比均匀随机数据更接近真实 embedding 分布）"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    noise = rng.normal(scale=0.6, size=(n, dim)).astype(np.float32)
+    return centers[labels] + noise
+
+
+YEAR_RANGE = 100  # 合成 metadata 的年份跨度，按 1900 + i % 100 分配
+
+
+def item_metadata(i: int) -> dict:
+    return {"kind": "media", "type": ("movie", "tv")[i % 2], "year": 1900 + i % YEAR_RANGE}
+
+
+async def build_store(directory: str, data: np.ndarray, **kwargs) -> tuple[LocalNumpyVectorDB, float]:
+    """建库并返回耗时（秒）"""
+    store = LocalNumpyVectorDB(directory, dimension=data.shape[1], **kwargs)
+    await store.init()
+    start = time.perf_counter()
+    for i, vector in enumerate(data):
+        await store.upsert(f"item:{i}", vector, item_metadata(i))
+    return store, time.perf_counter() - start
+
+
+async def run_queries(
+    store: LocalNumpyVectorDB,
+    queries: np.ndarray,
+    k: int,
+    filter: Optional[dict] = None,
+) -> tuple[list[set], np.ndarray]:
+    """执行查询，返回结果 id 集合与逐条延迟（毫秒）"""
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = await store.search(query, top_k=k, filter=filter)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({hit["id"] for hit in hits})
+    return results, np.array(latencies)
+
+
+def vector_memory_bytes(store: LocalNumpyVectorDB) -> int:
+    """检索时需常驻内存的向量数据大小（量化模式为编码 + 缩放系数）"""
+    if store._quantizer is not None and store._quantizer.is_trained:
+        return store._codes[: store._count].nbytes + store._scales[: store._count].nbytes
+    return store._vectors[: store._count].nbytes
+
+
+def report(name: str, build_s: float, recall: float, latencies: np.ndarray, memory: int) -> None:
+    print(
+        f"{name:<24} build={build_s:8.1f}s  recall={recall:6.3f}  "
+        f"p50={np.percentile(latencies, 50):7.3f}ms  p99={np.percentile(latencies, 99):7.3f}ms  "
+        f"mem={memory / 2**20:8.2f}MiB"
+    )
+
+
+def recall_at_k(found: list[set], truth: list[set]) -> float:
+    return float(np.mean([len(f & t) / len(t) for f, t in zip(found, truth)]))
+
+
+async def main(args: argparse.Namespace) -> None:
+    data = make_dataset(args.n, args.dim, args.clusters, args.seed)
+    queries = make_dataset(args.queries, args.dim, args.clusters, args.seed + 1)
+
+    with tempfile.TemporaryDirectory() as flat_dir:
+        flat, flat_build = await build_store(flat_dir, data)
+        truth, flat_latency = await run_queries(flat, queries, args.k)
+        if "flat" in args.modes:
+            report("flat", flat_build, 1.0, flat_latency, vector_memory_bytes(flat))
+
+        # 过滤检索：年份范围越窄候选越少，延迟应随之下降
+        for years in args.filter_years:
+            year_filter = {"type": "movie", "year": {"$gte": 1900, "$lt": 1900 + years}}
+            _, latency = await run_queries(flat, queries, args.k, filter=year_filter)
+            selectivity = years / YEAR_RANGE / 2
+            report(f"flat filter={selectivity:.1%}", flat_build, 1.0, latency, vector_memory_bytes(flat))
+
+    if "hnsw" in args.modes:
+        with tempfile.TemporaryDirectory() as hnsw_dir:
+            hnsw, hnsw_build = await build_store(
+                hnsw_dir,
+                data,
+                index_type="hnsw",
+                hnsw_m=args.m,
+                hnsw_ef_construction=args.ef_construction,
+            )
+            for ef in args.ef:
+                hnsw._hnsw.ef_search = ef
+                found, latency = await run_queries(hnsw, queries, args.k)
+                report(
+                    f"hnsw M={args.m} ef={ef}",
+                    hnsw_build,
+                    recall_at_k(found, truth),
+                    latency,
+                    vector_memory_bytes(hnsw),
+                )
+
+    for quantization in ("int8", "pq"):
+        if quantization not in args.modes:
+            continue
+        with tempfile.TemporaryDirectory() as quant_dir:
+            store, build = await build_store(
+                quant_dir,
+                data,
+                quantization=quantization,
+                pq_subvectors=args.pq_subvectors,
+            )
+            for rerank in args.rerank:
+                store.rerank_factor = rerank
+                found, latency = await run_queries(store, queries, args.k)
+                report(
+                    f"{quantization} rerank={rerank}",
+                    build,
+                    recall_at_k(found, truth),
+                    latency,
+                    vector_memory_bytes(store),
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local vector DB recall/latency/memory benchmark")
+    parser.add_argument("--n", type=int, default=20000, help="向量数量")
+    parser.add_argument("--dim", type=int, default=256, help="向量维度")
+    parser.add_argument("--clusters", type=int, default=100, help="合成数据聚类数")
+    parser.add_argument("--queries", type=int, default=200, help="查询数量")
+    parser.add_argument("--k", type=int, default=10, help="top-k")
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=["flat", "hnsw", "int8", "pq"],
+        default=["flat", "hnsw", "int8", "pq"],
+        help="参与对比的模式",
+    )
+    parser.add_argument("--m", type=int, default=16, help="HNSW M")
+    parser.add_argument("--ef-construction", type=int, default=200, help="HNSW ef_construction")
+    parser.add_argument("--ef", type=int, nargs="+", default=[64, 128, 256], help="HNSW ef_search 取值")
+    parser.add_argument("--pq-subvectors", type=int, default=0, help="PQ 分段数，0 为每 8 维一段")
+    parser.add_argument("--rerank", type=int, nargs="+", default=[0, 4], help="量化模式的重排倍数")
+    parser.add_argument(
+        "--filter-years", type=int, nargs="*", default=[], help="过滤检索的年份跨度（命中率 = 跨度 / 200）"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
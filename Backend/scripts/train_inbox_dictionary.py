@@ -0,0 +1,92 @@
+# 训练收集箱压缩字典
+# 从最近的收集箱内容训练 zstd 共享字典，写入 INBOX_COMPRESSION_DICTIONARY_DIR 并报告压缩率
+#
+# 用法:
+#   python -m Backend.scripts.train_inbox_dictionary --samples 2000
+#   python -m Backend.scripts.train_inbox_dictionary --dict-size 65536 --recompress --batch-size 500
+
+import argparse
+import asyncio
+from typing import Callable
+
+import zstandard
+from sqlalchemy import select
+
+from ..database.compression import get_content_compressor
+from ..database.connection import close_db, get_db, init_db
+from ..models.inbox import InboxItem
+
+
+def ratio(samples: list[str], compress: Callable[[str], bytes]) -> float:
+    raw = sum(len(sample.encode("utf-8")) for sample in samples)
+    stored = sum(min(len(sample.encode("utf-8")), len(compress(sample))) for sample in samples)
+    return raw / stored if stored else 0.0
+
+
+async def recompress(batch_size: int) -> int:
+    """按 id 分批用当前字典重新压缩所有条目（setter 写回即重新压缩），每批单独提交"""
+    total = 0
+    last_id = 0
+    async for db in get_db():
+        while True:
+            rows = (
+                await db.execute(
+                    select(InboxItem).where(InboxItem.id > last_id).order_by(InboxItem.id).limit(batch_size)
+                )
+            ).scalars().all()
+            if not rows:
+                break
+            for item in rows:
+                item.raw_content = item.raw_content
+                if item.extracted_comments is not None:
+                    item.extracted_comments = item.extracted_comments
+            await db.commit()
+            db.expunge_all()
+            last_id = rows[-1].id
+            total += len(rows)
+    return total
+
+
+async def main(args: argparse.Namespace) -> None:
+    await init_db()
+    compressor = get_content_compressor()
+    try:
+        async for db in get_db():
+            items = (
+                await db.execute(
+                    select(InboxItem).order_by(InboxItem.created_at.desc()).limit(args.samples)
+                )
+            ).scalars().all()
+            samples = [item.raw_content for item in items]
+            samples += [item.extracted_comments for item in items if item.extracted_comments]
+            if len(samples) < args.min_samples:
+                print(f"Only {len(samples)} samples, need at least {args.min_samples}; dictionary not trained")
+                return
+
+            # 留出 1/10 样本评估压缩率
+            holdout = samples[::10]
+            training = [sample for i, sample in enumerate(samples) if i % 10]
+            dict_id = compressor.train(training, dict_size=args.dict_size)
+            # 评估用独立的 ZstdCompressor，不计入全局压缩器的 raw/stored 统计
+            plain = zstandard.ZstdCompressor(level=compressor.level)
+            trained = zstandard.ZstdCompressor(level=compressor.level, dict_data=compressor.dictionary)
+            baseline = ratio(holdout, lambda text: plain.compress(text.encode("utf-8")))
+            with_dictionary = ratio(holdout, lambda text: trained.compress(text.encode("utf-8")))
+            print(f"Trained dictionary {dict_id} from {len(training)} samples")
+            print(f"Held-out ratio without dictionary: {baseline:.2f}x")
+            print(f"Held-out ratio with dictionary:    {with_dictionary:.2f}x")
+
+        if args.recompress:
+            print(f"Recompressed {await recompress(args.batch_size)} inbox items")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the shared zstd dictionary for inbox content")
+    parser.add_argument("--samples", type=int, default=2000, help="Number of recent inbox items to sample")
+    parser.add_argument("--min-samples", type=int, default=100)
+    parser.add_argument("--dict-size", type=int, default=112640, help="Dictionary size in bytes")
+    parser.add_argument("--recompress", action="store_true", help="Rewrite existing rows with the new dictionary")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per transaction when recompressing")
+    asyncio.run(main(parser.parse_args()))
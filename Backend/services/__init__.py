@@ -2,6 +2,9 @@
 
 from .tmdb import TMDBService, get_tmdb_service
 from .ai import AIService, get_ai_service
+from .embedding_cache import EmbeddingCache
+from .sentiment_cascade import SentimentCascade, get_sentiment_cascade
+from .summarizer import IncrementalSummarizer, get_summarizer
 from .scoring import ScoringService, get_scoring_service
 from .vector_db import (
     BaseVectorDB,
@@ -9,6 +12,25 @@ from .vector_db import (
     get_vector_db,
     close_vector_db,
 )
+from .indexing import MediaIndexer, get_media_indexer
+from .title_matcher import TitleMatcher, get_title_matcher
+from .title_resolver import TitleResolver, get_title_resolver
+from .similarity_graph import (
+    SimilarityGraph,
+    get_similarity_graph,
+    run_similarity_graph_job,
+)
+from .inbox_queue import (
+    InboxQueue,
+    InboxProcessor,
+    get_inbox_queue,
+    get_inbox_processor,
+    notify_inbox_workers,
+    run_inbox_job,
+    run_inbox_workers,
+)
+from .inbox_reaper import InboxReaper, get_inbox_reaper, run_inbox_reaper
+from .url_fetcher import UrlFetcher, UrlFetchError, get_url_fetcher, close_url_fetcher
 from .redis import RedisService, get_redis_service, close_redis_service
 from .supabase import (
     SupabaseService,
@@ -24,6 +46,11 @@ __all__ = [
     # AI
     "AIService",
     "get_ai_service",
+    "EmbeddingCache",
+    "SentimentCascade",
+    "get_sentiment_cascade",
+    "IncrementalSummarizer",
+    "get_summarizer",
     # Scoring
     "ScoringService",
     "get_scoring_service",
@@ -32,6 +59,34 @@ __all__ = [
     "create_vector_db",
     "get_vector_db",
     "close_vector_db",
+    # Indexing
+    "MediaIndexer",
+    "get_media_indexer",
+    # Title Matching
+    "TitleMatcher",
+    "get_title_matcher",
+    "TitleResolver",
+    "get_title_resolver",
+    # Similarity Graph
+    "SimilarityGraph",
+    "get_similarity_graph",
+    "run_similarity_graph_job",
+    # Inbox Queue
+    "InboxQueue",
+    "InboxProcessor",
+    "get_inbox_queue",
+    "get_inbox_processor",
+    "notify_inbox_workers",
+    "run_inbox_job",
+    "run_inbox_workers",
+    "InboxReaper",
+    "get_inbox_reaper",
+    "run_inbox_reaper",
+    # URL Fetching
+    "UrlFetcher",
+    "UrlFetchError",
+    "get_url_fetcher",
+    "close_url_fetcher",
     # Redis
     "RedisService",
     "get_redis_service",
@@ -1,11 +1,31 @@
 # AI 服务
 # 封装 AI API 调用，用于文本分析、评论生成、情感分析等
 
-from typing import Optional
+import asyncio
+import hashlib
+import json
+from typing import AsyncIterator, Optional
 from functools import lru_cache
 import httpx
+import numpy as np
 
 from ..config import settings
+from .embedding_cache import EmbeddingCache, normalize_embedding_text
+from .extraction_cache import ExtractionCache
+from .list_parser import merge_extractions, parse_media_list
+from .local_ai import HashingEmbedder, LexiconSentimentAnalyzer
+from .micro_batcher import MicroBatcher
+from .resilience import CircuitBreaker, CircuitOpenError, ConcurrencyLimiter, RetryPolicy
+from .sentiment_cascade import SentimentCascade
+from .text_chunker import iter_chunks
+from .token_budget import (
+    TokenBudget,
+    TokenBudgetExceeded,
+    compact_text,
+    estimate_message_tokens,
+    select_comments,
+)
+from .tokens import estimate_tokens
 
 
 class AIServiceError(Exception):
@@ -17,6 +37,28 @@ class AIServiceError(Exception):
         super().__init__(self.message)
 
 
+EXTRACTION_PROMPT = """你是影视/书籍/音乐信息提取器。从用户粘贴的博文、榜单或评论中提取提到的作品。
+只输出 JSON：
+{
+  "titles": ["作品标题", ...],
+  "comments": [{"title": "作品标题", "comment": "原文中对该作品的评论", "sentiment": -1.0 到 1.0}, ...],
+  "source_type": "blog" | "list" | "review"
+}
+标题使用原文写法，去掉书名号；没有评论的作品不放入 comments；sentiment 表示作者想看/喜欢的程度。"""
+
+SENTIMENT_BATCH_PROMPT = """你是影视/书籍评论的情感分析器。
+对下面每条编号评论，判断评论者想看/喜欢该作品的程度，给出 -1.0 到 1.0 的分数：
+负数表示不想看或不喜欢，0 表示中性，正数表示想看或喜欢。
+只输出 JSON：{"scores": [分数1, 分数2, ...]}，顺序与编号一致，数量与评论条数相同。"""
+
+SUMMARY_PROMPT = """你是影视/书籍评论的总结者。根据用户收集的多条评论，为该作品写一段中文总结评论：
+概括评论者的主要观点、喜欢和不喜欢的地方，以及是否值得一看。不超过 200 字，不要逐条复述评论。"""
+
+SUMMARY_UPDATE_PROMPT = SUMMARY_PROMPT + """
+用户会同时给出已有总结和新增评论：把新增评论的观点融入已有总结，输出更新后的完整总结；
+新评论与已有总结矛盾时，说明评价存在分歧。"""
+
+
 class AIService:
     """
     AI 服务类
@@ -26,21 +68,95 @@ class AIService:
     - Sentiment 分析（判断用户想看程度）
     - 从博文中提取标题、理由、信息
     - 文本 Embedding（用于向量检索）
+
+    Embedding 和情感分析可切换为本地后端（embedding_backend / sentiment_backend = "local"），
+    不访问网络，见 local_ai.py
+
+    所有 LLM 调用经过 token_budget：调用前估算并检查单次/每分钟预算，调用后记录实际用量；
+    所有 HTTP 调用经过按操作类型（extraction / sentiment / summary / embedding）的并发限制、
+    重试和熔断，见 resilience.py，指标见 metrics()
     """
 
+    DEFAULT_CONCURRENCY_LIMITS = {"extraction": 4, "sentiment": 4, "summary": 4, "embedding": 8}
+
     def __init__(
         self,
         api_key: str,
         base_url: str,
         model: str,
         embedding_model: str,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        extraction_cache: Optional[ExtractionCache] = None,
+        embedding_batch_size: int = 512,
+        embedding_batch_wait_ms: float = 5.0,
+        embedding_batch_max_tokens: int = 100000,
+        embedding_backend: str = "remote",
+        sentiment_backend: str = "remote",
+        local_embedding_dimension: int = 512,
+        list_parser_enabled: bool = True,
+        extraction_chunk_tokens: int = 3000,
+        extraction_chunk_overlap_tokens: int = 200,
+        token_budget: Optional[TokenBudget] = None,
+        summary_max_comment_tokens: int = 4000,
+        concurrency_limits: Optional[dict[str, int]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        sentiment_confidence_threshold: float = 0.6,
+        sentiment_llm_batch_size: int = 20,
+        sentiment_llm_batch_wait_ms: float = 20.0,
+        sentiment_audit_rate: float = 0.02,
     ):
         self.api_key = api_key
         self.base_url = base_url.rstrip("/")
         self.model = model
         self.embedding_model = embedding_model
+        self.embedding_cache = embedding_cache
+        self.extraction_cache = extraction_cache
+        self.embedding_batch_size = embedding_batch_size
+        self.list_parser_enabled = list_parser_enabled
+        self.extraction_chunk_tokens = extraction_chunk_tokens
+        self.extraction_chunk_overlap_tokens = extraction_chunk_overlap_tokens
+        # 默认不限额，只统计用量
+        self.token_budget = token_budget or TokenBudget(max_prompt_tokens=0)
+        self.summary_max_comment_tokens = summary_max_comment_tokens
+
+        # 调用保护：按操作类型限制并发，429/5xx 重试，上游持续故障时熔断
+        limits = {**self.DEFAULT_CONCURRENCY_LIMITS, **(concurrency_limits or {})}
+        self.limiters = {
+            operation: ConcurrencyLimiter(operation, limit) for operation, limit in limits.items()
+        }
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker("ai")
         self._client: Optional[httpx.AsyncClient] = None
 
+        for name, backend in (("embedding", embedding_backend), ("sentiment", sentiment_backend)):
+            if backend not in ("remote", "local"):
+                raise AIServiceError(f"Unsupported {name} backend: {backend}")
+        self._local_embedder = (
+            HashingEmbedder(local_embedding_dimension) if embedding_backend == "local" else None
+        )
+        self._local_sentiment = (
+            LexiconSentimentAnalyzer() if sentiment_backend == "local" else None
+        )
+        # remote 后端：本地词典置信度不足的评论才调用 LLM
+        self.sentiment_cascade = SentimentCascade(
+            self,
+            confidence_threshold=sentiment_confidence_threshold,
+            llm_batch_size=sentiment_llm_batch_size,
+            llm_batch_wait=sentiment_llm_batch_wait_ms / 1000,
+            audit_rate=sentiment_audit_rate,
+        )
+
+        self.embedding_api_calls = 0  # 实际发出的 embedding 请求数
+        # 并发的单条 get_embedding 调用攒批后走 get_embeddings_batch
+        self._embedding_batcher = MicroBatcher(
+            self.get_embeddings_batch,
+            max_batch_size=embedding_batch_size,
+            max_wait=embedding_batch_wait_ms / 1000,
+            max_cost=embedding_batch_max_tokens,
+            cost=estimate_tokens,
+        )
+
     async def _get_client(self) -> httpx.AsyncClient:
         """获取或创建 HTTP 客户端"""
         if self._client is None or self._client.is_closed:
@@ -58,6 +174,35 @@ class AIService:
         """关闭 HTTP 客户端"""
         if self._client and not self._client.is_closed:
             await self._client.aclose()
+        if self.embedding_cache:
+            self.embedding_cache.close()
+        if self.extraction_cache:
+            self.extraction_cache.close()
+
+    def metrics(self) -> dict:
+        """调用保护、token 用量和缓存的统计指标"""
+        return {
+            "concurrency": {name: limiter.stats() for name, limiter in self.limiters.items()},
+            "retry": self.retry_policy.stats(),
+            "circuit_breaker": self.circuit_breaker.stats(),
+            "tokens": self.token_budget.stats(),
+            "sentiment_cascade": self.sentiment_cascade.stats(),
+            "embedding_api_calls": self.embedding_api_calls,
+            "embedding_cache": {
+                "hits": self.embedding_cache.hits,
+                "misses": self.embedding_cache.misses,
+            } if self.embedding_cache else None,
+            "extraction_cache": {
+                "exact_hits": self.extraction_cache.exact_hits,
+                "near_hits": self.extraction_cache.near_hits,
+                "misses": self.extraction_cache.misses,
+            } if self.extraction_cache else None,
+        }
+
+    @property
+    def extraction_version(self) -> str:
+        """提取结果版本：提示词或模型变化后，缓存的旧结果不再使用"""
+        return hashlib.sha256(f"{self.model}\0{EXTRACTION_PROMPT}".encode("utf-8")).hexdigest()[:16]
 
     # ========== 文本分析 ==========
 
@@ -72,12 +217,111 @@ class AIService:
             {
                 "titles": ["电影1", "电影2", ...],
                 "comments": [{"title": "电影1", "comment": "评论内容", "sentiment": 0.8}, ...],
-                "source_type": "blog" | "list" | "review"
+                "source_type": "blog" | "list" | "review",
+                "years": {"电影1": 2023, ...}  # 原文写明年份的作品
             }
 
-        TODO: 实现具体的 AI 调用逻辑
+        编号/项目符号榜单和《》标题先由 list_parser 规则解析，只有无法结构化的部分才调用 LLM；
+        规则解析出的评论一次性交给 analyze_sentiment_many 评分（LLM 提取的评论带有 LLM 给出的分数）；
+        超过 extraction_chunk_tokens 的部分按列表项/段落切块并发提取后合并；
+        相同或轻微改动的内容（转载、重复粘贴）直接返回缓存结果，不调用 LLM
+        """
+        if not self.list_parser_enabled:
+            return await self._extract_with_llm(text)
+
+        parsed, remainder = parse_media_list(text)
+        scores = await self.analyze_sentiment_many([comment["comment"] for comment in parsed["comments"]])
+        for comment, score in zip(parsed["comments"], scores):
+            comment["sentiment"] = score
+        if not remainder:
+            return parsed
+        if not parsed["titles"]:
+            return await self._extract_with_llm(remainder)
+        return merge_extractions([parsed, await self._extract_with_llm(remainder)])
+
+    async def _extract_with_llm(self, text: str) -> dict:
+        """
+        调用 LLM 提取
+
+        先压缩输入（去链接、样板行、重复行），超过块大小时分块并发
+        （同时进行的请求数由 extraction 并发名额限制）
         """
-        raise NotImplementedError("TODO: 实现媒体信息提取")
+        text = compact_text(text)
+        if not text:
+            return self._parse_extraction("{}")
+        chunk_tokens = self.extraction_chunk_tokens
+        if self.token_budget.max_prompt_tokens:
+            # 块大小不超过单次预算扣除系统提示词后的余量
+            overhead = estimate_message_tokens([{"content": EXTRACTION_PROMPT}, {"content": ""}])
+            chunk_tokens = max(1, min(chunk_tokens, self.token_budget.max_prompt_tokens - overhead))
+        if estimate_tokens(text) <= chunk_tokens:
+            return await self._extract_chunk(text)
+
+        tasks = [
+            asyncio.ensure_future(self._extract_chunk(chunk))
+            for chunk in iter_chunks(text, chunk_tokens, min(self.extraction_chunk_overlap_tokens, chunk_tokens // 4))
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        # 重叠部分的标题/评论在合并时去重
+        return merge_extractions(results)
+
+    async def _extract_chunk(self, text: str) -> dict:
+        """单次 LLM 提取（带缓存）"""
+        if self.extraction_cache:
+            cached = await self.extraction_cache.get(text, self.extraction_version)
+            if cached is not None:
+                return cached
+
+        content = await self._chat_completion(
+            "extraction",
+            [
+                {"role": "system", "content": EXTRACTION_PROMPT},
+                {"role": "user", "content": text},
+            ],
+            json_mode=True,
+        )
+        result = self._parse_extraction(content)
+
+        if self.extraction_cache:
+            await self.extraction_cache.put(text, self.extraction_version, result)
+        return result
+
+    @staticmethod
+    def _parse_extraction(content: str) -> dict:
+        """校验并规整 LLM 返回的提取结果"""
+        try:
+            data = json.loads(content)
+        except ValueError as e:
+            raise AIServiceError(f"Invalid extraction response: {content[:200]}") from e
+        if not isinstance(data, dict):
+            raise AIServiceError(f"Invalid extraction response: {content[:200]}")
+
+        titles = [title.strip() for title in data.get("titles") or [] if isinstance(title, str)]
+        comments = []
+        for comment in data.get("comments") or []:
+            if not isinstance(comment, dict) or not comment.get("title") or not comment.get("comment"):
+                continue
+            try:
+                sentiment = max(-1.0, min(1.0, float(comment.get("sentiment", 0.0))))
+            except (TypeError, ValueError):
+                sentiment = 0.0
+            comments.append({
+                "title": str(comment["title"]).strip(),
+                "comment": str(comment["comment"]).strip(),
+                "sentiment": sentiment,
+            })
+        source_type = data.get("source_type")
+        return {
+            "titles": list(dict.fromkeys(title for title in titles if title)),
+            "comments": comments,
+            "source_type": source_type if source_type in ("blog", "list", "review") else "blog",
+            "years": {},
+        }
 
     async def analyze_sentiment(self, text: str) -> float:
         """
@@ -92,24 +336,267 @@ class AIService:
             - 0：中性
             - 正数：正面情感（想看）
 
-        TODO: 实现具体的 AI 调用逻辑
+        本地后端使用中英文情感词典打分；remote 后端经 SentimentCascade，
+        词典置信度足够时直接采用，否则调用 LLM
+        """
+        if self._local_sentiment is not None:
+            score, _ = self._local_sentiment.analyze(text)
+            return score
+        return await self.sentiment_cascade.analyze(text)
+
+    async def analyze_sentiment_many(self, texts: list[str]) -> list[float]:
         """
-        raise NotImplementedError("TODO: 实现情感分析")
+        批量分析多条评论的情感倾向（导入榜单、收集箱条目的评论）
+
+        remote 后端经 SentimentCascade：词典置信度足够的直接采用，
+        其余合并为少量 analyze_sentiment_batch 调用
 
-    async def generate_summary(self, media_title: str, comments: list[str]) -> str:
+        Returns:
+            与 texts 逐项对应的情感分数 (-1.0 到 1.0)
+        """
+        if not texts:
+            return []
+        if self._local_sentiment is not None:
+            return [self._local_sentiment.analyze(text)[0] for text in texts]
+        return await self.sentiment_cascade.analyze_many(texts)
+
+    async def analyze_sentiment_batch(self, texts: list[str]) -> list[float]:
+        """
+        批量情感分析（一次 LLM 调用处理多条评论）
+
+        Args:
+            texts: 评论列表
+
+        Returns:
+            与 texts 逐项对应的情感分数 (-1.0 到 1.0)
+        """
+        if not texts:
+            return []
+        numbered = "\n".join(f"{i + 1}. {text}" for i, text in enumerate(texts))
+        content = await self._chat_completion(
+            "sentiment",
+            [
+                {"role": "system", "content": SENTIMENT_BATCH_PROMPT},
+                {"role": "user", "content": numbered},
+            ],
+            json_mode=True,
+        )
+        try:
+            scores = [float(score) for score in json.loads(content)["scores"]]
+        except (ValueError, KeyError, TypeError) as e:
+            raise AIServiceError(f"Invalid sentiment response: {content[:200]}") from e
+        if len(scores) != len(texts):
+            raise AIServiceError(
+                f"Sentiment response has {len(scores)} scores for {len(texts)} comments"
+            )
+        return [max(-1.0, min(1.0, score)) for score in scores]
+
+    async def generate_summary(
+        self,
+        media_title: str,
+        comments: list[str],
+        previous_summary: Optional[str] = None,
+    ) -> str:
         """
         为媒体生成总结评论
 
         Args:
             media_title: 媒体标题
             comments: 相关评论列表
+            previous_summary: 已有总结；给出时只需传入新增评论，模型在已有总结上增量更新
 
         Returns:
             AI 生成的总结文本
 
-        TODO: 实现具体的 AI 调用逻辑
+        评论总量超过 summary_max_comment_tokens 时去重并按相关度保留
+        """
+        comments = select_comments(comments, self.summary_max_comment_tokens)
+        content = await self._chat_completion(
+            "summary",
+            self._summary_messages(media_title, comments, previous_summary)
+        )
+        return content.strip()
+
+    async def stream_summary(
+        self,
+        media_title: str,
+        comments: list[str],
+        previous_summary: Optional[str] = None,
+    ) -> AsyncIterator[str]:
         """
-        raise NotImplementedError("TODO: 实现总结生成")
+        流式生成总结评论，逐段产出模型输出的文本（参数同 generate_summary）
+
+        调用方停止迭代（aclose）或任务被取消时，上游请求随之关闭
+        """
+        comments = select_comments(comments, self.summary_max_comment_tokens)
+        messages = self._summary_messages(media_title, comments, previous_summary)
+        async for delta in self._stream_chat_completion("summary", messages):
+            yield delta
+
+    @staticmethod
+    def _summary_messages(
+        media_title: str,
+        comments: list[str],
+        previous_summary: Optional[str] = None,
+    ) -> list[dict]:
+        numbered = "\n".join(f"{i}. {comment}" for i, comment in enumerate(comments, 1))
+        if previous_summary:
+            return [
+                {"role": "system", "content": SUMMARY_UPDATE_PROMPT},
+                {
+                    "role": "user",
+                    "content": f"作品：{media_title}\n已有总结：\n{previous_summary}\n新增评论：\n{numbered}",
+                },
+            ]
+        return [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": f"作品：{media_title}\n评论：\n{numbered}"},
+        ]
+
+    async def _chat_completion(
+        self,
+        operation: str,
+        messages: list[dict],
+        json_mode: bool = False,
+        max_tokens: Optional[int] = None,
+    ) -> str:
+        """调用 OpenAI 兼容的 /chat/completions 接口，返回回复文本"""
+        budget = await self._acquire_budget(messages, max_tokens)
+        payload: dict = {"model": self.model, "messages": messages, "temperature": 0}
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        try:
+            response = await self._post(operation, "/chat/completions", payload)
+        except AIServiceError:
+            self.token_budget.record(budget, 0, 0)
+            raise
+        if response.status_code != 200:
+            self.token_budget.record(budget, 0, 0)
+            raise AIServiceError(
+                f"Chat request failed: {response.text}",
+                status_code=response.status_code,
+            )
+        data = response.json()
+        content = data["choices"][0]["message"]["content"]
+        usage = data.get("usage") or {}
+        self.token_budget.record(
+            budget,
+            usage.get("prompt_tokens", estimate_message_tokens(messages)),
+            usage.get("completion_tokens", estimate_tokens(content or "")),
+        )
+        return content
+
+    async def _stream_chat_completion(self, operation: str, messages: list[dict]) -> AsyncIterator[str]:
+        """
+        以 stream 模式调用 /chat/completions，逐个产出增量文本
+
+        只在收到第一个增量之前重试；流式输出期间一直占用该操作的并发名额
+        """
+        budget = await self._acquire_budget(messages)
+        payload = {"model": self.model, "messages": messages, "temperature": 0, "stream": True}
+        output = []
+        probe = False
+        try:
+            probe = self._before_call()
+            client = await self._get_client()
+            async with self.limiters[operation]:
+                attempt = 0
+                while True:
+                    attempt += 1
+                    try:
+                        async with client.stream("POST", "/chat/completions", json=payload) as response:
+                            if response.status_code != 200:
+                                await response.aread()
+                                if await self._should_retry(attempt, response):
+                                    continue
+                                raise AIServiceError(
+                                    f"Chat request failed: {response.text}",
+                                    status_code=response.status_code,
+                                )
+                            self.circuit_breaker.record_success()
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[5:].strip()
+                                if data == "[DONE]":
+                                    break
+                                choices = json.loads(data).get("choices") or []
+                                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                                if delta:
+                                    output.append(delta)
+                                    yield delta
+                        return
+                    except httpx.HTTPError as e:
+                        if not output and await self._should_retry(attempt, None):
+                            continue
+                        self.circuit_breaker.record_failure()
+                        raise AIServiceError(f"Chat request failed: {e}") from e
+        finally:
+            self.circuit_breaker.release(probe)
+            # 流式响应不一定返回 usage，按估算记录（提前中断时只计已输出部分）
+            self.token_budget.record(
+                budget, estimate_message_tokens(messages), estimate_tokens("".join(output))
+            )
+
+    async def _acquire_budget(self, messages: list[dict], max_tokens: Optional[int] = None) -> list:
+        try:
+            return await self.token_budget.acquire(estimate_message_tokens(messages), max_tokens)
+        except TokenBudgetExceeded as e:
+            raise AIServiceError(str(e), status_code=413) from e
+
+    async def _post(self, operation: str, path: str, payload: dict) -> httpx.Response:
+        """
+        带调用保护的 POST：熔断检查 → 操作并发名额 → 请求（429/5xx/网络错误时退避重试）
+
+        返回最后一次响应（可能仍是错误状态码，由调用方处理）
+        """
+        probe = self._before_call()
+        try:
+            client = await self._get_client()
+            async with self.limiters[operation]:
+                attempt = 0
+                while True:
+                    attempt += 1
+                    try:
+                        response = await client.post(path, json=payload)
+                    except httpx.HTTPError as e:
+                        if await self._should_retry(attempt, None):
+                            continue
+                        self.circuit_breaker.record_failure()
+                        raise AIServiceError(f"{operation} request failed: {e}") from e
+                    if await self._should_retry(attempt, response):
+                        continue
+                    return response
+        finally:
+            # 试探调用被取消时没有记录结果，归还名额，否则熔断器会一直拒绝
+            self.circuit_breaker.release(probe)
+
+    def _before_call(self) -> bool:
+        """熔断检查，返回是否为半开状态的试探调用"""
+        try:
+            return self.circuit_breaker.before_call()
+        except CircuitOpenError as e:
+            raise AIServiceError(str(e), status_code=503) from e
+
+    async def _should_retry(self, attempt: int, response: Optional[httpx.Response]) -> bool:
+        """
+        判断是否重试，需要时退避等待；不再重试时把结果计入熔断器
+        （5xx 和网络错误算失败，其余响应说明上游可用，算成功）
+        """
+        status_code = response.status_code if response is not None else None
+        if status_code is not None and status_code not in self.retry_policy.retry_statuses:
+            self.circuit_breaker.record_success()
+            return False
+        if self.retry_policy.should_retry(attempt, status_code):
+            await self.retry_policy.backoff(attempt, response)
+            return True
+        if status_code is not None and status_code < 500:
+            self.circuit_breaker.record_success()
+        elif status_code is not None:
+            self.circuit_breaker.record_failure()
+        return False
 
     # ========== Embedding ==========
 
@@ -117,29 +604,67 @@ class AIService:
         """
         获取文本的向量表示
 
+        并发调用在几毫秒内攒成一批（或达到条数/token 上限），
+        一次批量请求后把向量分发给各调用方
+
         Args:
             text: 输入文本
 
         Returns:
             向量列表
-
-        TODO: 实现具体的 AI 调用逻辑
         """
-        raise NotImplementedError("TODO: 实现 Embedding 获取")
+        return await self._embedding_batcher.submit(text)
 
     async def get_embeddings_batch(self, texts: list[str]) -> list[list[float]]:
         """
         批量获取文本的向量表示
 
+        文本先归一化并去重，命中缓存的直接返回，只有未命中的文本调用 API；
+        未变化的媒体库重建索引不产生任何 API 调用。
+        本地后端计算比查缓存更快，直接计算不经过缓存
+
         Args:
             texts: 输入文本列表
 
         Returns:
             向量列表的列表
-
-        TODO: 实现具体的 AI 调用逻辑
         """
-        raise NotImplementedError("TODO: 实现批量 Embedding 获取")
+        normalized = [normalize_embedding_text(text) for text in texts]
+        if self._local_embedder is not None:
+            return self._local_embedder.embed(normalized).tolist()
+        unique = list(dict.fromkeys(normalized))
+
+        if self.embedding_cache:
+            cached = await self.embedding_cache.get_many(self.embedding_model, unique)
+        else:
+            cached = [None] * len(unique)
+        vectors = dict(zip(unique, cached))
+
+        missing = [text for text, vector in vectors.items() if vector is None]
+        for start in range(0, len(missing), self.embedding_batch_size):
+            batch = missing[start : start + self.embedding_batch_size]
+            fetched = await self._request_embeddings(batch)
+            if self.embedding_cache:
+                await self.embedding_cache.put_many(self.embedding_model, batch, fetched)
+            vectors.update(zip(batch, fetched))
+
+        return [np.asarray(vectors[text], dtype=np.float32).tolist() for text in normalized]
+
+    async def _request_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """调用 OpenAI 兼容的 /embeddings 接口（一次请求一批文本）"""
+        self.embedding_api_calls += 1
+        response = await self._post(
+            "embedding",
+            "/embeddings",
+            {"model": self.embedding_model, "input": texts},
+        )
+        if response.status_code != 200:
+            raise AIServiceError(
+                f"Embedding request failed: {response.text}",
+                status_code=response.status_code,
+            )
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        return [item["embedding"] for item in data]
 
 
 @lru_cache
@@ -150,4 +675,47 @@ def get_ai_service() -> AIService:
         base_url=settings.ai_api_base_url,
         model=settings.ai_model,
         embedding_model=settings.ai_embedding_model,
+        embedding_cache=EmbeddingCache(
+            path=settings.embedding_cache_path or None,
+            max_memory_items=settings.embedding_cache_memory_items,
+        ) if settings.embedding_cache_enabled else None,
+        extraction_cache=ExtractionCache(
+            path=settings.extraction_cache_path,
+            ttl=settings.extraction_cache_ttl_hours * 3600,
+            max_distance=settings.extraction_cache_max_distance,
+        ) if settings.extraction_cache_enabled else None,
+        embedding_batch_size=settings.embedding_batch_max_texts,
+        embedding_batch_wait_ms=settings.embedding_batch_wait_ms,
+        embedding_batch_max_tokens=settings.embedding_batch_max_tokens,
+        embedding_backend=settings.ai_embedding_backend,
+        sentiment_backend=settings.ai_sentiment_backend,
+        local_embedding_dimension=settings.local_embedding_dimension,
+        list_parser_enabled=settings.list_parser_enabled,
+        extraction_chunk_tokens=settings.extraction_chunk_tokens,
+        extraction_chunk_overlap_tokens=settings.extraction_chunk_overlap_tokens,
+        token_budget=TokenBudget(
+            max_prompt_tokens=settings.ai_max_prompt_tokens,
+            tokens_per_minute=settings.ai_tokens_per_minute,
+        ),
+        summary_max_comment_tokens=settings.summary_max_comment_tokens,
+        concurrency_limits={
+            "extraction": settings.ai_extraction_concurrency,
+            "sentiment": settings.ai_sentiment_concurrency,
+            "summary": settings.ai_summary_concurrency,
+            "embedding": settings.ai_embedding_concurrency,
+        },
+        retry_policy=RetryPolicy(
+            max_attempts=settings.ai_max_retries + 1,
+            base_delay=settings.ai_retry_base_delay,
+            max_delay=settings.ai_retry_max_delay,
+        ),
+        sentiment_confidence_threshold=settings.sentiment_confidence_threshold,
+        sentiment_llm_batch_size=settings.sentiment_llm_batch_size,
+        sentiment_llm_batch_wait_ms=settings.sentiment_llm_batch_wait_ms,
+        sentiment_audit_rate=settings.sentiment_audit_rate,
+        circuit_breaker=CircuitBreaker(
+            "ai",
+            failure_threshold=settings.ai_circuit_failure_threshold,
+            recovery_timeout=settings.ai_circuit_recovery_seconds,
+        ),
     )
@@ -0,0 +1,147 @@
+# Embedding 缓存
+# 以 (模型, 归一化文本哈希) 为键缓存向量，重复的标题/简介/评论不再调用 API
+# 两级：进程内 LRU + 本地 SQLite（向量以 float32 原始字节存储）
+
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_embedding_text(text: str) -> str:
+    """归一化待 embedding 的文本：全角转半角、合并空白、去首尾空白"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def embedding_cache_key(model: str, normalized_text: str) -> bytes:
+    """缓存键：模型名 + 归一化文本的 SHA-256（16 字节）"""
+    return hashlib.sha256(f"{model}\0{normalized_text}".encode("utf-8")).digest()[:16]
+
+
+class EmbeddingCache:
+    """
+    两级 embedding 缓存
+
+    - 内存：OrderedDict 实现的 LRU，保存 float32 数组
+    - 磁盘：SQLite 表 (key BLOB PRIMARY KEY, vector BLOB)，vector 为 float32 原始字节
+      1536 维向量约 6KB，十万条约 600MB
+
+    磁盘读写在线程池中执行，不阻塞事件循环
+    """
+
+    def __init__(self, path: Optional[str] = None, max_memory_items: int = 10000):
+        """
+        Args:
+            path: SQLite 文件路径，为 None 时只用内存缓存
+            max_memory_items: 内存 LRU 容量
+        """
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self._memory: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def get_many(self, model: str, texts: list[str]) -> list[Optional[np.ndarray]]:
+        """
+        批量查询缓存
+
+        Args:
+            model: embedding 模型名
+            texts: 已归一化的文本
+
+        Returns:
+            与 texts 逐项对应的向量，未命中为 None
+        """
+        keys = [embedding_cache_key(model, text) for text in texts]
+        results: list[Optional[np.ndarray]] = []
+        missing: list[int] = []
+        for i, key in enumerate(keys):
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+            else:
+                missing.append(i)
+            results.append(vector)
+
+        if missing and self.path:
+            found = await asyncio.to_thread(self._disk_get, [keys[i] for i in missing])
+            for i in missing:
+                vector = found.get(keys[i])
+                if vector is not None:
+                    results[i] = vector
+                    self._remember(keys[i], vector)
+
+        hit_count = sum(vector is not None for vector in results)
+        self.hits += hit_count
+        self.misses += len(results) - hit_count
+        return results
+
+    async def put_many(self, model: str, texts: list[str], vectors) -> None:
+        """批量写入缓存（texts 须已归一化）"""
+        entries = []
+        for text, vector in zip(texts, vectors):
+            key = embedding_cache_key(model, text)
+            vector = np.asarray(vector, dtype=np.float32)
+            self._remember(key, vector)
+            entries.append((key, vector.tobytes()))
+        if entries and self.path:
+            await asyncio.to_thread(self._disk_put, entries)
+
+    def close(self) -> None:
+        with self._disk_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ========== 内部方法 ==========
+
+    def _remember(self, key: bytes, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+        return self._conn
+
+    def _disk_get(self, keys: list[bytes]) -> dict[bytes, np.ndarray]:
+        found = {}
+        with self._disk_lock:
+            conn = self._connect()
+            # SQLite 默认最多 999 个绑定参数
+            for start in range(0, len(keys), 900):
+                chunk = keys[start : start + 900]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                )
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def _disk_put(self, entries: list[tuple[bytes, bytes]]) -> None:
+        with self._disk_lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", entries
+                )
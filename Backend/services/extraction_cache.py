@@ -0,0 +1,182 @@
+# 提取结果缓存
+# 同一篇博文/榜单被反复粘贴时，直接复用 extract_media_info 的结构化结果
+# 精确匹配：归一化内容哈希；近似匹配：64 位 SimHash，汉明距离不超过阈值即命中
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Optional
+
+import numpy as np
+
+
+_WHITESPACE = re.compile(r"\s+")
+_SHINGLE_TOKEN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]|[a-z0-9]+")
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 8  # 64 位切成 8 段，每段 8 位；距离 <= 7 时至少有一段完全相同
+
+
+def normalize_content(text: str) -> str:
+    """归一化粘贴内容：全角转半角、小写、合并空白"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text).lower()).strip()
+
+
+def content_hash(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def simhash(normalized: str, shingle_size: int = 3) -> int:
+    """
+    64 位 SimHash
+
+    特征为连续 shingle_size 个词元（中日韩按字、其余按词）的 shingle，
+    轻微改动（加减几行、改错字）只影响少数特征，指纹仅有少数位不同
+    """
+    tokens = _SHINGLE_TOKEN.findall(normalized)
+    if len(tokens) < shingle_size:
+        tokens = tokens + [""] * (shingle_size - len(tokens))
+    shingles = {
+        "\x1f".join(tokens[i : i + shingle_size])
+        for i in range(len(tokens) - shingle_size + 1)
+    }
+    digests = b"".join(
+        hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles
+    )
+    # 每个 shingle 的 64 位展开为 0/1，按位投票
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    return int.from_bytes(np.packbits(votes > 0, bitorder="little").tobytes(), "little")
+
+
+def simhash_bands(fingerprint: int) -> list[int]:
+    width = SIMHASH_BITS // SIMHASH_BANDS
+    mask = (1 << width) - 1
+    return [fingerprint >> (band * width) & mask for band in range(SIMHASH_BANDS)]
+
+
+class ExtractionCache:
+    """
+    extract_media_info 结果缓存（本地 SQLite）
+
+    - 键：归一化内容的 SHA-256
+    - version：提示词 + 模型的哈希，任一变化后旧结果自动失效
+    - TTL：超过 ttl 秒的结果不再返回（查询时过滤，写入时顺带清理）
+    - 近似重复：SimHash 分段建索引，任一段相同即为候选，再按汉明距离过滤
+    """
+
+    def __init__(self, path: str, ttl: float = 30 * 86400, max_distance: int = 6):
+        """
+        Args:
+            path: SQLite 文件路径
+            ttl: 结果有效期（秒）
+            max_distance: 近似命中允许的最大汉明距离（不超过 SIMHASH_BANDS - 1 时可保证召回）
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    async def get(self, text: str, version: str) -> Optional[dict]:
+        """查询缓存，未命中返回 None"""
+        normalized = normalize_content(text)
+        result = await asyncio.to_thread(self._get, normalized, version)
+        if result is None:
+            self.misses += 1
+        return result
+
+    async def put(self, text: str, version: str, result: dict) -> None:
+        """写入提取结果"""
+        normalized = normalize_content(text)
+        await asyncio.to_thread(self._put, normalized, version, result)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ========== 内部方法 ==========
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            band_columns = ", ".join(f"band{i} INTEGER NOT NULL" for i in range(SIMHASH_BANDS))
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS extractions ("
+                "key TEXT NOT NULL, version TEXT NOT NULL, simhash INTEGER NOT NULL, "
+                f"{band_columns}, created_at REAL NOT NULL, result TEXT NOT NULL, "
+                "PRIMARY KEY (key, version))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_extractions_created ON extractions(created_at)"
+            )
+            for i in range(SIMHASH_BANDS):
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_extractions_band{i} ON extractions(version, band{i})"
+                )
+        return self._conn
+
+    def _get(self, normalized: str, version: str) -> Optional[dict]:
+        oldest = time.time() - self.ttl
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT result FROM extractions WHERE key = ? AND version = ? AND created_at >= ?",
+                (content_hash(normalized), version, oldest),
+            ).fetchone()
+            if row is not None:
+                self.exact_hits += 1
+                return json.loads(row[0])
+
+            fingerprint = simhash(normalized)
+            bands = simhash_bands(fingerprint)
+            band_filter = " OR ".join(f"band{i} = ?" for i in range(SIMHASH_BANDS))
+            rows = conn.execute(
+                f"SELECT simhash, result FROM extractions "
+                f"WHERE version = ? AND created_at >= ? AND ({band_filter})",
+                (version, oldest, *bands),
+            ).fetchall()
+
+        best = None
+        for stored, result in rows:
+            distance = bin((stored & (2**64 - 1)) ^ fingerprint).count("1")
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, result)
+        if best is None:
+            return None
+        self.near_hits += 1
+        return json.loads(best[1])
+
+    def _put(self, normalized: str, version: str, result: dict) -> None:
+        fingerprint = simhash(normalized)
+        # SQLite INTEGER 为有符号 64 位
+        signed = fingerprint - 2**64 if fingerprint >= 2**63 else fingerprint
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM extractions WHERE created_at < ?", (now - self.ttl,))
+                conn.execute(
+                    f"INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, {', '.join('?' * SIMHASH_BANDS)}, ?, ?)",
+                    (
+                        content_hash(normalized),
+                        version,
+                        signed,
+                        *simhash_bands(fingerprint),
+                        now,
+                        json.dumps(result, ensure_ascii=False),
+                    ),
+                )
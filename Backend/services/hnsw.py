@@ -0,0 +1,365 @@
+# HNSW 近似最近邻索引
+# 为本地向量数据库提供分层可导航小世界图（Hierarchical Navigable Small World）检索
+
+import math
+from typing import Optional
+
+import numpy as np
+
+
+class HNSWIndex:
+    """
+    HNSW 图索引
+
+    节点编号即向量矩阵中的行号，索引本身不保存向量，
+    通过 attach() 绑定外部（可能是内存映射的）矩阵。
+    向量须为 L2 归一化，距离定义为 1 - 内积。
+
+    参考: Malkov & Yashunin, "Efficient and robust approximate nearest
+    neighbor search using Hierarchical Navigable Small World graphs"
+    """
+
+    # 单轮扩展的候选节点数：NumPy 实现中每轮的固定开销远大于多算几个距离，
+    # 一轮多扩展一些候选可减少轮数，同时略微提高召回率
+    EXPAND_BATCH = 32
+
+    def __init__(
+        self,
+        M: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 128,
+        seed: int = 42,
+    ):
+        self.M = M
+        self.M0 = M * 2  # 第 0 层允许的最大度数
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._level_mult = 1.0 / math.log(max(M, 2))
+        self._rng = np.random.default_rng(seed)
+
+        self._vectors: Optional[np.ndarray] = None
+        self._levels = np.zeros(0, dtype=np.int8)  # -1 表示节点不在图中
+        self._links0 = np.zeros((0, self.M0), dtype=np.int32)
+        self._deg0 = np.zeros(0, dtype=np.int16)
+        self._upper: list[dict[int, list[int]]] = []  # 第 1 层起的邻接表
+        self._entry_point = -1
+        self._max_level = -1
+        self._size = 0
+        self._visit_marks = np.zeros(0, dtype=np.uint32)
+        self._visit_epoch = 0
+        self._slots = np.zeros(0, dtype=np.int32)  # 去重用的散列槽，见 _search_layer
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        """可容纳的节点编号上限（节点编号即向量矩阵的行号）"""
+        return len(self._levels)
+
+    def attach(self, vectors: np.ndarray) -> None:
+        """绑定向量矩阵（矩阵扩容后需重新绑定）"""
+        # 去掉 memmap 子类包装，避免热路径上的额外开销
+        self._vectors = np.asarray(vectors).view(np.ndarray)
+        self._reserve(len(vectors))
+
+    # ========== 构建 ==========
+
+    def add(self, node: int) -> None:
+        """插入一个节点（对应矩阵中的一行）"""
+        self._reserve(node + 1)
+        if self._levels[node] >= 0:
+            raise ValueError(f"Node {node} already in index")
+
+        level = int(-math.log(1.0 - self._rng.random()) * self._level_mult)
+        self._levels[node] = level
+        self._deg0[node] = 0
+        while len(self._upper) < level:
+            self._upper.append({})
+        for lc in range(1, level + 1):
+            self._upper[lc - 1][node] = []
+
+        self._size += 1
+        if self._entry_point < 0:
+            self._entry_point = node
+            self._max_level = level
+            return
+
+        query = self._vectors[node]
+        entry = [(self._distance(query, self._entry_point), self._entry_point)]
+
+        for lc in range(self._max_level, level, -1):
+            entry = self._search_layer(query, entry, 1, lc)
+
+        for lc in range(min(level, self._max_level), -1, -1):
+            candidates = self._search_layer(query, entry, self.ef_construction, lc)
+            max_degree = self.M0 if lc == 0 else self.M
+            neighbors = self._select_neighbors(candidates, self.M)
+            self._set_links(node, lc, neighbors)
+            for neighbor in neighbors:
+                self._connect(neighbor, node, lc, max_degree)
+            entry = candidates
+
+        if level > self._max_level:
+            self._entry_point = node
+            self._max_level = level
+
+    def add_many(self, nodes) -> None:
+        """批量插入节点"""
+        for node in nodes:
+            self.add(int(node))
+
+    # ========== 查询 ==========
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        ef: Optional[int] = None,
+        allowed: Optional[np.ndarray] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        近似 top-k 搜索
+
+        Args:
+            query: 归一化查询向量
+            top_k: 返回数量
+            ef: 搜索宽度，默认 ef_search
+            allowed: 行掩码，False 的节点仍参与导航但不进入结果（墓碑/过滤）
+
+        Returns:
+            (行号数组, 相似度数组)，按相似度降序
+        """
+        if self._entry_point < 0 or top_k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        ef = max(ef or self.ef_search, top_k)
+        entry = [(self._distance(query, self._entry_point), self._entry_point)]
+        for lc in range(self._max_level, 0, -1):
+            entry = self._search_layer(query, entry, 1, lc)
+
+        results = self._search_layer(query, entry, ef, 0, allowed)[:top_k]
+        rows = np.fromiter((node for _, node in results), dtype=np.int64, count=len(results))
+        scores = np.fromiter((1.0 - d for d, _ in results), dtype=np.float32, count=len(results))
+        return rows, scores
+
+    # ========== 序列化 ==========
+
+    def save(self, path: str) -> None:
+        """保存图结构到 .npz 文件"""
+        upper_nodes, upper_levels, upper_offsets, upper_links = [], [], [0], []
+        for lc, layer in enumerate(self._upper, start=1):
+            for node, links in layer.items():
+                upper_nodes.append(node)
+                upper_levels.append(lc)
+                upper_links.extend(links)
+                upper_offsets.append(len(upper_links))
+
+        n = len(self._levels)
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                params=np.array(
+                    [self.M, self.ef_construction, self.ef_search,
+                     self._entry_point, self._max_level, self._size],
+                    dtype=np.int64,
+                ),
+                levels=self._levels,
+                links0=self._links0[:n],
+                deg0=self._deg0,
+                upper_nodes=np.array(upper_nodes, dtype=np.int32),
+                upper_levels=np.array(upper_levels, dtype=np.int8),
+                upper_offsets=np.array(upper_offsets, dtype=np.int64),
+                upper_links=np.array(upper_links, dtype=np.int32),
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "HNSWIndex":
+        """从 .npz 文件加载图结构"""
+        with np.load(path) as data:
+            M, ef_construction, ef_search, entry_point, max_level, size = (
+                int(v) for v in data["params"]
+            )
+            index = cls(M=M, ef_construction=ef_construction, ef_search=ef_search)
+            index._levels = data["levels"].copy()
+            index._links0 = data["links0"].copy()
+            index._deg0 = data["deg0"].copy()
+            index._visit_marks = np.zeros(len(index._levels), dtype=np.uint32)
+            index._slots = np.zeros(len(index._levels), dtype=np.int32)
+            index._entry_point = entry_point
+            index._max_level = max_level
+            index._size = size
+            index._upper = [{} for _ in range(max(max_level, 0))]
+
+            offsets = data["upper_offsets"]
+            links = data["upper_links"]
+            for i, (node, lc) in enumerate(zip(data["upper_nodes"], data["upper_levels"])):
+                index._upper[lc - 1][int(node)] = links[offsets[i] : offsets[i + 1]].tolist()
+        return index
+
+    # ========== 内部方法 ==========
+
+    def _reserve(self, capacity: int) -> None:
+        """保证节点数组容量"""
+        current = len(self._levels)
+        if capacity <= current:
+            return
+        capacity = max(capacity, current * 2)
+        grow = capacity - current
+        self._levels = np.concatenate([self._levels, np.full(grow, -1, dtype=np.int8)])
+        self._links0 = np.concatenate(
+            [self._links0, np.full((grow, self.M0), -1, dtype=np.int32)]
+        )
+        self._deg0 = np.concatenate([self._deg0, np.zeros(grow, dtype=np.int16)])
+        self._visit_marks = np.concatenate(
+            [self._visit_marks, np.zeros(grow, dtype=np.uint32)]
+        )
+        self._slots = np.concatenate([self._slots, np.zeros(grow, dtype=np.int32)])
+
+    def _distance(self, query: np.ndarray, node: int) -> float:
+        return 1.0 - float(self._vectors[node] @ query)
+
+    def _neighbors(self, node: int, level: int):
+        if level == 0:
+            return self._links0[node, : self._deg0[node]].tolist()
+        return self._upper[level - 1][node]
+
+    def _set_links(self, node: int, level: int, links: list[int]) -> None:
+        if level == 0:
+            self._links0[node, : len(links)] = links
+            self._links0[node, len(links) :] = -1
+            self._deg0[node] = len(links)
+        else:
+            self._upper[level - 1][node] = list(links)
+
+    def _search_layer(
+        self,
+        query: np.ndarray,
+        entry: list[tuple[float, int]],
+        ef: int,
+        level: int,
+        allowed: Optional[np.ndarray] = None,
+    ) -> list[tuple[float, int]]:
+        """
+        单层 beam 搜索
+
+        候选集和结果集都以 NumPy 数组维护，每轮扩展多个最近候选，
+        把 Python 层循环压缩为少量向量化操作
+
+        Returns:
+            [(距离, 节点)]，按距离升序，最多 ef 个
+        """
+        # 访问标记使用递增的 epoch，避免每次查询分配 O(n) 的 visited 数组
+        self._visit_epoch += 1
+        epoch = self._visit_epoch
+        marks = self._visit_marks
+        slots = self._slots
+
+        cand_d = np.array([d for d, _ in entry], dtype=np.float32)
+        cand_n = np.array([n for _, n in entry], dtype=np.int64)
+        marks[cand_n] = epoch
+        keep = np.ones(len(cand_n), dtype=bool) if allowed is None else allowed[cand_n].astype(bool)
+        res_d, res_n = cand_d[keep], cand_n[keep]
+
+        vectors = self._vectors
+        batch = self.EXPAND_BATCH
+        while len(cand_d):
+            bound = res_d.max() if len(res_d) >= ef else np.inf
+
+            if len(cand_d) > batch:
+                take = np.argpartition(cand_d, batch - 1)[:batch]
+            else:
+                take = np.arange(len(cand_d))
+            take = take[cand_d[take] <= bound]
+            if not len(take):
+                break
+            expand = cand_n[take]
+            rest = np.ones(len(cand_d), dtype=bool)
+            rest[take] = False
+            cand_d, cand_n = cand_d[rest], cand_n[rest]
+
+            if level == 0:
+                neighbors = self._links0[expand].ravel()
+            else:
+                neighbors = np.fromiter(
+                    (n for node in expand.tolist() for n in self._upper[level - 1][node]),
+                    dtype=np.int32,
+                )
+            neighbors = neighbors[neighbors >= 0]
+            neighbors = neighbors[marks[neighbors] != epoch]
+            if not len(neighbors):
+                continue
+            # 同一轮扩展的邻居可能重复：按节点散列写入位置，只保留最后写入的那个（比排序去重快）
+            positions = np.arange(len(neighbors), dtype=np.int32)
+            slots[neighbors] = positions
+            fresh = neighbors[slots[neighbors] == positions]
+            marks[fresh] = epoch
+
+            distances = 1.0 - vectors[fresh] @ query
+            if len(res_d) >= ef:
+                closer = distances < bound
+                fresh, distances = fresh[closer], distances[closer]
+                if not len(fresh):
+                    continue
+
+            cand_d = np.concatenate([cand_d, distances])
+            cand_n = np.concatenate([cand_n, fresh])
+
+            if allowed is not None:
+                ok = allowed[fresh].astype(bool)
+                fresh, distances = fresh[ok], distances[ok]
+            res_d = np.concatenate([res_d, distances])
+            res_n = np.concatenate([res_n, fresh])
+            if len(res_d) > ef:
+                best = np.argpartition(res_d, ef - 1)[:ef]
+                res_d, res_n = res_d[best], res_n[best]
+                # 比当前第 ef 近还远的候选不可能再改进结果
+                within = cand_d <= res_d.max()
+                cand_d, cand_n = cand_d[within], cand_n[within]
+
+        order = np.argsort(res_d)
+        return list(zip(res_d[order].tolist(), res_n[order].tolist()))
+
+    def _select_neighbors(self, candidates: list[tuple[float, int]], m: int) -> list[int]:
+        """
+        启发式邻居选择
+
+        候选按距离升序遍历，仅保留离查询点比离已选邻居更近的节点，
+        使邻居分布在不同方向上，保证图的连通性
+        """
+        if len(candidates) <= m:
+            return [node for _, node in candidates]
+
+        nodes = np.fromiter((node for _, node in candidates), dtype=np.int64, count=len(candidates))
+        dists = np.fromiter((d for d, _ in candidates), dtype=np.float32, count=len(candidates))
+        block = self._vectors[nodes]
+        pairwise = 1.0 - block @ block.T
+
+        # 每选中一个邻居，就屏蔽离它比离查询点更近的候选
+        blocked = np.zeros(len(nodes), dtype=bool)
+        chosen = np.zeros(len(nodes), dtype=bool)
+        picked = 0
+        for i in range(len(nodes)):
+            if blocked[i]:
+                continue
+            chosen[i] = True
+            picked += 1
+            if picked >= m:
+                break
+            blocked |= pairwise[i] < dists
+
+        # 启发式过滤过多时用最近的候选补足
+        if picked < m:
+            chosen[np.flatnonzero(~chosen)[: m - picked]] = True
+        return nodes[chosen].tolist()
+
+    def _connect(self, node: int, new_neighbor: int, level: int, max_degree: int) -> None:
+        """添加反向连接，超出度数上限时重新裁剪"""
+        links = self._neighbors(node, level) + []
+        links.append(new_neighbor)
+        if len(links) > max_degree:
+            base = self._vectors[node]
+            distances = 1.0 - self._vectors[links] @ base
+            candidates = sorted(zip(distances.tolist(), links))
+            links = self._select_neighbors(candidates, max_degree)
+        self._set_links(node, level, links)
@@ -0,0 +1,105 @@
+# 收集箱处理进度事件
+# worker 在各处理阶段发布事件，SSE 接口订阅后实时推送给客户端（进程内广播）
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+
+# 终止事件：收到后订阅结束
+TERMINAL_STAGES = frozenset({"done", "failed"})
+
+
+class InboxEventBroker:
+    """
+    进程内事件广播
+
+    - 每个收集箱条目保留最近 history_size 个事件，晚到的订阅者先收到历史再收实时事件
+    - 终止事件发布 retention 秒后清理历史；没有等到终止事件的（worker 崩溃、
+      其他进程接手）超过 idle_ttl 秒没有新事件时清理，最多保留 max_items 个条目的历史
+    - 订阅者队列满（客户端太慢）时丢弃最旧的事件
+
+    只覆盖本进程 worker 发布的事件；其他进程处理的条目由 SSE 接口轮询数据库兜底
+    """
+
+    def __init__(
+        self,
+        history_size: int = 100,
+        retention: float = 300.0,
+        queue_size: int = 256,
+        idle_ttl: float = 3600.0,
+        max_items: int = 10000,
+    ):
+        self.history_size = history_size
+        self.retention = retention
+        self.queue_size = queue_size
+        self.idle_ttl = idle_ttl
+        self.max_items = max_items
+        # 按最近事件时间排序：inbox_id -> (最近事件时间, 事件)
+        self._history: OrderedDict[int, tuple[float, deque]] = OrderedDict()
+        self._subscribers: dict[int, set[asyncio.Queue]] = {}
+
+    def publish(self, inbox_id: int, stage: str, **data) -> dict:
+        """发布事件，返回事件内容 {"inbox_id", "stage", ...}"""
+        event = {"inbox_id": inbox_id, "stage": stage, **data}
+        now = time.monotonic()
+        entry = self._history.pop(inbox_id, None)
+        history = entry[1] if entry is not None else deque(maxlen=self.history_size)
+        if stage == "queued":
+            # 重新排队（手动重新处理）时从头记录
+            history.clear()
+        history.append(event)
+        self._history[inbox_id] = (now, history)
+        self._prune(now)
+        for queue in self._subscribers.get(inbox_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+        if stage in TERMINAL_STAGES:
+            asyncio.get_running_loop().call_later(self.retention, self._expire, inbox_id, event)
+        return event
+
+    def history(self, inbox_id: int) -> list[dict]:
+        entry = self._history.get(inbox_id)
+        return list(entry[1]) if entry is not None else []
+
+    @asynccontextmanager
+    async def subscribe(self, inbox_id: int) -> AsyncIterator[asyncio.Queue]:
+        """订阅条目的实时事件（不含历史，历史用 history 获取）"""
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self._subscribers.setdefault(inbox_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(inbox_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[inbox_id]
+
+    def _expire(self, inbox_id: int, event: dict) -> None:
+        entry = self._history.get(inbox_id)
+        # 期间又有新事件（重新处理）时不清理
+        if entry is not None and entry[1][-1] is event:
+            del self._history[inbox_id]
+
+    def _prune(self, now: float) -> None:
+        """清理长时间没有新事件的历史，并限制条目数（最久未更新的先清理）"""
+        while self._history:
+            inbox_id, (updated_at, _) = next(iter(self._history.items()))
+            if len(self._history) <= self.max_items and now - updated_at <= self.idle_ttl:
+                break
+            del self._history[inbox_id]
+
+
+_broker: Optional[InboxEventBroker] = None
+
+
+def get_inbox_event_broker() -> InboxEventBroker:
+    """获取进程内事件广播单例"""
+    global _broker
+    if _broker is None:
+        _broker = InboxEventBroker()
+    return _broker
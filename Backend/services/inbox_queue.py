@@ -0,0 +1,576 @@
+# 收集箱处理队列
+# 提交后立即返回，由 worker 池异步处理：提取 → 标题匹配 → 创建/更新媒体和评论 → 重新评分
+# 队列即 inbox_items 表，worker 用 SELECT ... FOR UPDATE SKIP LOCKED 领取，可多进程横向扩展
+
+import asyncio
+import json
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Optional
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database.connection import get_db
+from ..models.comment import Comment, CommentSource
+from ..models.inbox import InboxItem, InboxStatus
+from ..models.media import MediaItem, MediaType
+from .ai import AIService, get_ai_service
+from .extraction_cache import content_hash, normalize_content
+from .inbox_events import get_inbox_event_broker
+from .indexing import get_media_indexer
+from .list_parser import title_key
+from .scoring import ScoringService, get_scoring_service
+from .title_matcher import TitleMatcher, get_title_matcher
+from .title_resolver import TitleResolver, get_title_resolver, parse_release_date
+from .url_fetcher import UrlFetcher, get_url_fetcher
+
+logger = logging.getLogger(__name__)
+
+
+class InboxQueue:
+    """
+    基于 inbox_items 表的持久化任务队列
+
+    - 可领取：status=pending 且到了重试时间；或 status=processing 但租约已过期（worker 崩溃）
+    - 领取：FOR UPDATE SKIP LOCKED，多个 worker / 进程并发领取互不阻塞、不会重复
+    - 失败：记录 processing_error，按指数退避重新排队，max_attempts 次后标记 failed
+    - 去重：提交时按归一化内容哈希查找，保留期内的重复提交直接复用已有条目
+    """
+
+    def __init__(
+        self,
+        lease_seconds: float = 600,
+        max_attempts: int = 3,
+        retry_base_delay: float = 30.0,
+    ):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+
+    async def submit(
+        self,
+        db: AsyncSession,
+        content: str,
+        url: Optional[str] = None,
+    ) -> tuple[InboxItem, bool]:
+        """
+        提交内容（提交事务由调用方负责）
+
+        Returns:
+            (条目, 是否为重复提交)；重复时返回已有条目及其处理结果，
+            已有条目处理失败的会重新排队，已过期的删除后按新提交处理
+        """
+        # 只提交链接时按 URL 去重
+        digest = content_hash(normalize_content(content) if content.strip() else f"url:{url}")
+        existing = (
+            await db.execute(select(InboxItem).where(InboxItem.content_hash == digest))
+        ).scalar_one_or_none()
+        if existing is not None:
+            if not existing.is_expired:
+                if existing.status == InboxStatus.FAILED.value:
+                    self.requeue(existing)
+                return existing, True
+            await db.delete(existing)
+            await db.flush()
+
+        item = InboxItem(raw_content=content, url=url, content_hash=digest)
+        try:
+            async with db.begin_nested():
+                db.add(item)
+        except IntegrityError:
+            # 并发的相同提交已先插入
+            existing = (
+                await db.execute(select(InboxItem).where(InboxItem.content_hash == digest))
+            ).scalar_one()
+            return existing, True
+        return item, False
+
+    def requeue(self, item: InboxItem) -> None:
+        """重新排队（重置尝试次数）"""
+        item.status = InboxStatus.PENDING.value
+        item.attempts = 0
+        item.next_attempt_at = None
+        item.processing_error = None
+
+    async def claim(
+        self,
+        db: AsyncSession,
+        worker_id: str,
+        limit: int = 1,
+        inbox_id: Optional[int] = None,
+    ) -> list[InboxItem]:
+        """
+        领取待处理条目（调用方提交事务后行锁释放，条目保持 processing 状态）
+
+        Args:
+            inbox_id: 指定条目（手动触发处理）；此时已完成/失败的条目也可重新领取
+        """
+        now = datetime.utcnow()
+        lease_expired = and_(
+            InboxItem.status == InboxStatus.PROCESSING.value,
+            InboxItem.locked_at < now - timedelta(seconds=self.lease_seconds),
+        )
+        if inbox_id is None:
+            claimable = or_(
+                and_(
+                    InboxItem.status == InboxStatus.PENDING.value,
+                    or_(InboxItem.next_attempt_at.is_(None), InboxItem.next_attempt_at <= now),
+                ),
+                lease_expired,
+            )
+        else:
+            claimable = and_(
+                InboxItem.id == inbox_id,
+                or_(InboxItem.status != InboxStatus.PROCESSING.value, lease_expired),
+            )
+        stmt = (
+            select(InboxItem)
+            .where(claimable)
+            .order_by(InboxItem.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        items = list((await db.execute(stmt)).scalars())
+        for item in items:
+            item.status = InboxStatus.PROCESSING.value
+            item.locked_by = worker_id
+            item.locked_at = now
+            item.attempts = (item.attempts or 0) + 1
+        await db.flush()
+        return items
+
+    def complete(self, item: InboxItem) -> None:
+        item.status = InboxStatus.DONE.value
+        item.processed = True
+        item.processing_error = None
+        item.locked_by = None
+        item.locked_at = None
+
+    def fail(self, item: InboxItem, error: str) -> None:
+        """记录错误；未达到最大次数时退避后重新排队"""
+        item.processing_error = error
+        item.locked_by = None
+        item.locked_at = None
+        if (item.attempts or 0) >= self.max_attempts:
+            item.status = InboxStatus.FAILED.value
+            return
+        item.status = InboxStatus.PENDING.value
+        delay = self.retry_base_delay * 2 ** max(0, (item.attempts or 1) - 1)
+        item.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+
+class PreparedItem:
+    """网络阶段的结果：抓取的正文、提取结果、本地库匹配和 TMDB 解析结果（与标题逐项对应）"""
+
+    def __init__(
+        self,
+        fetched_content: Optional[str],
+        extraction: dict,
+        matches: list[Optional[dict]],
+        resolutions: list[Optional[dict]],
+    ):
+        self.fetched_content = fetched_content
+        self.extraction = extraction
+        self.matches = matches
+        self.resolutions = resolutions
+
+
+class InboxProcessor:
+    """
+    收集箱条目处理流程
+
+    网络阶段（prepare，不持有数据库会话）：
+    0. 只提交了链接时，UrlFetcher 下载页面并提取正文
+    1. AIService.extract_media_info 提取标题和评论
+    2. TitleMatcher 批量匹配已有条目；未匹配的标题由 TitleResolver 批量解析为 TMDB 条目
+
+    写库阶段（apply，在调用方的短事务内，失败时整体回滚）：
+    3. TMDB ID 已在库中的（译名/原名不同）归入已有条目；匹配到的条目 mention_count + 1，
+       未匹配的新建条目（带 TMDB 信息；解析不到时类型默认为电影），评论保存为 imported
+    4. 重新计算涉及条目的情感分数（评论均值）和优先级分数
+
+    LLM / 抓取 / TMDB 调用可能持续数十秒，分成两个阶段避免 worker 在此期间占用连接池连接和行锁
+    """
+
+    def __init__(
+        self,
+        ai: AIService,
+        scoring: ScoringService,
+        fetcher: Optional[UrlFetcher] = None,
+        resolver: Optional[TitleResolver] = None,
+    ):
+        self.ai = ai
+        self.scoring = scoring
+        self.fetcher = fetcher
+        self.resolver = resolver
+
+    async def prepare(
+        self,
+        matcher: TitleMatcher,
+        content: str,
+        url: Optional[str],
+        progress: Optional[Callable[..., object]] = None,
+    ) -> PreparedItem:
+        """
+        网络阶段：抓取、提取、匹配、解析（不访问数据库）
+
+        Args:
+            matcher: 已加载的标题匹配器
+            progress: 进度回调 progress(stage, **data)，
+                stage 依次为 fetching / fetched（只提交链接时）/ extracting /
+                resolving（每个标题匹配或解析出结果时一次）；
+                事务提交前不发布媒体条目 ID（回滚后这些 ID 不存在）
+        """
+        progress = progress or (lambda stage, **data: None)
+        fetched_content = None
+        if not content.strip() and url and self.fetcher is not None:
+            progress("fetching", url=url)
+            page = await self.fetcher.fetch(url)
+            content = fetched_content = page["text"]
+            progress(
+                "fetched",
+                url=page["final_url"],
+                title=page["title"],
+                truncated=page["truncated"],
+                cached=page["cached"],
+            )
+        progress("extracting")
+        extraction = await self.ai.extract_media_info(content)
+        titles = extraction["titles"]
+        years = extraction.get("years") or {}
+
+        matches = await matcher.match_many(titles, [years.get(title) for title in titles])
+        resolutions = await self._resolve_unmatched(titles, years, matches, progress)
+        return PreparedItem(fetched_content, extraction, matches, resolutions)
+
+    async def apply(
+        self,
+        db: AsyncSession,
+        item: InboxItem,
+        prepared: PreparedItem,
+        progress: Optional[Callable[..., object]] = None,
+    ) -> tuple[dict, list[MediaItem]]:
+        """
+        写库阶段：创建/更新媒体条目和评论并重新评分（在调用方的事务内）
+
+        Args:
+            progress: 进度回调，发布 scoring
+
+        Returns:
+            (处理结果 {"created_media_ids", "updated_media_ids", "errors"}, 新建的媒体条目)
+        """
+        progress = progress or (lambda stage, **data: None)
+        if prepared.fetched_content is not None:
+            item.raw_content = prepared.fetched_content
+        extraction = prepared.extraction
+        titles = extraction["titles"]
+        by_tmdb_id = await self._media_by_tmdb_id(db, prepared.resolutions)
+
+        media_by_key: dict[str, MediaItem] = {}
+        touched: dict[int, MediaItem] = {}
+        created: list[MediaItem] = []
+        for title, match, resolution in zip(titles, prepared.matches, prepared.resolutions):
+            media = None
+            if match is not None:
+                # 匹配之后条目可能已被删除，此时按未匹配处理
+                media = touched.get(match["media_id"]) or await db.get(MediaItem, match["media_id"])
+            if media is None and resolution is not None:
+                media = by_tmdb_id.get(resolution["tmdb_id"])
+            if media is None:
+                media = self._new_media(title, resolution)
+                db.add(media)
+                created.append(media)
+                if resolution is not None:
+                    by_tmdb_id[resolution["tmdb_id"]] = media
+            elif media.id is not None and media.id not in touched:  # id 为空的是本批新建的条目
+                media.mention_count = (media.mention_count or 0) + 1
+                touched[media.id] = media
+            media_by_key[title_key(title)] = media
+        await db.flush()
+        touched.update({media.id: media for media in created})
+        created_ids = {media.id for media in created}
+
+        errors = []
+        for comment in extraction["comments"]:
+            media = media_by_key.get(title_key(comment["title"]))
+            if media is None:
+                errors.append(f"评论对应的作品不在提取结果中：{comment['title']}")
+                continue
+            db.add(Comment(
+                media_id=media.id,
+                content=comment["comment"],
+                source=CommentSource.IMPORTED,
+                source_url=item.url,
+                sentiment_score=comment["sentiment"],
+            ))
+        await db.flush()
+
+        progress("scoring", total=len(touched))
+        await self._rescore(db, list(touched.values()))
+
+        item.extracted_titles = json.dumps(titles, ensure_ascii=False)
+        item.extracted_comments = json.dumps(extraction["comments"], ensure_ascii=False)
+        result = {
+            "created_media_ids": [media.id for media in created],
+            "updated_media_ids": [media_id for media_id in touched if media_id not in created_ids],
+            "errors": errors,
+        }
+        return result, created
+
+    async def after_commit(self, db: AsyncSession, created: list[MediaItem]) -> None:
+        """事务提交后把新条目加入标题索引和向量索引（向量索引失败由相似图任务补齐）"""
+        if not created:
+            return
+        (await get_title_matcher(db)).add_media(created)
+        try:
+            await (await get_media_indexer()).index_media(created)
+        except Exception:
+            logger.exception("Indexing new media failed: %s", [media.id for media in created])
+
+    async def _resolve_unmatched(
+        self,
+        titles: list[str],
+        years: dict,
+        matches: list[Optional[dict]],
+        progress: Callable[..., object],
+    ) -> list[Optional[dict]]:
+        """
+        本地库未匹配的标题批量解析为 TMDB 条目，返回与 titles 逐项对应的结果
+
+        每个标题有结果时发布一次 resolving：本地库匹配的立即发布，其余随 TMDB 查询逐个完成发布
+        """
+        resolved_count = 0
+
+        def report(index: int, source: Optional[str], tmdb_id: Optional[int] = None) -> None:
+            nonlocal resolved_count
+            resolved_count += 1
+            progress(
+                "resolving",
+                resolved=resolved_count,
+                total=len(titles),
+                title=titles[index],
+                source=source,
+                tmdb_id=tmdb_id,
+            )
+
+        resolutions: list[Optional[dict]] = [None] * len(titles)
+        unmatched = []
+        for index, match in enumerate(matches):
+            if match is not None:
+                report(index, "library")
+            elif self.resolver is None:
+                report(index, None)
+            else:
+                unmatched.append(index)
+        if not unmatched:
+            return resolutions
+
+        def on_resolved(position: int, resolution: Optional[dict]) -> None:
+            if resolution is None:
+                report(unmatched[position], None)
+            else:
+                report(unmatched[position], "tmdb", resolution["tmdb_id"])
+
+        resolved = await self.resolver.resolve_many(
+            [titles[index] for index in unmatched],
+            [years.get(titles[index]) for index in unmatched],
+            on_resolved,
+        )
+        for index, resolution in zip(unmatched, resolved):
+            resolutions[index] = resolution
+        return resolutions
+
+    @staticmethod
+    async def _media_by_tmdb_id(db: AsyncSession, resolutions: list[Optional[dict]]) -> dict[int, MediaItem]:
+        tmdb_ids = {resolution["tmdb_id"] for resolution in resolutions if resolution is not None}
+        if not tmdb_ids:
+            return {}
+        rows = (await db.execute(select(MediaItem).where(MediaItem.tmdb_id.in_(tmdb_ids)))).scalars().all()
+        return {media.tmdb_id: media for media in rows}
+
+    @staticmethod
+    def _new_media(title: str, resolution: Optional[dict]) -> MediaItem:
+        """新建条目；解析到 TMDB 条目时用 TMDB 的标题和信息，提取出的标题和原名记为别名"""
+        if resolution is None:
+            return MediaItem(title=title, mention_count=1)
+        aliases: dict[str, str] = {}
+        for name in (title, resolution["original_title"]):
+            if name and title_key(name) != title_key(resolution["title"]):
+                aliases.setdefault(title_key(name), name)
+        poster_path = resolution["poster_path"]
+        return MediaItem(
+            title=resolution["title"],
+            aliases=json.dumps(list(aliases.values()), ensure_ascii=False) if aliases else None,
+            type=MediaType.TV if resolution["media_type"] == "tv" else MediaType.MOVIE,
+            tmdb_id=resolution["tmdb_id"],
+            overview=resolution["overview"],
+            poster_url=f"{settings.tmdb_image_base_url}/w500{poster_path}" if poster_path else None,
+            release_date=parse_release_date(resolution["release_date"]),
+            mention_count=1,
+        )
+
+    async def _rescore(self, db: AsyncSession, media_items: list[MediaItem]) -> None:
+        if not media_items:
+            return
+        stmt = (
+            select(Comment.media_id, func.avg(Comment.sentiment_score))
+            .where(
+                Comment.media_id.in_([media.id for media in media_items]),
+                Comment.sentiment_score.is_not(None),
+            )
+            .group_by(Comment.media_id)
+        )
+        sentiments = dict((await db.execute(stmt)).all())
+        for media in media_items:
+            if media.id in sentiments:
+                media.sentiment_score = float(sentiments[media.id])
+            media.priority_score = self.scoring.calculate_priority_score(
+                release_date=media.release_date,
+                end_date=media.end_date,
+                mention_count=media.mention_count or 0,
+                user_score=media.user_score,
+                sentiment_score=media.sentiment_score,
+                view_count=media.view_count or 0,
+                is_hidden=bool(media.is_hidden),
+            )
+
+
+@lru_cache
+def get_inbox_queue() -> InboxQueue:
+    """获取收集箱队列单例（依赖注入用）"""
+    return InboxQueue(
+        lease_seconds=settings.inbox_lease_seconds,
+        max_attempts=settings.inbox_max_attempts,
+        retry_base_delay=settings.inbox_retry_base_delay,
+    )
+
+
+@lru_cache
+def get_inbox_processor() -> InboxProcessor:
+    """获取收集箱处理器单例（依赖注入用）"""
+    return InboxProcessor(
+        ai=get_ai_service(),
+        scoring=get_scoring_service(),
+        fetcher=get_url_fetcher() if settings.url_fetch_enabled else None,
+        resolver=get_title_resolver() if settings.tmdb_resolution_enabled and settings.tmdb_api_key else None,
+    )
+
+
+# ========== Worker ==========
+
+_wakeup: Optional[asyncio.Event] = None
+
+
+def _get_wakeup() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+
+def notify_inbox_workers() -> None:
+    """有新提交时唤醒本进程内等待的 worker（其他进程的 worker 靠轮询发现）"""
+    _get_wakeup().set()
+
+
+async def run_inbox_job(inbox_id: int) -> dict:
+    """
+    处理一个已领取的条目：成功则标记完成，失败则记录错误并按策略重试
+
+    各阶段通过 InboxEventBroker 发布进度事件（done / error / failed 为结束事件）
+
+    Returns:
+        处理结果；失败时异常继续抛出
+    """
+    queue = get_inbox_queue()
+    processor = get_inbox_processor()
+    broker = get_inbox_event_broker()
+
+    def progress(stage: str, **data) -> None:
+        broker.publish(inbox_id, stage, **data)
+
+    item = None
+    try:
+        # 1. 短会话读取内容并加载标题匹配器（首次调用时从库中构建）
+        async for db in get_db():
+            item = await db.get(InboxItem, inbox_id)
+            content, url = item.raw_content or "", item.url
+            matcher = await get_title_matcher(db)
+        # 2. 抓取 / 提取 / 解析期间不持有连接
+        prepared = await processor.prepare(matcher, content, url, progress)
+        # 3. 短事务写入结果并标记完成
+        async for db in get_db():
+            try:
+                item = await db.get(InboxItem, inbox_id)
+                result, created = await processor.apply(db, item, prepared, progress)
+                queue.complete(item)
+            except BaseException:
+                # 循环体内的异常不会传回 get_db，需要先回滚释放连接和行锁，
+                # 否则下面新会话更新同一条目时会等待这个未结束的事务
+                await db.rollback()
+                raise
+    except asyncio.CancelledError:
+        # 应用关闭：条目保持 processing，租约过期后由其他 worker 重新领取
+        raise
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        # 失败记录在新会话中写入（处理用的会话已回滚）
+        async for db in get_db():
+            item = await db.get(InboxItem, inbox_id)
+            if item is not None:
+                queue.fail(item, error)
+        if item is not None and item.status == InboxStatus.FAILED.value:
+            progress("failed", error=error, attempts=item.attempts)
+        else:
+            progress(
+                "error",
+                error=error,
+                retry_at=item.next_attempt_at.isoformat() if item is not None else None,
+            )
+        raise
+    progress("done", **result)
+    async for db in get_db():
+        await processor.after_commit(db, created)
+    return result
+
+
+async def run_inbox_workers(worker_count: int, poll_interval: float) -> None:
+    """
+    后台任务：运行 worker_count 个 worker 处理收集箱队列
+
+    由应用 lifespan 启动，关闭时取消
+    """
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    await asyncio.gather(*(
+        _worker(f"{prefix}:{index}", poll_interval) for index in range(worker_count)
+    ))
+
+
+async def _worker(worker_id: str, poll_interval: float) -> None:
+    queue = get_inbox_queue()
+    wakeup = _get_wakeup()
+    while True:
+        claimed = False
+        try:
+            async for db in get_db():
+                items = await queue.claim(db, worker_id)
+            if items:
+                claimed = True
+                await run_inbox_job(items[0].id)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Inbox worker %s failed", worker_id)
+        if claimed:
+            continue
+        try:
+            await asyncio.wait_for(wakeup.wait(), poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
@@ -0,0 +1,129 @@
+# 收集箱过期清理
+# 按 expires_at 索引分批删除过期条目，批次之间暂停，避免长事务锁表和 WAL 突增
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database.connection import get_db
+from ..models.inbox import InboxItem, InboxStatus
+
+logger = logging.getLogger(__name__)
+
+
+class InboxReaper:
+    """
+    过期条目清理
+
+    - 每批：按 expires_at 顺序取最多 batch_size 个过期条目的 id（走 expires_at 索引），
+      FOR UPDATE SKIP LOCKED 跳过正被写入/领取的行，删除后立即提交
+    - 批次之间暂停 batch_pause 秒，让并发写入和 WAL 归档跟上
+    - 正在处理（租约未过期）的条目留到处理结束后的下一轮
+    """
+
+    def __init__(self, batch_size: int = 500, batch_pause: float = 0.5, lease_seconds: float = 600):
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.lease_seconds = lease_seconds
+
+        self.runs = 0
+        self.total_reclaimed = 0
+        self.last_reclaimed = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_duration = 0.0
+
+    async def reap_batch(self, db: AsyncSession) -> int:
+        """删除一批过期条目（提交由调用方负责），返回删除行数"""
+        now = datetime.utcnow()
+        expired_ids = (
+            select(InboxItem.id)
+            .where(
+                InboxItem.expires_at < now,
+                or_(
+                    InboxItem.status != InboxStatus.PROCESSING.value,
+                    InboxItem.locked_at < now - timedelta(seconds=self.lease_seconds),
+                ),
+            )
+            .order_by(InboxItem.expires_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            delete(InboxItem).where(InboxItem.id.in_(expired_ids)).execution_options(synchronize_session=False)
+        )
+        return result.rowcount or 0
+
+    async def reap(self, max_batches: Optional[int] = None) -> dict:
+        """
+        分批清理直到没有过期条目（或达到 max_batches）
+
+        Returns:
+            {"deleted": 删除行数, "batches": 批次数, "duration_s": 耗时}
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deleted = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            async for db in get_db():
+                count = await self.reap_batch(db)
+            batches += 1
+            deleted += count
+            if count < self.batch_size:
+                break
+            await asyncio.sleep(self.batch_pause)
+
+        self.runs += 1
+        self.total_reclaimed += deleted
+        self.last_reclaimed = deleted
+        self.last_run_at = datetime.utcnow()
+        self.last_duration = loop.time() - start
+        return {"deleted": deleted, "batches": batches, "duration_s": self.last_duration}
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "total_reclaimed": self.total_reclaimed,
+            "last_reclaimed": self.last_reclaimed,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_duration_s": self.last_duration,
+        }
+
+
+@lru_cache
+def get_inbox_reaper() -> InboxReaper:
+    """获取过期清理单例（依赖注入用）"""
+    return InboxReaper(
+        batch_size=settings.inbox_cleanup_batch_size,
+        batch_pause=settings.inbox_cleanup_batch_pause,
+        lease_seconds=settings.inbox_lease_seconds,
+    )
+
+
+async def run_inbox_reaper(interval: float) -> None:
+    """
+    后台任务：按固定间隔清理过期收集箱条目
+
+    由应用 lifespan 启动，关闭时取消
+    """
+    reaper = get_inbox_reaper()
+    while True:
+        try:
+            result = await reaper.reap()
+            if result["deleted"]:
+                logger.info(
+                    "Inbox cleanup reclaimed %d rows in %d batches (%.1fs)",
+                    result["deleted"], result["batches"], result["duration_s"],
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Inbox cleanup failed")
+        await asyncio.sleep(interval)
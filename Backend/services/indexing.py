@@ -0,0 +1,136 @@
+# 向量索引服务
+# 维护媒体条目的 embedding 索引，供收集箱去重和重建索引任务使用
+# 所有读写均走向量数据库的批量接口
+
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.media import MediaItem
+from .ai import AIService, get_ai_service
+from .vector_db import BaseVectorDB, get_vector_db
+
+
+MEDIA_VECTOR_PREFIX = "media:"
+
+
+def media_vector_id(media_id: int) -> str:
+    """媒体条目在向量库中的 id"""
+    return f"{MEDIA_VECTOR_PREFIX}{media_id}"
+
+
+def media_embedding_text(item: MediaItem) -> str:
+    """用于生成媒体 embedding 的文本（标题 + 简介）"""
+    if item.overview:
+        return f"{item.title}\n{item.overview}"
+    return item.title
+
+
+def media_metadata(item: MediaItem) -> dict:
+    """写入向量库的媒体 metadata，用于过滤和结果展示"""
+    media_type = getattr(item.type, "value", item.type)
+    return {
+        "kind": "media",
+        "media_id": item.id,
+        "title": item.title,
+        "type": media_type,
+        "year": item.release_date.year if item.release_date else None,
+        "is_hidden": bool(item.is_hidden),
+    }
+
+
+class MediaIndexer:
+    """
+    媒体向量索引器
+
+    - 新建/更新媒体后写入索引
+    - 收集箱处理时批量查找候选条目
+    - 全量重建索引
+    """
+
+    def __init__(
+        self,
+        ai: AIService,
+        vector_db: BaseVectorDB,
+        batch_size: int = 100,
+    ):
+        self.ai = ai
+        self.vector_db = vector_db
+        self.batch_size = batch_size
+
+    async def index_media(self, items: list[MediaItem]) -> int:
+        """
+        批量写入媒体索引
+
+        Returns:
+            写入的条目数
+        """
+        for start in range(0, len(items), self.batch_size):
+            batch = items[start : start + self.batch_size]
+            vectors = await self.ai.get_embeddings_batch(
+                [media_embedding_text(item) for item in batch]
+            )
+            await self.vector_db.upsert_many(
+                [media_vector_id(item.id) for item in batch],
+                vectors,
+                [media_metadata(item) for item in batch],
+            )
+        return len(items)
+
+    async def remove_media(self, media_ids: list[int]) -> None:
+        """批量删除媒体索引"""
+        await self.vector_db.delete_many([media_vector_id(media_id) for media_id in media_ids])
+
+    async def search_titles(
+        self,
+        titles: list[str],
+        top_k: int = 5,
+        filter: Optional[dict] = None,
+    ) -> list[list[dict]]:
+        """
+        为一批标题查找相似的已有媒体
+
+        一次批量 embedding + 一次批量向量检索
+
+        Returns:
+            与 titles 逐项对应的候选列表
+        """
+        if not titles:
+            return []
+        vectors = await self.ai.get_embeddings_batch(titles)
+        media_filter = {"kind": "media", **(filter or {})}
+        return await self.vector_db.search_many(vectors, top_k=top_k, filter=media_filter)
+
+    async def reindex_all(self, db: AsyncSession) -> int:
+        """
+        全量重建媒体索引
+
+        按主键分页读取，每页一次批量 embedding 和一次批量写入
+
+        Returns:
+            重建的条目数
+        """
+        total = 0
+        last_id = 0
+        while True:
+            stmt = (
+                select(MediaItem)
+                .where(MediaItem.id > last_id)
+                .order_by(MediaItem.id)
+                .limit(self.batch_size)
+            )
+            items = list((await db.execute(stmt)).scalars())
+            if not items:
+                break
+            total += await self.index_media(items)
+            last_id = items[-1].id
+        return total
+
+
+async def get_media_indexer() -> MediaIndexer:
+    """获取媒体索引器（依赖注入用）"""
+    return MediaIndexer(
+        ai=get_ai_service(),
+        vector_db=await get_vector_db(),
+    )
@@ -0,0 +1,210 @@
+# 榜单规则解析
+# 编号/项目符号列表（列表项及其间的《书名号》标题、"Title (Year)"）无需 LLM，
+# 在 extract_media_info 之前用预编译正则直接解析，只把无法结构化的部分交给 LLM；
+# 没有列表结构的正文（即使含《》）整篇交给 LLM
+
+import re
+import unicodedata
+from typing import Optional
+
+
+# 1. / 1、/ 1) / (1) / No.1 / 第1名 开头的行
+# 必须有编号标记（No./第 前缀，或编号后的标点），"Top 10 movies of 2023" 之类的标题行不算列表项
+_NUMBERED = re.compile(
+    r"^\s*(?:no\.?\s*|第)[（(]?(\d{1,3})[)）]?\s*(?:名|位)?\s*[.、．:：)）\]】]?\s*(?P<body>\S.*)$|"
+    r"^\s*[（(]?(\d{1,3})[)）.、．]\s*(?P<body2>\S.*)$",
+    re.IGNORECASE,
+)
+_BULLETED = re.compile(r"^\s*(?:[-*+]\s+|[•·●○▪▫◆◇★☆►▶→✓✔]\s*)(?P<body>\S.*)$")
+_QUOTED_TITLE = re.compile(r"《([^《》\n]{1,80})》")
+_TITLE_YEAR = re.compile(r"^(?P<title>[^（(]{1,80}?)\s*[（(](?P<year>(?:18|19|20)\d{2})[)）]\s*(?P<rest>.*)$")
+_YEAR_IN_PARENS = re.compile(r"^\s*[（(]((?:18|19|20)\d{2})[)）]")
+# 标题与评论之间的分隔符：优先用强分隔符，没有时再按英文冒号/逗号切分
+# （英文标题常含 ":" 和 ","，如 "Dune: Part Two"）
+# 中日韩文字与空白相邻时空白也是分隔符（"漫长的季节 强烈推荐"、"The Matrix 经典"）
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"
+_STRONG_SEPARATOR = re.compile(
+    rf"\s+[-–—|]+\s+|\s*——\s*|\s*[：｜，。；！？]\s*|\s{{2,}}|(?<=[{_CJK}])\s+|\s+(?=[{_CJK}])"
+)
+_WEAK_SEPARATOR = re.compile(r"[:,;!?]\s+")
+_LEADING_PUNCTUATION = re.compile(r"^[\s\-–—:：,，。;；|｜、]+")
+# 未加书名号的"标题"若像叙述句（人称开头、"看了一部"等），交给 LLM
+_NARRATIVE = re.compile(
+    r"^(?:我|你|他|她|我们|最近|今天|昨天|还有|另外|其实|感觉)|看了|一部|这部|那部|\b(?:i|we|my)\b",
+    re.IGNORECASE,
+)
+_TITLE_PUNCTUATION = re.compile(r"[\W_]+", re.UNICODE)
+
+# 少于该数量的列表项时不认为是榜单（避免把正文中的 "1." 误判为列表）
+MIN_LIST_ITEMS = 3
+# 未加书名号时，标题最长字符数（超过则认为整行是叙述，交给 LLM）
+MAX_BARE_TITLE_LENGTH = 30
+
+
+def title_key(title: str) -> str:
+    """去重用的标题键：全角转半角、小写、去掉标点空白"""
+    return _TITLE_PUNCTUATION.sub("", unicodedata.normalize("NFKC", title).lower())
+
+
+def is_list_item(line: str) -> bool:
+    """是否为编号或项目符号列表行"""
+    return _list_item_body(line) is not None
+
+
+def empty_extraction(source_type: str = "list") -> dict:
+    return {"titles": [], "comments": [], "source_type": source_type, "years": {}}
+
+
+def parse_media_list(text: str) -> tuple[dict, str]:
+    """
+    规则解析粘贴内容
+
+    Returns:
+        (解析结果, 无法结构化的剩余文本)
+        解析结果格式同 AIService.extract_media_info，另含 "years": {标题: 年份}；
+        评论的 sentiment 为 None，由调用方统一评分（extract_media_info 经情感分析级联）；
+        剩余文本为空字符串时无需调用 LLM
+    """
+    lines = text.splitlines()
+    items: list[dict] = []  # {"title", "year", "comment"}
+    quoted: list[dict] = []  # 非列表行中的《》标题（仅在榜单中采用）
+    unparsed_items: list[str] = []  # 找不到标题的列表项（整行叙述）
+    leftover: list[str] = []
+    current: Optional[dict] = None
+
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            # 空行之后的内容只有在上一项还没有评论时才继续归属该项
+            if current is not None and current["comment"]:
+                current = None
+            continue
+
+        body = _list_item_body(line)
+        if body is not None:
+            current = _parse_item(body)
+            if current is not None:
+                items.append(current)
+            else:
+                unparsed_items.append(line)
+            continue
+
+        titles = _QUOTED_TITLE.findall(stripped)
+        if titles:
+            # 一行多个标题时无法可靠切分，整行作为每个标题的评论
+            comment = stripped
+            for title in titles:
+                quoted.append({"title": title.strip(), "year": None, "comment": comment})
+            current = None
+            continue
+
+        if current is not None and (not current["comment"] or line[:1].isspace()):
+            # 列表项下方的续行（该项还没有评论，或缩进书写）视为该项的评论
+            current["comment"] = f"{current['comment']} {stripped}".strip()
+        else:
+            leftover.append(line)
+
+    if len(items) < MIN_LIST_ITEMS:
+        # 不像榜单（含只有《》标题的叙述句）：整篇交给 LLM，保留上下文
+        return empty_extraction(), text
+
+    # 榜单：列表前后不含作品线索的导语/结语不需要 LLM
+    leftover = unparsed_items + [line for line in leftover if _looks_structured(line)]
+    result = _build_result(items + quoted, "list")
+    return result, "\n".join(leftover).strip()
+
+
+def merge_extractions(results: list[dict]) -> dict:
+    """
+    合并多个提取结果（规则解析 + LLM、长文分块等）
+
+    标题按 title_key 去重并保留首次出现的写法，评论按 (标题, 评论) 去重，
+    source_type 取第一个结果的
+    """
+    merged = empty_extraction()
+    seen_titles: dict[str, str] = {}
+    seen_comments: set[tuple[str, str]] = set()
+    for result in results:
+        for title in result.get("titles", []):
+            key = title_key(title)
+            if key and key not in seen_titles:
+                seen_titles[key] = title
+                merged["titles"].append(title)
+        for title, year in (result.get("years") or {}).items():
+            canonical = seen_titles.get(title_key(title), title)
+            merged["years"].setdefault(canonical, year)
+        for comment in result.get("comments", []):
+            key = title_key(comment["title"])
+            canonical = seen_titles.get(key, comment["title"])
+            dedupe_key = (key, comment["comment"])
+            if dedupe_key in seen_comments:
+                continue
+            seen_comments.add(dedupe_key)
+            merged["comments"].append({**comment, "title": canonical})
+    if results:
+        merged["source_type"] = results[0].get("source_type") or "blog"
+    return merged
+
+
+# ========== 内部方法 ==========
+
+def _list_item_body(line: str) -> Optional[str]:
+    match = _NUMBERED.match(line)
+    if match:
+        return match.group("body") or match.group("body2")
+    match = _BULLETED.match(line)
+    if match:
+        return match.group("body")
+    return None
+
+
+def _parse_item(body: str) -> Optional[dict]:
+    """解析一个列表项：标题 + 年份 + 评论；无法确定标题时返回 None"""
+    quoted = _QUOTED_TITLE.search(body)
+    if quoted:
+        rest = body[quoted.end():]
+        year_match = _YEAR_IN_PARENS.match(rest)
+        year = int(year_match.group(1)) if year_match else None
+        if year_match:
+            rest = rest[year_match.end():]
+        comment = " ".join(part for part in (body[: quoted.start()].strip(), rest.strip()) if part)
+        return {"title": quoted.group(1).strip(), "year": year, "comment": _clean_comment(comment)}
+
+    match = _TITLE_YEAR.match(body)
+    if match and len(match.group("title").strip()) <= MAX_BARE_TITLE_LENGTH:
+        return {
+            "title": match.group("title").strip(),
+            "year": int(match.group("year")),
+            "comment": _clean_comment(match.group("rest")),
+        }
+
+    separator = _STRONG_SEPARATOR.search(body) or _WEAK_SEPARATOR.search(body)
+    title = body[: separator.start()].strip() if separator else body.strip()
+    if not title or len(title) > MAX_BARE_TITLE_LENGTH or _NARRATIVE.search(title):
+        return None
+    comment = body[separator.end():] if separator else ""
+    return {"title": title, "year": None, "comment": _clean_comment(comment)}
+
+
+def _clean_comment(comment: str) -> str:
+    return _LEADING_PUNCTUATION.sub("", comment).strip()
+
+
+def _looks_structured(line: str) -> bool:
+    """榜单外的行是否仍可能含有作品（有书名号或年份括号）"""
+    return bool(_QUOTED_TITLE.search(line) or _TITLE_YEAR.match(line.strip()))
+
+
+def _build_result(entries: list[dict], source_type: str) -> dict:
+    result = empty_extraction(source_type)
+    for entry in entries:
+        result["titles"].append(entry["title"])
+        if entry["year"]:
+            result["years"][entry["title"]] = entry["year"]
+        if entry["comment"]:
+            result["comments"].append({
+                "title": entry["title"],
+                "comment": entry["comment"],
+                "sentiment": None,
+            })
+    return merge_extractions([result]) if entries else result
@@ -0,0 +1,199 @@
+# 本地 AI 后端
+# 不依赖网络的 embedding（特征哈希）和情感分析（词典），用于开发、CI 和低成本部署
+# 单核每秒可处理数千条短文本
+
+import math
+import re
+import unicodedata
+import zlib
+from collections import Counter
+
+import numpy as np
+
+
+_CJK_RUN = r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+"
+_TOKEN = re.compile(rf"({_CJK_RUN})|([a-z0-9]+(?:'[a-z]+)?)")
+_CJK_RUNS = re.compile(_CJK_RUN)
+_ENGLISH_WORD = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+class HashingEmbedder:
+    """
+    特征哈希 embedding
+
+    特征：
+    - 中日韩文字：单字 + 相邻二字（无需分词）
+    - 拉丁文字：整词 + 词内字符三元组（容忍拼写差异和词形变化）
+
+    每个特征经 CRC32 映射到固定维度并带随机符号，权重为 1 + log(tf)，最后 L2 归一化。
+    向量之间的内积近似于 n-gram 重合度，足以支撑标题去重和相似检索。
+    """
+
+    def __init__(self, dimension: int = 512):
+        self.dimension = dimension
+
+    @property
+    def model_name(self) -> str:
+        """用作 embedding 缓存键的模型名"""
+        return f"local-hashing-{self.dimension}"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """批量计算向量，返回 (len(texts), dimension) 的 float32 矩阵"""
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for i, text in enumerate(texts):
+            features = self._features(text)
+            if not features:
+                continue
+            hashes = np.fromiter(
+                (zlib.crc32(feature.encode("utf-8")) for feature in features),
+                dtype=np.uint32,
+                count=len(features),
+            )
+            weights = 1.0 + np.log(np.fromiter(features.values(), dtype=np.float32, count=len(features)))
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+            row = np.bincount(hashes % self.dimension, weights=weights * signs, minlength=self.dimension)
+            norm = np.linalg.norm(row)
+            if norm > 0:
+                matrix[i] = row / norm
+        return matrix
+
+    @staticmethod
+    def _features(text: str) -> Counter:
+        features: Counter = Counter()
+        for cjk, word in _TOKEN.findall(_normalize(text)):
+            if cjk:
+                features.update(cjk)
+                features.update(cjk[i : i + 2] for i in range(len(cjk) - 1))
+            else:
+                features[f"w:{word}"] += 1
+                padded = f" {word} "
+                features.update(padded[i : i + 3] for i in range(len(padded) - 2))
+        return features
+
+
+# ========== 情感词典 ==========
+# 权重为正表示想看/喜欢，为负表示不想看/不喜欢
+
+_POSITIVE = {
+    # 中文
+    "想看": 2.0, "好想看": 2.5, "期待": 2.0, "好看": 2.0, "神作": 3.0, "推荐": 1.5,
+    "强推": 3.0, "安利": 2.0, "必看": 3.0, "经典": 1.5, "喜欢": 2.0, "爱了": 2.5,
+    "绝了": 2.5, "封神": 3.0, "惊艳": 2.5, "感动": 1.5, "精彩": 2.0, "佳作": 2.0,
+    "上头": 2.0, "种草": 2.0, "好评": 1.5, "值得": 1.5, "有趣": 1.5, "好笑": 1.5,
+    "震撼": 2.0, "高分": 1.5, "宝藏": 2.5, "入坑": 1.5, "追": 1.0, "冲": 1.5,
+    "哭了": 1.0, "满分": 3.0, "好评如潮": 2.5, "太棒": 2.5, "不错": 1.5, "牛": 1.5,
+    # English
+    "love": 2.0, "loved": 2.0, "great": 2.0, "amazing": 2.5, "excellent": 2.5,
+    "masterpiece": 3.0, "recommend": 1.5, "recommended": 1.5, "beautiful": 1.5,
+    "fun": 1.5, "brilliant": 2.5, "favorite": 2.0, "favourite": 2.0, "best": 2.0,
+    "awesome": 2.0, "enjoy": 1.5, "enjoyed": 1.5, "excited": 2.0, "must": 1.5,
+    "classic": 1.5, "good": 1.5, "wonderful": 2.0, "stunning": 2.0, "hyped": 2.0,
+}
+
+_NEGATIVE = {
+    # 中文
+    "难看": -2.5, "烂": -2.0, "烂片": -3.0, "无聊": -2.0, "失望": -2.0, "踩雷": -2.5,
+    "劝退": -2.5, "弃剧": -2.5, "弃了": -2.0, "一般": -0.8, "拉胯": -2.5, "烂尾": -2.5,
+    "狗血": -1.5, "尴尬": -1.5, "避雷": -2.5, "浪费时间": -3.0, "垃圾": -3.0, "雷": -1.5,
+    "难受": -1.0, "差评": -2.0, "无感": -1.5, "看不下去": -3.0, "催眠": -2.0, "水": -0.5,
+    "毁": -2.0, "不行": -2.0, "辣眼睛": -2.5, "智障": -2.5,
+    # English
+    "boring": -2.0, "bad": -2.0, "terrible": -2.5, "awful": -2.5, "worst": -3.0,
+    "disappointing": -2.0, "disappointed": -2.0, "waste": -2.5, "hate": -2.5,
+    "hated": -2.5, "overrated": -1.5, "mediocre": -1.5, "dull": -1.5, "skip": -2.0,
+    "meh": -1.0, "avoid": -2.5, "trash": -3.0, "garbage": -3.0, "bland": -1.5,
+}
+
+_NEGATORS_ZH = ("不", "没", "别", "不太", "不是", "并不", "没有", "不会")
+_NEGATORS_EN = {"not", "no", "never", "don't", "didn't", "isn't", "wasn't", "can't", "won't", "nothing"}
+_INTENSIFIERS = {
+    "很": 1.3, "非常": 1.5, "超": 1.5, "超级": 1.6, "太": 1.5, "巨": 1.6, "特别": 1.4, "真": 1.2, "好": 1.2,
+    "very": 1.3, "so": 1.3, "really": 1.3, "super": 1.5, "extremely": 1.6, "absolutely": 1.5,
+}
+
+_LEXICON = {**_POSITIVE, **_NEGATIVE}
+_MAX_ZH_TERM = max(len(term) for term in _LEXICON if not term.isascii())
+
+
+class LexiconSentimentAnalyzer:
+    """
+    词典情感分析（中英文）
+
+    中文按词典最长匹配扫描（无需分词），英文按词匹配；
+    否定词翻转并减弱情感，程度副词放大，感叹号轻微放大。
+    分数归一化到 (-1, 1)；置信度由命中证据的强度和正负一致程度决定，
+    没有命中任何词时分数为 0、置信度为 0。
+    """
+
+    # 分数归一化常数：score = total / sqrt(total^2 + ALPHA)
+    ALPHA = 4.0
+
+    def analyze(self, text: str) -> tuple[float, float]:
+        """
+        Returns:
+            (情感分数 -1.0 ~ 1.0, 置信度 0.0 ~ 1.0)
+        """
+        normalized = _normalize(text)
+        weights = [weight for run in _CJK_RUNS.findall(normalized) for weight in self._scan_chinese(run)]
+        weights += self._scan_english(normalized)
+        positive = sum(weight for weight in weights if weight > 0)
+        negative = -sum(weight for weight in weights if weight < 0)
+
+        evidence = positive + negative
+        if evidence == 0:
+            return 0.0, 0.0
+
+        exclamations = min(text.count("!") + text.count("！"), 3)
+        total = (positive - negative) * (1 + 0.1 * exclamations)
+        score = total / math.sqrt(total * total + self.ALPHA)
+        agreement = abs(positive - negative) / evidence
+        strength = min(1.0, evidence / 3.0)
+        return score, agreement * strength
+
+    def _scan_chinese(self, run: str) -> list[float]:
+        """中文最长匹配：依次查找词典词，并检查前面的否定词和程度副词"""
+        weights = []
+        i = 0
+        while i < len(run):
+            for length in range(min(_MAX_ZH_TERM, len(run) - i), 0, -1):
+                term = run[i : i + length]
+                if term in _LEXICON:
+                    weights.append(_LEXICON[term] * self._chinese_modifier(run[max(0, i - 3) : i]))
+                    i += length
+                    break
+            else:
+                i += 1
+        return weights
+
+    @staticmethod
+    def _chinese_modifier(prefix: str) -> float:
+        modifier = 1.0
+        for word, factor in _INTENSIFIERS.items():
+            if not word.isascii() and prefix.endswith(word):
+                modifier *= factor
+                prefix = prefix[: -len(word)]
+                break
+        if any(prefix.endswith(negator) for negator in _NEGATORS_ZH):
+            modifier *= -0.6
+        return modifier
+
+    @staticmethod
+    def _scan_english(normalized: str) -> list[float]:
+        """英文按词匹配，检查前 3 个词中的否定词和紧邻的程度副词"""
+        weights = []
+        words = _ENGLISH_WORD.findall(normalized)
+        for i, word in enumerate(words):
+            weight = _LEXICON.get(word)
+            if weight is None:
+                continue
+            window = words[max(0, i - 3) : i]
+            if window and window[-1] in _INTENSIFIERS:
+                weight *= _INTENSIFIERS[window[-1]]
+            if any(w in _NEGATORS_EN for w in window):
+                weight *= -0.6
+            weights.append(weight)
+        return weights
@@ -0,0 +1,202 @@
+# 向量元数据索引
+# 为本地向量数据库的过滤检索预先建立倒排索引，在打分前确定候选行
+
+from typing import Any, Optional
+
+import numpy as np
+
+
+# 过滤条件支持的运算符（语法与 Chroma / Pinecone 的 where 一致）
+RANGE_OPERATORS = ("$gt", "$gte", "$lt", "$lte")
+
+
+def match_condition(value: Any, condition: Any) -> bool:
+    """判断单个 metadata 值是否满足过滤条件（未建索引字段的逐行判断）"""
+    if not isinstance(condition, dict):
+        return value == condition
+    for op, operand in condition.items():
+        if op == "$eq" and not value == operand:
+            return False
+        if op == "$ne" and not value != operand:
+            return False
+        if op == "$in" and value not in operand:
+            return False
+        if op == "$nin" and value in operand:
+            return False
+        if op in RANGE_OPERATORS:
+            if value is None:
+                return False
+            if op == "$gt" and not value > operand:
+                return False
+            if op == "$gte" and not value >= operand:
+                return False
+            if op == "$lt" and not value < operand:
+                return False
+            if op == "$lte" and not value <= operand:
+                return False
+    return True
+
+
+class MetadataIndex:
+    """
+    元数据倒排索引
+
+    - 枚举字段（媒体类型、来源、隐藏标记等）：每个取值一个行掩码（bitset）
+    - 数值字段（年份）：按值排序的行号数组，范围查询用二分定位
+
+    过滤时先由索引得到候选行掩码，未建索引的字段再逐行判断
+    """
+
+    def __init__(
+        self,
+        categorical_fields: tuple[str, ...] = ("kind", "type", "source", "is_hidden"),
+        range_fields: tuple[str, ...] = ("year",),
+    ):
+        self.categorical_fields = categorical_fields
+        self.range_fields = range_fields
+        self._capacity = 0
+        self._bitsets: dict[str, dict[Any, np.ndarray]] = {
+            field: {} for field in categorical_fields
+        }
+        self._values: dict[str, np.ndarray] = {
+            field: np.zeros(0, dtype=np.float64) for field in range_fields
+        }
+        # 排序索引在写入后失效，下次范围查询时重建
+        self._sorted: dict[str, Optional[tuple[np.ndarray, np.ndarray, int]]] = {
+            field: None for field in range_fields
+        }
+
+    def reserve(self, capacity: int) -> None:
+        """扩展到指定行容量"""
+        if capacity <= self._capacity:
+            return
+        grow = capacity - self._capacity
+        for bitsets in self._bitsets.values():
+            for value, bits in bitsets.items():
+                bitsets[value] = np.concatenate([bits, np.zeros(grow, dtype=bool)])
+        for field, values in self._values.items():
+            self._values[field] = np.concatenate([values, np.full(grow, np.nan)])
+        self._capacity = capacity
+
+    def add(self, rows, metadatas: list[dict]) -> None:
+        """登记行的 metadata"""
+        for row, metadata in zip(rows, metadatas):
+            for field in self.categorical_fields:
+                value = metadata.get(field)
+                if value is None or isinstance(value, (list, dict)):
+                    continue
+                bits = self._bitsets[field].get(value)
+                if bits is None:
+                    bits = self._bitsets[field][value] = np.zeros(self._capacity, dtype=bool)
+                bits[row] = True
+            for field in self.range_fields:
+                value = metadata.get(field)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self._values[field][row] = value
+        for field in self.range_fields:
+            self._sorted[field] = None
+
+    def remove(self, rows) -> None:
+        """清除行的全部索引项"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return
+        for bitsets in self._bitsets.values():
+            for bits in bitsets.values():
+                bits[rows] = False
+        for field in self.range_fields:
+            self._values[field][rows] = np.nan
+            self._sorted[field] = None
+
+    def compact(self, live_rows: np.ndarray) -> None:
+        """按压缩后的行号重排索引（live_rows[i] 移动到第 i 行）"""
+        n = len(live_rows)
+        for bitsets in self._bitsets.values():
+            for value, bits in list(bitsets.items()):
+                moved = bits[live_rows]
+                if not moved.any():
+                    del bitsets[value]
+                    continue
+                bits[:n] = moved
+                bits[n:] = False
+        for field, values in self._values.items():
+            values[:n] = values[live_rows]
+            values[n:] = np.nan
+            self._sorted[field] = None
+
+    def is_indexed(self, field: str, condition: Any) -> bool:
+        """该字段的条件能否完全由索引回答"""
+        if field in self.categorical_fields:
+            if not isinstance(condition, dict):
+                return True
+            return all(op in ("$eq", "$ne", "$in", "$nin") for op in condition)
+        if field in self.range_fields:
+            if not isinstance(condition, dict):
+                return True
+            return all(op in RANGE_OPERATORS or op == "$eq" for op in condition)
+        return False
+
+    def mask(self, field: str, condition: Any, count: int) -> np.ndarray:
+        """返回前 count 行中满足条件的行掩码（调用前须确认 is_indexed）"""
+        if field in self.categorical_fields:
+            return self._categorical_mask(field, condition, count)
+        return self._range_mask(field, condition, count)
+
+    # ========== 内部方法 ==========
+
+    def _categorical_mask(self, field: str, condition: Any, count: int) -> np.ndarray:
+        bitsets = self._bitsets[field]
+        empty = np.zeros(count, dtype=bool)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        mask = None
+        for op, operand in condition.items():
+            if op == "$eq":
+                part = bitsets.get(operand, empty)[:count]
+            elif op == "$in":
+                part = empty.copy()
+                for value in operand:
+                    if value in bitsets:
+                        part |= bitsets[value][:count]
+            elif op == "$ne":
+                part = ~bitsets.get(operand, empty)[:count]
+            else:  # $nin
+                part = np.ones(count, dtype=bool)
+                for value in operand:
+                    if value in bitsets:
+                        part &= ~bitsets[value][:count]
+            mask = part.copy() if mask is None else mask & part
+        return mask if mask is not None else np.ones(count, dtype=bool)
+
+    def _range_mask(self, field: str, condition: Any, count: int) -> np.ndarray:
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        sorted_values, sorted_rows = self._sorted_index(field, count)
+        lo, hi = 0, len(sorted_values)
+        for op, operand in condition.items():
+            if op in ("$gte", "$eq"):
+                lo = max(lo, np.searchsorted(sorted_values, operand, side="left"))
+            if op == "$gt":
+                lo = max(lo, np.searchsorted(sorted_values, operand, side="right"))
+            if op in ("$lte", "$eq"):
+                hi = min(hi, np.searchsorted(sorted_values, operand, side="right"))
+            if op == "$lt":
+                hi = min(hi, np.searchsorted(sorted_values, operand, side="left"))
+
+        mask = np.zeros(count, dtype=bool)
+        if lo < hi:
+            mask[sorted_rows[lo:hi]] = True
+        return mask
+
+    def _sorted_index(self, field: str, count: int) -> tuple[np.ndarray, np.ndarray]:
+        """按值排序的 (值, 行号)，忽略缺失值"""
+        cached = self._sorted[field]
+        if cached is None or cached[2] != count:
+            values = self._values[field][:count]
+            rows = np.flatnonzero(~np.isnan(values))
+            order = np.argsort(values[rows], kind="stable")
+            cached = (values[rows][order], rows[order], count)
+            self._sorted[field] = cached
+        return cached[0], cached[1]
@@ -0,0 +1,126 @@
+# 微批处理
+# 把并发的单条请求在几毫秒内攒成一批，一次调用批量接口后再把结果分发给各调用方
+
+import asyncio
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    微批处理器
+
+    满足任一条件即发出一批：
+    - 攒够 max_batch_size 条
+    - 累计成本（如 token 数）达到 max_cost
+    - 第一条进入后等待了 max_wait 秒
+
+    批量调用失败时，该批所有调用方收到同一个异常，批次任务被取消时调用方也被取消；
+    调用方被取消不影响同批其他请求
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[list[T]], Awaitable[list[R]]],
+        max_batch_size: int = 256,
+        max_wait: float = 0.005,
+        max_cost: Optional[int] = None,
+        cost: Optional[Callable[[T], int]] = None,
+    ):
+        """
+        Args:
+            handler: 批量处理函数，返回值与输入逐项对应
+            max_batch_size: 每批最多条数
+            max_wait: 最长等待时间（秒）
+            max_cost: 每批累计成本上限，None 表示不限
+            cost: 单条成本估算函数
+        """
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_cost = max_cost
+        self.cost = cost
+
+        self._pending: list[tuple[T, asyncio.Future]] = []
+        self._pending_cost = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+
+        # 统计
+        self.batches = 0
+        self.items = 0
+
+    @property
+    def average_batch_size(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
+
+    async def submit(self, item: T) -> R:
+        """提交单条请求，等待所在批次完成后返回对应结果"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        item_cost = self.cost(item) if self.cost else 0
+
+        # 加入后会超出成本上限：先把已攒的发出去
+        if self._pending and self.max_cost and self._pending_cost + item_cost > self.max_cost:
+            self._flush()
+
+        self._pending.append((item, future))
+        self._pending_cost += item_cost
+
+        if len(self._pending) >= self.max_batch_size or (
+            self.max_cost and self._pending_cost >= self.max_cost
+        ):
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    async def drain(self) -> None:
+        """立即发出已攒的请求并等待所有进行中的批次完成"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    # ========== 内部方法 ==========
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch = self._pending
+        self._pending = []
+        self._pending_cost = 0
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[T, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = await self.handler([item for item, _ in batch])
+        except asyncio.CancelledError:
+            # 批次任务被取消（如关闭时）：调用方随之取消，不能永远等待
+            for _, future in batch:
+                future.cancel()
+            raise
+        except BaseException as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+        # handler 返回的结果少于输入时，剩下的调用方同样不能永远等待
+        for _, future in batch[len(results):]:
+            if not future.done():
+                future.set_exception(RuntimeError("Batch handler returned fewer results than inputs"))
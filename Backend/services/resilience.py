@@ -0,0 +1,235 @@
+# 调用保护
+# 外部 API 调用的并发限制、429/5xx 重试（遵循限流响应头）和熔断器，均带统计指标
+
+import asyncio
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import httpx
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，调用被直接拒绝"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Circuit '{name}' is open, retry after {retry_after:.1f}s")
+
+
+class ConcurrencyLimiter:
+    """
+    并发限制（信号量）
+
+    用法：async with limiter: ...
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak = 0
+        self.acquired = 0
+        self.total_wait = 0.0  # 累计排队时间（秒）
+
+    async def __aenter__(self):
+        self.waiting += 1
+        start = time.monotonic()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.total_wait += time.monotonic() - start
+        self.acquired += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "peak": self.peak,
+            "acquired": self.acquired,
+            "avg_wait_ms": self.total_wait / self.acquired * 1000 if self.acquired else 0.0,
+        }
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """解析 "20ms" / "1.5s" / "6m0s" 形式的时长（OpenAI x-ratelimit-reset-* 头）"""
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+class RetryPolicy:
+    """
+    重试策略
+
+    对 retry_statuses 中的状态码和连接/超时错误重试，最多 max_attempts 次（含首次）。
+    等待时间优先取响应头：Retry-After（秒数或 HTTP 日期）、
+    x-ratelimit-reset-requests / x-ratelimit-reset-tokens；
+    否则为带完全抖动的指数退避 random(0, min(max_delay, base_delay × 2^n))
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        retry_statuses: frozenset = frozenset({408, 429, 500, 502, 503, 504}),
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = retry_statuses
+        self.retries = 0
+        self.retries_by_status: dict[str, int] = {}
+        self.total_backoff = 0.0
+
+    def should_retry(self, attempt: int, status_code: Optional[int]) -> bool:
+        """attempt 从 1 开始；status_code 为 None 表示连接/超时错误"""
+        if attempt >= self.max_attempts:
+            return False
+        return status_code is None or status_code in self.retry_statuses
+
+    def delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        if response is not None:
+            hinted = self._header_delay(response.headers)
+            if hinted is not None:
+                return min(hinted, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    async def backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> None:
+        delay = self.delay(attempt, response)
+        key = str(response.status_code) if response is not None else "network"
+        self.retries += 1
+        self.retries_by_status[key] = self.retries_by_status.get(key, 0) + 1
+        self.total_backoff += delay
+        await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "retries": self.retries,
+            "retries_by_status": dict(self.retries_by_status),
+            "total_backoff_s": self.total_backoff,
+        }
+
+    @staticmethod
+    def _header_delay(headers: httpx.Headers) -> Optional[float]:
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+        resets = [
+            _parse_duration(headers[name])
+            for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+            if name in headers
+        ]
+        resets = [reset for reset in resets if reset is not None]
+        return max(resets) if resets else None
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    - closed：正常调用；连续失败 failure_threshold 次后打开
+    - open：recovery_timeout 秒内直接抛出 CircuitOpenError，不再请求上游
+    - half_open：超时后放行最多 half_open_max_calls 个试探调用，成功则关闭，失败则重新打开；
+      试探调用没有结果就结束（被取消）时须调用 release 归还名额
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self.opened = 0  # 打开次数
+        self.rejected = 0  # 被直接拒绝的调用数
+        self.failures = 0
+        self.successes = 0
+
+    def before_call(self) -> bool:
+        """
+        调用前检查，熔断时抛出 CircuitOpenError
+
+        Returns:
+            是否占用了半开状态的试探名额（调用结束后传给 release）
+        """
+        if self.state == self.OPEN:
+            remaining = self._opened_at + self.recovery_timeout - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, remaining)
+            self.state = self.HALF_OPEN
+            self._half_open_calls = 0
+        if self.state == self.HALF_OPEN:
+            if self._half_open_calls >= self.half_open_max_calls:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.recovery_timeout)
+            self._half_open_calls += 1
+            return True
+        return False
+
+    def release(self, probe: bool) -> None:
+        """调用结束（无论是否记录了结果）时归还试探名额；已记录结果、状态已变化时不做任何事"""
+        if probe and self.state == self.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def record_success(self) -> None:
+        self.successes += 1
+        self._consecutive_failures = 0
+        self.state = self.CLOSED
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "failures": self.failures,
+            "successes": self.successes,
+        }
@@ -0,0 +1,149 @@
+# 情感分析级联
+# 本地词典先给每条评论打分，只有置信度不足的评论才交给 LLM，且多条合并为一次调用
+
+import asyncio
+import random
+from typing import TYPE_CHECKING, Optional
+
+from .local_ai import LexiconSentimentAnalyzer
+from .micro_batcher import MicroBatcher
+
+if TYPE_CHECKING:
+    from .ai import AIService
+
+
+class SentimentCascade:
+    """
+    置信度门控的情感分析级联
+
+    - 第一级：LexiconSentimentAnalyzer，置信度 >= confidence_threshold 的结果直接采用
+    - 第二级：其余评论经微批处理合并（最多 llm_batch_size 条、最长等待 llm_batch_wait 秒），
+      一批一次 AIService.analyze_sentiment_batch；并发的单条 analyze 调用也会合并到同一批
+
+    统计两级的升级率和一致率：升级的评论两级都有分数，可直接比较；
+    另按 audit_rate 抽样把高置信评论也送 LLM 复核，用于估计第一级在其采用范围内的准确度
+
+    由 AIService 持有（AIService.analyze_sentiment 经由级联），LLM 调用的并发受
+    AIService 的 sentiment 并发名额限制
+    """
+
+    # 分数在 ±NEUTRAL_BAND 以内视为中性，一致性按 正/中性/负 三类比较
+    NEUTRAL_BAND = 0.2
+
+    def __init__(
+        self,
+        ai: "AIService",
+        local: Optional[LexiconSentimentAnalyzer] = None,
+        confidence_threshold: float = 0.6,
+        llm_batch_size: int = 20,
+        llm_batch_wait: float = 0.02,
+        audit_rate: float = 0.02,
+    ):
+        self.ai = ai
+        self.local = local or LexiconSentimentAnalyzer()
+        self.confidence_threshold = confidence_threshold
+        self.llm_batch_size = llm_batch_size
+        self.audit_rate = audit_rate
+        self._batcher = MicroBatcher(
+            self._llm_batch, max_batch_size=llm_batch_size, max_wait=llm_batch_wait
+        )
+
+        self.total = 0
+        self.escalated = 0
+        self.llm_calls = 0
+        self.compared = 0  # 两级都有分数的评论数（升级 + 抽样复核）
+        self.agreed = 0
+        self.audited = 0
+        self.audit_agreed = 0
+
+    @property
+    def escalation_rate(self) -> float:
+        return self.escalated / self.total if self.total else 0.0
+
+    @property
+    def agreement_rate(self) -> float:
+        return self.agreed / self.compared if self.compared else 0.0
+
+    @property
+    def audit_agreement_rate(self) -> float:
+        """抽样复核中两级一致的比例（第一级直接采用部分的准确度估计）"""
+        return self.audit_agreed / self.audited if self.audited else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "total": self.total,
+            "escalated": self.escalated,
+            "escalation_rate": self.escalation_rate,
+            "llm_calls": self.llm_calls,
+            "agreement_rate": self.agreement_rate,
+            "audited": self.audited,
+            "audit_agreement_rate": self.audit_agreement_rate,
+        }
+
+    async def analyze(self, text: str) -> float:
+        return (await self.analyze_many([text]))[0]
+
+    async def analyze_many(self, texts: list[str]) -> list[float]:
+        """
+        批量情感分析
+
+        Returns:
+            与 texts 逐项对应的情感分数 (-1.0 到 1.0)
+        """
+        local_results = [self.local.analyze(text) for text in texts]
+        scores = [score for score, _ in local_results]
+
+        escalate = [
+            i for i, (_, confidence) in enumerate(local_results)
+            if confidence < self.confidence_threshold
+        ]
+        audit = [
+            i for i, (_, confidence) in enumerate(local_results)
+            if confidence >= self.confidence_threshold and random.random() < self.audit_rate
+        ]
+        self.total += len(texts)
+        self.escalated += len(escalate)
+
+        # 重复评论（导入的片单里很常见）只送 LLM 一次
+        unique = list(dict.fromkeys(texts[i] for i in escalate + audit))
+        llm_scores = dict(zip(unique, await self._llm_scores(unique)))
+        for i in escalate:
+            self._compare(scores[i], llm_scores[texts[i]])
+            scores[i] = llm_scores[texts[i]]
+        for i in audit:
+            self.audited += 1
+            self.audit_agreed += self._compare(scores[i], llm_scores[texts[i]])
+        return scores
+
+    # ========== 内部方法 ==========
+
+    async def _llm_scores(self, texts: list[str]) -> list[float]:
+        """提交给微批处理器，与其他并发请求的评论合并后调用 LLM"""
+        if not texts:
+            return []
+        return list(await asyncio.gather(*(self._batcher.submit(text) for text in texts)))
+
+    async def _llm_batch(self, texts: list[str]) -> list[float]:
+        """一批评论一个 prompt"""
+        self.llm_calls += 1
+        return await self.ai.analyze_sentiment_batch(texts)
+
+    def _compare(self, local_score: float, llm_score: float) -> bool:
+        agreed = self._polarity(local_score) == self._polarity(llm_score)
+        self.compared += 1
+        self.agreed += agreed
+        return agreed
+
+    def _polarity(self, score: float) -> int:
+        if score > self.NEUTRAL_BAND:
+            return 1
+        if score < -self.NEUTRAL_BAND:
+            return -1
+        return 0
+
+
+def get_sentiment_cascade() -> SentimentCascade:
+    """获取情感分析级联单例（AIService 持有的实例，依赖注入用）"""
+    from .ai import get_ai_service
+
+    return get_ai_service().sentiment_cascade
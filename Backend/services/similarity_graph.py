@@ -0,0 +1,358 @@
+# 相似条目图
+# 预先计算媒体条目的 k 近邻（"更多类似内容"），详情页只做查表
+# 邻居 id 存 int32、分数存 float16，由后台任务增量维护
+
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database.connection import get_db
+from ..models.media import MediaItem
+from .indexing import MediaIndexer, get_media_indexer, media_embedding_text, media_vector_id
+
+
+logger = logging.getLogger(__name__)
+
+
+def text_fingerprint(text: str) -> int:
+    """embedding 文本的 64 位指纹，用于判断条目是否需要重新计算邻居"""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+class SimilarityGraph:
+    """
+    媒体 k 近邻图
+
+    每个媒体一行：
+    - neighbors: int32 (n, k)，邻居媒体 id，不足 k 个以 -1 填充
+    - scores: float16 (n, k)，余弦相似度，按降序排列
+    - fingerprints: int64 (n,)，生成该行时 embedding 文本的指纹
+
+    增量更新只涉及新增/变更/删除条目及其邻域：
+    1. 变更条目重新检索 k 近邻
+    2. 变更条目反向插入其邻居的列表（比该列表最差的邻居更近时）
+    3. 列表中出现已删除/已变更条目的行，移除旧项；变更条目邻域外因此缺位的行重新检索
+    """
+
+    def __init__(
+        self,
+        indexer: MediaIndexer,
+        path: str,
+        k: int = 20,
+        batch_size: int = 256,
+    ):
+        self.indexer = indexer
+        self.path = path
+        self.k = k
+        self.batch_size = batch_size
+
+        self._media_ids = np.zeros(0, dtype=np.int32)
+        self._neighbors = np.full((0, k), -1, dtype=np.int32)
+        self._scores = np.zeros((0, k), dtype=np.float16)
+        self._fingerprints = np.zeros(0, dtype=np.int64)
+        self._row: dict[int, int] = {}
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._media_ids)
+
+    # ========== 查询 ==========
+
+    def neighbors(self, media_id: int, limit: Optional[int] = None) -> list[tuple[int, float]]:
+        """
+        查询相似条目（纯内存查表）
+
+        Returns:
+            [(media_id, score), ...]，按相似度降序；不在图中时为空列表
+        """
+        row = self._row.get(media_id)
+        if row is None:
+            return []
+        ids = self._neighbors[row]
+        valid = ids >= 0
+        pairs = zip(ids[valid].tolist(), self._scores[row][valid].astype(np.float32).tolist())
+        return list(pairs)[:limit]
+
+    # ========== 持久化 ==========
+
+    def load(self) -> bool:
+        """从文件加载，文件不存在或 k 不一致时返回 False（需全量构建）"""
+        if not os.path.exists(self.path):
+            return False
+        with np.load(self.path) as data:
+            if data["neighbors"].shape[1] != self.k:
+                return False
+            self._media_ids = data["media_ids"].copy()
+            self._neighbors = data["neighbors"].copy()
+            self._scores = data["scores"].copy()
+            self._fingerprints = data["fingerprints"].copy()
+        self._row = {media_id: row for row, media_id in enumerate(self._media_ids.tolist())}
+        return True
+
+    def save(self) -> None:
+        """原子写入（先写临时文件再替换）"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                media_ids=self._media_ids,
+                neighbors=self._neighbors,
+                scores=self._scores,
+                fingerprints=self._fingerprints,
+            )
+        os.replace(tmp, self.path)
+
+    # ========== 维护 ==========
+
+    async def refresh(self, db: AsyncSession) -> dict:
+        """
+        与数据库同步
+
+        只读取 (id, title, overview)，按 embedding 文本指纹找出新增/变更条目，
+        不在数据库中的条目视为删除
+
+        Returns:
+            {"changed": 变更条目数, "removed": 删除条目数, "touched": 受影响的行数}
+        """
+        async with self._lock:
+            current: dict[int, int] = {}
+            last_id = 0
+            while True:
+                stmt = (
+                    select(MediaItem.id, MediaItem.title, MediaItem.overview)
+                    .where(MediaItem.id > last_id)
+                    .order_by(MediaItem.id)
+                    .limit(self.batch_size * 16)
+                )
+                rows = (await db.execute(stmt)).all()
+                if not rows:
+                    break
+                for media_id, title, overview in rows:
+                    current[media_id] = text_fingerprint(
+                        media_embedding_text(MediaItem(title=title, overview=overview))
+                    )
+                last_id = rows[-1][0]
+
+            known = dict(zip(self._media_ids.tolist(), self._fingerprints.tolist()))
+            changed = [media_id for media_id, fp in current.items() if known.get(media_id) != fp]
+            removed = [media_id for media_id in known if media_id not in current]
+            if not changed and not removed:
+                return {"changed": 0, "removed": 0, "touched": 0}
+
+            # 变更条目的向量先写入向量库（embedding 文本变了）
+            if changed:
+                for start in range(0, len(changed), self.batch_size):
+                    batch = changed[start : start + self.batch_size]
+                    items = (await db.execute(select(MediaItem).where(MediaItem.id.in_(batch)))).scalars()
+                    await self.indexer.index_media(list(items))
+
+            touched = await self.update(
+                changed, removed, {media_id: current[media_id] for media_id in changed}
+            )
+            self.save()
+            return {"changed": len(changed), "removed": len(removed), "touched": touched}
+
+    async def update(
+        self,
+        changed: list[int],
+        removed: list[int],
+        fingerprints: Optional[dict[int, int]] = None,
+    ) -> int:
+        """
+        增量更新（向量库中已是最新向量）
+
+        Returns:
+            被修改的行数（含变更条目自身）
+        """
+        fingerprints = fingerprints or {}
+        self._drop_rows(removed)
+
+        # 1. 移除引用了已删除/已变更条目的邻居项
+        stale_ids = np.array(list(changed) + list(removed), dtype=np.int32)
+        holed_rows: set[int] = set()
+        if len(stale_ids) and len(self._media_ids):
+            stale = np.isin(self._neighbors, stale_ids)
+            holed_rows = set(np.flatnonzero(stale.any(axis=1)).tolist())
+            self._neighbors[stale] = -1
+            self._scores[stale] = 0
+            for row in holed_rows:
+                self._sort_row(row)
+
+        # 2. 变更条目重新检索邻居
+        self._ensure_rows(changed, fingerprints)
+        results = await self._search(changed)
+
+        # 3. 写入变更条目自身的行，并反向插入邻居的行
+        touched = set()
+        for media_id, hits in results.items():
+            row = self._row[media_id]
+            self._set_row(row, hits)
+            touched.add(row)
+            for neighbor_id, score in hits:
+                neighbor_row = self._row.get(neighbor_id)
+                if neighbor_row is not None and self._insert(neighbor_row, media_id, score):
+                    touched.add(neighbor_row)
+
+        # 4. 仍有缺位的行重新检索（只可能是变更/删除条目原先的邻域）
+        changed_rows = {self._row[media_id] for media_id in changed}
+        refill = [
+            int(self._media_ids[row])
+            for row in holed_rows - changed_rows
+            if (self._neighbors[row] < 0).any()
+        ]
+        for media_id, hits in (await self._search(refill)).items():
+            self._set_row(self._row[media_id], hits)
+            touched.add(self._row[media_id])
+
+        return len(touched | holed_rows)
+
+    async def rebuild(self, db: AsyncSession) -> int:
+        """全量重建（清空后按增量流程把所有条目当作新增）"""
+        async with self._lock:
+            self._media_ids = np.zeros(0, dtype=np.int32)
+            self._neighbors = np.full((0, self.k), -1, dtype=np.int32)
+            self._scores = np.zeros((0, self.k), dtype=np.float16)
+            self._fingerprints = np.zeros(0, dtype=np.int64)
+            self._row = {}
+        stats = await self.refresh(db)
+        return stats["changed"]
+
+    # ========== 内部方法 ==========
+
+    async def _search(self, media_ids: list[int]) -> dict[int, list[tuple[int, float]]]:
+        """为一批条目检索 k 近邻（读取已存储向量 + 批量检索，排除自身）"""
+        results: dict[int, list[tuple[int, float]]] = {}
+        vector_db = self.indexer.vector_db
+        for start in range(0, len(media_ids), self.batch_size):
+            batch = media_ids[start : start + self.batch_size]
+            vectors = await vector_db.fetch_many([media_vector_id(media_id) for media_id in batch])
+            present = [(media_id, vector) for media_id, vector in zip(batch, vectors) if vector is not None]
+            if not present:
+                continue
+            hits_per_item = await vector_db.search_many(
+                [vector for _, vector in present], top_k=self.k + 1, filter={"kind": "media"}
+            )
+            for (media_id, _), hits in zip(present, hits_per_item):
+                neighbors = [
+                    (hit["metadata"]["media_id"], hit["score"])
+                    for hit in hits
+                    if hit["metadata"].get("media_id") not in (None, media_id)
+                ]
+                results[media_id] = neighbors[: self.k]
+        return results
+
+    def _ensure_rows(self, media_ids: list[int], fingerprints: dict[int, int]) -> None:
+        """为新条目追加空行，已有条目更新指纹"""
+        new_ids = []
+        for media_id in media_ids:
+            row = self._row.get(media_id)
+            if row is None:
+                self._row[media_id] = len(self._media_ids) + len(new_ids)
+                new_ids.append(media_id)
+            else:
+                self._fingerprints[row] = fingerprints.get(media_id, 0)
+        if not new_ids:
+            return
+        n = len(new_ids)
+        self._media_ids = np.concatenate([self._media_ids, np.array(new_ids, dtype=np.int32)])
+        self._neighbors = np.vstack([self._neighbors, np.full((n, self.k), -1, dtype=np.int32)])
+        self._scores = np.vstack([self._scores, np.zeros((n, self.k), dtype=np.float16)])
+        self._fingerprints = np.concatenate([
+            self._fingerprints,
+            np.array([fingerprints.get(media_id, 0) for media_id in new_ids], dtype=np.int64),
+        ])
+
+    def _drop_rows(self, media_ids: list[int]) -> None:
+        rows = [self._row[media_id] for media_id in media_ids if media_id in self._row]
+        if not rows:
+            return
+        keep = np.ones(len(self._media_ids), dtype=bool)
+        keep[rows] = False
+        self._media_ids = self._media_ids[keep]
+        self._neighbors = self._neighbors[keep]
+        self._scores = self._scores[keep]
+        self._fingerprints = self._fingerprints[keep]
+        self._row = {media_id: row for row, media_id in enumerate(self._media_ids.tolist())}
+
+    def _set_row(self, row: int, hits: list[tuple[int, float]]) -> None:
+        self._neighbors[row] = -1
+        self._scores[row] = 0
+        for i, (media_id, score) in enumerate(hits[: self.k]):
+            self._neighbors[row, i] = media_id
+            self._scores[row, i] = score
+
+    def _insert(self, row: int, media_id: int, score: float) -> bool:
+        """把 (media_id, score) 按序插入一行，比该行最差邻居更近或有空位时才插入"""
+        ids = self._neighbors[row]
+        if (ids == media_id).any():
+            return False
+        free = ids < 0
+        if free.any():
+            slot = int(np.argmax(free))
+        elif score > float(self._scores[row, -1]):
+            slot = self.k - 1
+        else:
+            return False
+        self._neighbors[row, slot] = media_id
+        self._scores[row, slot] = score
+        self._sort_row(row)
+        return True
+
+    def _sort_row(self, row: int) -> None:
+        """按分数降序排列，空位 (-1) 放在最后"""
+        keys = np.where(self._neighbors[row] >= 0, -self._scores[row].astype(np.float32), np.inf)
+        order = np.argsort(keys, kind="stable")
+        self._neighbors[row] = self._neighbors[row][order]
+        self._scores[row] = self._scores[row][order]
+
+
+_similarity_graph: Optional[SimilarityGraph] = None
+
+
+async def get_similarity_graph() -> SimilarityGraph:
+    """获取相似条目图（依赖注入用）"""
+    global _similarity_graph
+    if _similarity_graph is None:
+        _similarity_graph = SimilarityGraph(
+            indexer=await get_media_indexer(),
+            path=settings.similarity_graph_path,
+            k=settings.similarity_graph_k,
+        )
+        _similarity_graph.load()
+    return _similarity_graph
+
+
+async def run_similarity_graph_job(interval: float) -> None:
+    """
+    后台任务：按固定间隔与数据库同步相似条目图
+
+    由应用 lifespan 启动，关闭时取消；向量数据库不支持 fetch_many 时记录错误后退出
+    """
+    vector_db = (await get_media_indexer()).vector_db
+    if not vector_db.supports_fetch:
+        logger.error(
+            "Similarity graph disabled: vector DB %s does not support fetch_many (use VECTOR_DB_PROVIDER=local "
+            "or set SIMILARITY_GRAPH_REFRESH_INTERVAL=0)",
+            type(vector_db).__name__,
+        )
+        return
+    while True:
+        try:
+            graph = await get_similarity_graph()
+            async for db in get_db():
+                stats = await graph.refresh(db)
+            if stats["changed"] or stats["removed"]:
+                logger.info("Similarity graph refreshed: %s", stats)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Similarity graph refresh failed")
+        await asyncio.sleep(interval)
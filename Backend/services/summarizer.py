@@ -0,0 +1,129 @@
+# 增量评论总结
+# 每个媒体保存一份滚动总结和水位线（已总结的最大 Comment.id），
+# 重新生成时只把水位线之后的新评论融入已有总结；新评论过多时先分块 map-reduce
+
+import asyncio
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models.comment import Comment, CommentSource
+from ..models.media import MediaItem
+from .ai import AIService, get_ai_service
+from .tokens import estimate_tokens
+
+
+class SummaryUpdate:
+    """一次增量总结的输入：已有总结 + 待融入的内容（新评论或其分段总结）"""
+
+    def __init__(
+        self,
+        media_title: str,
+        previous_summary: Optional[str],
+        comments: list[str],
+        watermark: int,
+    ):
+        self.media_title = media_title
+        self.previous_summary = previous_summary
+        self.comments = comments
+        self.watermark = watermark  # 本次融入的最大 Comment.id
+
+
+class IncrementalSummarizer:
+    """
+    增量总结器
+
+    - prepare：读取水位线之后的非 AI 评论；总 token 超过 chunk_tokens 时按块并发生成分段总结，
+      反复归约直到一次调用装得下
+    - 最后一步（可流式）：AIService.generate_summary / stream_summary(previous_summary=...)
+    - apply：写回滚动总结和水位线
+
+    新增一条评论后重新生成只需发送 已有总结 + 1 条评论，成本与历史评论数无关。
+    水位线只前进：已总结评论被删除不会从总结中移除，需要时可清空 ai_summary 全量重建。
+    """
+
+    def __init__(self, ai: AIService, chunk_tokens: int = 3000):
+        """
+        Args:
+            ai: AI 服务（map 阶段的并发由其 summary 并发名额限制）
+            chunk_tokens: 单次总结调用中评论部分的 token 上限
+        """
+        self.ai = ai
+        self.chunk_tokens = chunk_tokens
+
+    async def prepare(self, db: AsyncSession, media: MediaItem) -> Optional[SummaryUpdate]:
+        """准备增量总结，没有新评论时返回 None"""
+        stmt = (
+            select(Comment.id, Comment.content)
+            .where(
+                Comment.media_id == media.id,
+                Comment.source != CommentSource.AI,
+                Comment.id > (media.ai_summary_comment_id or 0),
+            )
+            .order_by(Comment.id)
+        )
+        rows = (await db.execute(stmt)).all()
+        if not rows:
+            return None
+        comments = await self._reduce(media.title, [content for _, content in rows])
+        return SummaryUpdate(media.title, media.ai_summary, comments, rows[-1][0])
+
+    async def summarize(self, db: AsyncSession, media: MediaItem) -> Optional[str]:
+        """增量更新并返回媒体的总结；没有任何评论时返回 None"""
+        update = await self.prepare(db, media)
+        if update is None:
+            return media.ai_summary
+        summary = await self.ai.generate_summary(
+            update.media_title, update.comments, previous_summary=update.previous_summary
+        )
+        self.apply(media, update, summary)
+        return summary
+
+    @staticmethod
+    def apply(media: MediaItem, update: SummaryUpdate, summary: str) -> None:
+        """写回滚动总结和水位线（并发生成时只接受水位线更新的结果）"""
+        if update.watermark <= (media.ai_summary_comment_id or 0):
+            return
+        media.ai_summary = summary
+        media.ai_summary_comment_id = update.watermark
+        media.ai_summary_updated_at = datetime.utcnow()
+
+    # ========== 内部方法 ==========
+
+    async def _reduce(self, media_title: str, comments: list[str]) -> list[str]:
+        """map-reduce：分块总结，直到全部内容可以放进一次调用"""
+        while len(comments) > 1 and sum(map(estimate_tokens, comments)) > self.chunk_tokens:
+            chunks = self._chunk(comments)
+            comments = list(await asyncio.gather(
+                *(self.ai.generate_summary(media_title, chunk) for chunk in chunks)
+            ))
+        return comments
+
+    def _chunk(self, comments: list[str]) -> list[list[str]]:
+        """按 token 上限顺序分块（每块至少两条，保证每轮归约都能减少条数）"""
+        chunks: list[list[str]] = []
+        current: list[str] = []
+        current_tokens = 0
+        for comment in comments:
+            tokens = estimate_tokens(comment)
+            if len(current) >= 2 and current_tokens + tokens > self.chunk_tokens:
+                chunks.append(current)
+                current, current_tokens = [], 0
+            current.append(comment)
+            current_tokens += tokens
+        if current:
+            chunks.append(current)
+        return chunks
+
+
+@lru_cache
+def get_summarizer() -> IncrementalSummarizer:
+    """获取增量总结器单例（依赖注入用）"""
+    return IncrementalSummarizer(
+        ai=get_ai_service(),
+        chunk_tokens=settings.summary_chunk_tokens,
+    )
@@ -0,0 +1,89 @@
+# 长文分块
+# 超长粘贴内容（如"悬疑电影前100"）按列表项/段落边界切成 token 受限、带重叠的块，
+# 各块并发提取后再合并，延迟取决于最长的块而不是整篇
+
+import re
+from typing import Iterator
+
+from .list_parser import is_list_item
+from .tokens import estimate_tokens
+
+
+# 句末标点（超长段落按句切分）；零宽匹配，句间空白留在下一句开头，拼接后原文不变
+_SENTENCE_END = re.compile(r"(?<=[。！？!?；;])|(?<=\.)(?=\s)")
+
+
+def iter_chunks(text: str, max_tokens: int = 3000, overlap_tokens: int = 200) -> Iterator[str]:
+    """
+    流式切分文本
+
+    切分单元为列表项（含其下的续行）或空行分隔的段落，单元按顺序装入块中，
+    不超过 max_tokens；下一块开头重复上一块末尾不超过 overlap_tokens 的单元，
+    避免跨块的标题和评论被切断。超过 max_tokens 的单元按句、再按字符切开。
+
+    Args:
+        text: 原始文本
+        max_tokens: 每块 token 上限（estimate_tokens 估算）
+        overlap_tokens: 相邻块重叠的 token 上限，0 表示不重叠
+    """
+    chunk: list[tuple[str, int]] = []
+    chunk_tokens = 0
+    for unit in _iter_units(text, max_tokens):
+        tokens = estimate_tokens(unit)
+        if chunk and chunk_tokens + tokens > max_tokens:
+            yield "\n".join(part for part, _ in chunk)
+            chunk = _overlap(chunk, min(overlap_tokens, max_tokens - tokens))
+            chunk_tokens = sum(size for _, size in chunk)
+        chunk.append((unit, tokens))
+        chunk_tokens += tokens
+    if chunk:
+        yield "\n".join(part for part, _ in chunk)
+
+
+# ========== 内部方法 ==========
+
+def _iter_units(text: str, max_tokens: int) -> Iterator[str]:
+    """按列表项和段落边界产出切分单元"""
+    unit: list[str] = []
+    for line in text.splitlines():
+        if not line.strip() or (is_list_item(line) and unit):
+            if unit:
+                yield from _split_oversized("\n".join(unit), max_tokens)
+                unit = []
+            if not line.strip():
+                continue
+        unit.append(line)
+    if unit:
+        yield from _split_oversized("\n".join(unit), max_tokens)
+
+
+def _split_oversized(unit: str, max_tokens: int) -> Iterator[str]:
+    if estimate_tokens(unit) <= max_tokens:
+        yield unit
+        return
+    piece = ""
+    for sentence in _SENTENCE_END.split(unit):
+        if not sentence:
+            continue
+        if piece and estimate_tokens(piece + sentence) > max_tokens:
+            yield piece
+            piece = ""
+        while estimate_tokens(sentence) > max_tokens:
+            # 没有句末标点的超长句：按字符硬切（max_tokens 个字符不会超过 max_tokens 个 token）
+            yield sentence[:max_tokens]
+            sentence = sentence[max_tokens:]
+        piece += sentence
+    if piece:
+        yield piece
+
+
+def _overlap(chunk: list[tuple[str, int]], budget: int) -> list[tuple[str, int]]:
+    """取块末尾总 token 不超过 budget 的单元作为下一块的开头"""
+    kept: list[tuple[str, int]] = []
+    used = 0
+    for unit, tokens in reversed(chunk):
+        if used + tokens > budget:
+            break
+        kept.append((unit, tokens))
+        used += tokens
+    return kept[::-1]
@@ -0,0 +1,443 @@
+# 标题匹配服务
+# 收集箱处理第 3 步：判断提取出的标题是否对应已有的媒体条目
+# 词法检索（字符三元组 BM25，覆盖标题和别名）与向量检索用 RRF 融合，上映年份作为平局裁决
+
+import json
+import logging
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.media import MediaItem
+from .indexing import MediaIndexer, get_media_indexer
+
+logger = logging.getLogger(__name__)
+
+
+_PUNCTUATION = re.compile(r"[\W_]+", re.UNICODE)
+_NUMBER = re.compile(r"\d+")
+
+
+def normalize_title(title: str) -> str:
+    """标题归一化：全角转半角、小写、去掉标点和空白（《》、：、- 等）"""
+    title = unicodedata.normalize("NFKC", title).lower()
+    return _PUNCTUATION.sub("", title)
+
+
+def title_trigrams(normalized: str) -> list[str]:
+    """
+    字符三元组（首尾加边界符）
+
+    对中文不需要分词；两个字的标题也能得到 2 个三元组
+    """
+    padded = f"^{normalized}$"
+    if len(padded) < 3:
+        return [padded]
+    return [padded[i : i + 3] for i in range(len(padded) - 2)]
+
+
+def title_numbers(normalized: str) -> frozenset[str]:
+    """标题中的数字（用于区分续集：异形 / 异形2 / 异形3）"""
+    return frozenset(_NUMBER.findall(normalized))
+
+
+def media_aliases(item: MediaItem) -> list[str]:
+    """媒体的别名列表（aliases 列存 JSON 数组）"""
+    if not item.aliases:
+        return []
+    try:
+        aliases = json.loads(item.aliases)
+    except (TypeError, ValueError):
+        return []
+    return [alias for alias in aliases if isinstance(alias, str) and alias]
+
+
+class TitleMatcher:
+    """
+    混合标题匹配器
+
+    - 词法：标题和别名的字符三元组倒排索引，BM25 打分（常驻内存）
+    - 向量：MediaIndexer.search_titles，一次批量 embedding + 一次批量检索
+    - 融合：Reciprocal Rank Fusion，score = Σ 1 / (rrf_k + rank)
+    - 平局：融合分数相差在 tie_margin 以内的候选按上映年份接近程度裁决
+
+    纯向量检索容易混淆续集和同名翻拍，纯字符串匹配又找不到译名，
+    两路互补；一次粘贴的整张片单只发起一次批量调用。
+    """
+
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+    # 批量打分时分数矩阵（查询数 x 文档数）的元素上限
+    SCORE_BLOCK = 1 << 22
+    # 文档频率超过 max(STOP_GRAM_MIN_DF, 文档数 * STOP_GRAM_RATIO) 的三元组不参与打分
+    STOP_GRAM_RATIO = 0.05
+    STOP_GRAM_MIN_DF = 256
+
+    def __init__(
+        self,
+        indexer: Optional[MediaIndexer] = None,
+        rrf_k: int = 60,
+        top_k: int = 20,
+        tie_margin: float = 0.1,
+        min_similarity: float = 0.6,
+        min_vector_score: float = 0.85,
+    ):
+        """
+        Args:
+            indexer: 向量索引器，为 None 时只用词法检索
+            rrf_k: RRF 平滑常数
+            top_k: 每一路取的候选数
+            tie_margin: 融合分数相对差距在此范围内视为平局
+            min_similarity: 仅凭词法接受匹配所需的三元组 Dice 相似度
+            min_vector_score: 仅凭向量接受匹配所需的余弦相似度
+        """
+        self.indexer = indexer
+        self.rrf_k = rrf_k
+        self.top_k = top_k
+        self.tie_margin = tie_margin
+        self.min_similarity = min_similarity
+        self.min_vector_score = min_vector_score
+
+        # 文档 = 一个标题或别名；一个媒体可对应多个文档
+        self._doc_media: list[int] = []
+        self._doc_norm: list[str] = []
+        self._doc_grams: list[frozenset[str]] = []
+        self._doc_alive: list[bool] = []
+        self._postings: dict[str, list[tuple[int, int]]] = {}
+        self._exact: dict[str, set[int]] = {}
+        self._media_docs: dict[int, list[int]] = {}
+        self._media_info: dict[int, dict] = {}
+        self._loaded = False
+
+        # 查询用的数组形式，写入后失效
+        self._arrays: Optional[dict[str, tuple[np.ndarray, np.ndarray]]] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    # ========== 索引维护 ==========
+
+    async def load(self, db: AsyncSession, batch_size: int = 1000) -> int:
+        """
+        从数据库加载全部媒体标题
+
+        Returns:
+            加载的媒体数
+        """
+        total = 0
+        last_id = 0
+        while True:
+            stmt = (
+                select(MediaItem)
+                .where(MediaItem.id > last_id)
+                .order_by(MediaItem.id)
+                .limit(batch_size)
+            )
+            items = list((await db.execute(stmt)).scalars())
+            if not items:
+                break
+            self.add_media(items)
+            total += len(items)
+            last_id = items[-1].id
+        self._loaded = True
+        return total
+
+    def add_media(self, items: list[MediaItem]) -> None:
+        """新增或更新媒体的标题索引"""
+        for item in items:
+            self.add_titles(
+                item.id,
+                [item.title, *media_aliases(item)],
+                year=item.release_date.year if item.release_date else None,
+                media_type=getattr(item.type, "value", item.type),
+            )
+
+    def add_titles(
+        self,
+        media_id: int,
+        titles: list[str],
+        year: Optional[int] = None,
+        media_type: Optional[str] = None,
+    ) -> None:
+        """登记一个媒体的标题和别名（已存在则整体替换）"""
+        self.remove_media([media_id])
+        self._media_info[media_id] = {"title": titles[0], "year": year, "type": media_type}
+        docs = []
+        for title in dict.fromkeys(titles):
+            normalized = normalize_title(title)
+            if not normalized:
+                continue
+            doc = len(self._doc_media)
+            grams = title_trigrams(normalized)
+            self._doc_media.append(media_id)
+            self._doc_norm.append(normalized)
+            self._doc_grams.append(frozenset(grams))
+            self._doc_alive.append(True)
+            for gram, tf in Counter(grams).items():
+                self._postings.setdefault(gram, []).append((doc, tf))
+            self._exact.setdefault(normalized, set()).add(media_id)
+            docs.append(doc)
+        self._media_docs[media_id] = docs
+        self._arrays = None
+
+    def remove_media(self, media_ids: list[int]) -> None:
+        """删除媒体的标题索引（倒排项在下次重建数组时跳过）"""
+        for media_id in media_ids:
+            for doc in self._media_docs.pop(media_id, []):
+                self._doc_alive[doc] = False
+                exact = self._exact.get(self._doc_norm[doc])
+                if exact is not None:
+                    exact.discard(media_id)
+                    if not exact:
+                        del self._exact[self._doc_norm[doc]]
+            self._media_info.pop(media_id, None)
+        if media_ids:
+            self._arrays = None
+
+    # ========== 匹配 ==========
+
+    async def match_many(
+        self,
+        titles: list[str],
+        years: Optional[list[Optional[int]]] = None,
+        media_type: Optional[str] = None,
+    ) -> list[Optional[dict]]:
+        """
+        批量匹配标题
+
+        Args:
+            titles: 提取出的标题列表
+            years: 与 titles 对应的年份（可缺失）
+            media_type: 限定媒体类型
+
+        Returns:
+            与 titles 逐项对应的匹配结果，未匹配为 None：
+            {"media_id", "title", "year", "score", "lexical_rank", "vector_rank", "similarity", "vector_score"}
+        """
+        if not titles:
+            return []
+        years = years or [None] * len(titles)
+
+        lexical = self._lexical_search(titles, media_type)
+        vector: list[dict[int, tuple[int, float]]] = [{} for _ in titles]
+        if self.indexer is not None:
+            media_filter = {"type": media_type} if media_type else None
+            try:
+                hits_per_title = await self.indexer.search_titles(
+                    titles, top_k=self.top_k, filter=media_filter
+                )
+            except Exception:
+                # 向量检索不可用（嵌入服务故障、熔断等）时只用词法检索，不让整个条目处理失败
+                logger.warning("Vector title search failed, falling back to lexical matching", exc_info=True)
+                hits_per_title = []
+            for ranked, hits in zip(vector, hits_per_title):
+                for hit in hits:
+                    media_id = hit["metadata"].get("media_id")
+                    if media_id in self._media_info and media_id not in ranked:
+                        ranked[media_id] = (len(ranked), hit["score"])
+
+        return [
+            self._fuse(title, year, lexical_hits, vector_hits)
+            for title, year, lexical_hits, vector_hits in zip(titles, years, lexical, vector)
+        ]
+
+    def _lexical_search(
+        self, titles: list[str], media_type: Optional[str]
+    ) -> list[dict[int, tuple[int, float]]]:
+        """BM25 检索，返回每个标题的 {media_id: (名次, 三元组 Dice 相似度)}"""
+        postings = self._get_arrays()
+        n_docs = len(self._doc_media)
+        results: list[dict[int, tuple[int, float]]] = []
+
+        # 多个查询合并为一次 bincount（文档下标按查询偏移），分块控制内存
+        block = max(1, self.SCORE_BLOCK // max(n_docs, 1))
+        for start in range(0, len(titles), block):
+            queries = [
+                title_trigrams(normalized) if normalized else []
+                for normalized in map(normalize_title, titles[start : start + block])
+            ]
+            ids, weights = [], []
+            for offset, grams in enumerate(queries):
+                for gram, qtf in self._query_grams(grams, postings, n_docs):
+                    docs, gram_weights = postings[gram]
+                    ids.append(docs + offset * n_docs)
+                    weights.append(gram_weights * qtf)
+            if ids:
+                scores = np.bincount(
+                    np.concatenate(ids),
+                    weights=np.concatenate(weights),
+                    minlength=len(queries) * n_docs,
+                ).reshape(len(queries), n_docs)
+            else:
+                scores = np.zeros((len(queries), n_docs))
+            for grams, row in zip(queries, scores):
+                results.append(self._rank_docs(frozenset(grams), row, media_type))
+        return results
+
+    def _query_grams(self, grams: list[str], postings: dict, n_docs: int) -> list[tuple[str, int]]:
+        """
+        参与打分的查询三元组
+
+        出现在大量标题中的三元组（如 "^the"）idf 很低却占据大部分倒排长度，直接跳过；
+        全部都是高频三元组时保留最稀有的一个
+        """
+        counts = [(gram, qtf) for gram, qtf in Counter(grams).items() if gram in postings]
+        max_df = max(self.STOP_GRAM_MIN_DF, int(n_docs * self.STOP_GRAM_RATIO))
+        selected = [(gram, qtf) for gram, qtf in counts if len(postings[gram][0]) <= max_df]
+        if not selected and counts:
+            selected = [min(counts, key=lambda item: len(postings[item[0]][0]))]
+        return selected
+
+    def _rank_docs(
+        self, query_grams: frozenset[str], scores: np.ndarray, media_type: Optional[str]
+    ) -> dict[int, tuple[int, float]]:
+        """文档分数聚合到媒体：取该媒体名次最高的标题/别名"""
+        candidates = np.flatnonzero(scores)
+        limit = self.top_k * 4
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        ranked: dict[int, tuple[int, float]] = {}
+        for doc in candidates.tolist():
+            media_id = self._doc_media[doc]
+            if media_id in ranked:
+                continue
+            if media_type and self._media_info[media_id]["type"] != media_type:
+                continue
+            doc_grams = self._doc_grams[doc]
+            similarity = 2 * len(query_grams & doc_grams) / (len(query_grams) + len(doc_grams))
+            ranked[media_id] = (len(ranked), similarity)
+            if len(ranked) >= self.top_k:
+                break
+        return ranked
+
+    def _fuse(
+        self,
+        title: str,
+        year: Optional[int],
+        lexical: dict[int, tuple[int, float]],
+        vector: dict[int, tuple[int, float]],
+    ) -> Optional[dict]:
+        """RRF 融合单个标题的两路候选并决定是否接受"""
+        normalized = normalize_title(title)
+        numbers = title_numbers(normalized)
+        exact = self._exact.get(normalized, set())
+
+        candidates = []
+        for media_id in lexical.keys() | vector.keys():
+            lexical_rank, similarity = lexical.get(media_id, (None, 0.0))
+            vector_rank, vector_score = vector.get(media_id, (None, 0.0))
+            score = 0.0
+            if lexical_rank is not None:
+                score += 1.0 / (self.rrf_k + lexical_rank + 1)
+            if vector_rank is not None:
+                score += 1.0 / (self.rrf_k + vector_rank + 1)
+
+            is_exact = media_id in exact
+            if not (
+                is_exact
+                or similarity >= self.min_similarity
+                or vector_score >= self.min_vector_score
+            ):
+                continue
+            info = self._media_info[media_id]
+            candidates.append({
+                "media_id": media_id,
+                "title": info["title"],
+                "year": info["year"],
+                "score": score,
+                "lexical_rank": lexical_rank,
+                "vector_rank": vector_rank,
+                "similarity": similarity,
+                "vector_score": vector_score,
+                # 续集判定：数字集合一致（"异形" 不应匹配 "异形2"）
+                "_numbers_match": numbers == self._media_numbers(media_id, normalized),
+                "_exact": is_exact,
+            })
+        if not candidates:
+            return None
+
+        # 标题完全一致 > 数字一致 > 其余；同组内按融合分数
+        candidates.sort(key=lambda c: (not c["_exact"], not c["_numbers_match"], -c["score"]))
+        best = candidates[0]
+        if not best["_exact"] and not best["_numbers_match"]:
+            return None
+
+        if year is not None:
+            contenders = [
+                c for c in candidates
+                if c["_exact"] == best["_exact"]
+                and c["_numbers_match"] == best["_numbers_match"]
+                and c["score"] >= best["score"] * (1 - self.tie_margin)
+            ]
+            best = min(
+                contenders,
+                key=lambda c: (abs(c["year"] - year) if c["year"] is not None else math.inf, -c["score"]),
+            )
+
+        return {key: value for key, value in best.items() if not key.startswith("_")}
+
+    def _media_numbers(self, media_id: int, normalized_query: str) -> frozenset[str]:
+        """与查询最相近的标题/别名中的数字"""
+        docs = self._media_docs.get(media_id, [])
+        for doc in docs:
+            if self._doc_norm[doc] == normalized_query:
+                return title_numbers(normalized_query)
+        if not docs:
+            return frozenset()
+        query_grams = frozenset(title_trigrams(normalized_query))
+        doc = max(docs, key=lambda d: len(query_grams & self._doc_grams[d]))
+        return title_numbers(self._doc_norm[doc])
+
+    def _get_arrays(self) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+        """
+        倒排表转为 numpy 数组（跳过已删除文档）
+
+        每个倒排项预先算好 BM25 权重 idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avg_len))，
+        查询时只需按文档累加
+        """
+        if self._arrays is not None:
+            return self._arrays
+
+        alive = np.array(self._doc_alive, dtype=bool)
+        doc_len = np.array([max(len(norm), 1) for norm in self._doc_norm], dtype=np.float64)
+        n_alive = max(int(alive.sum()), 1)
+        avg_len = float(doc_len[alive].mean()) if alive.any() else 1.0
+        length_norm = self.BM25_K1 * (1 - self.BM25_B + self.BM25_B * doc_len / avg_len)
+
+        postings = {}
+        for gram, entries in list(self._postings.items()):
+            entries = [(doc, tf) for doc, tf in entries if self._doc_alive[doc]]
+            if not entries:
+                del self._postings[gram]
+                continue
+            self._postings[gram] = entries
+            docs = np.array([doc for doc, _ in entries], dtype=np.int64)
+            tfs = np.array([tf for _, tf in entries], dtype=np.float64)
+            df = len(entries)
+            idf = math.log(1 + (n_alive - df + 0.5) / (df + 0.5))
+            postings[gram] = (docs, idf * tfs * (self.BM25_K1 + 1) / (tfs + length_norm[docs]))
+
+        self._arrays = postings
+        return self._arrays
+
+
+_title_matcher: Optional[TitleMatcher] = None
+
+
+async def get_title_matcher(db: AsyncSession) -> TitleMatcher:
+    """获取标题匹配器（首次调用时从数据库加载标题索引）"""
+    global _title_matcher
+    if _title_matcher is None:
+        _title_matcher = TitleMatcher(indexer=await get_media_indexer())
+    if not _title_matcher.is_loaded:
+        await _title_matcher.load(db)
+    return _title_matcher
@@ -0,0 +1,258 @@
+# 标题解析
+# 把提取出的标题批量解析为 TMDB 条目：归一化去重、查缓存，未命中的并发调用 search_multi
+
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Optional
+
+from ..config import settings
+from .list_parser import title_key
+from .resilience import ConcurrencyLimiter
+from .tmdb import TMDBService, get_tmdb_service
+
+logger = logging.getLogger(__name__)
+
+
+# 候选评分权重：标题匹配程度 > 年份吻合 > 热度
+TITLE_WEIGHT = 3.0
+YEAR_WEIGHT = 2.0
+POPULARITY_WEIGHT = 1.0
+POPULARITY_SATURATION = 1000.0  # TMDB popularity 达到该值时热度得分为 1
+# 最低得分：标题完全相同且年份不冲突，或标题互相包含且年份相同
+MIN_SCORE = 2.0
+
+
+def _release_year(date: Optional[str]) -> Optional[int]:
+    if date and len(date) >= 4 and date[:4].isdigit():
+        return int(date[:4])
+    return None
+
+
+def score_candidate(title: str, year: Optional[int], candidate) -> float:
+    """
+    候选条目得分，不可接受（低于 MIN_SCORE）时返回 0
+
+    - 标题：归一化后与 title/name/original_title/original_name 相同得 1；
+      互相包含得 0.5，且只在提取出的年份与候选年份相同时接受（"Up" 不能匹配 "Upgrade"）
+    - 年份：相同得 1，相差一年（不同地区上映日期）得 0.5，更远扣 1；没有年份时不计
+    - 热度：log 缩放到 0-1，在标题和年份都相近时挑出更知名的作品
+    """
+    key = title_key(title)
+    names = {
+        title_key(name)
+        for name in (candidate.title, candidate.name, candidate.original_title, candidate.original_name)
+        if name
+    }
+    names.discard("")
+    if not key or not names:
+        return 0.0
+    if key in names:
+        title_score = 1.0
+    elif any(key in name or name in key for name in names):
+        title_score = 0.5
+    else:
+        return 0.0
+
+    year_score = 0.0
+    candidate_year = _release_year(candidate.release_date or candidate.first_air_date)
+    if year is not None and candidate_year is not None:
+        difference = abs(year - candidate_year)
+        year_score = 1.0 if difference == 0 else 0.5 if difference == 1 else -1.0
+    if title_score < 1.0 and year_score < 1.0:
+        return 0.0
+
+    popularity = candidate.popularity or 0.0
+    popularity_score = min(1.0, math.log1p(popularity) / math.log1p(POPULARITY_SATURATION))
+    score = TITLE_WEIGHT * title_score + YEAR_WEIGHT * year_score + POPULARITY_WEIGHT * popularity_score
+    return score if score >= MIN_SCORE else 0.0
+
+
+class TitleResolver:
+    """
+    标题 → TMDB 条目
+
+    - 归一化：按 title_key（NFKC、小写、去标点）+ 年份去重，同一批内相同标题只查一次
+    - 缓存：内存 LRU，未找到的结果也缓存（避免重复搜索），查询失败不缓存
+    - 并发：未命中的标题同时调用 search_multi，受 concurrency 限制；
+      多个任务同时解析同一标题时共享同一次查询
+    - 选择：只考虑电影/剧集，按 score_candidate 取最高分；没有可接受的候选时视为未找到
+
+    本地库匹配由调用方先完成（TitleMatcher），这里只处理本地库中没有的标题
+    """
+
+    def __init__(
+        self,
+        tmdb: TMDBService,
+        concurrency: int = 8,
+        cache_items: int = 10000,
+        cache_ttl: float = 86400.0,
+    ):
+        self.tmdb = tmdb
+        self.limiter = ConcurrencyLimiter("tmdb_search", concurrency)
+        self.cache_items = cache_items
+        self.cache_ttl = cache_ttl
+        self._cache: OrderedDict[tuple, tuple[float, Optional[dict]]] = OrderedDict()
+        self._inflight: dict[tuple, asyncio.Future] = {}
+
+        self.lookups = 0
+        self.cache_hits = 0
+        self.errors = 0
+
+    async def resolve_many(
+        self,
+        titles: list[str],
+        years: Optional[list[Optional[int]]] = None,
+        on_resolved: Optional[Callable[[int, Optional[dict]], object]] = None,
+    ) -> list[Optional[dict]]:
+        """
+        批量解析标题
+
+        Args:
+            on_resolved: 每个标题得到结果时回调 on_resolved(titles 中的下标, 结果)，
+                缓存命中的立即回调，其余按查询完成的先后
+
+        Returns:
+            与 titles 逐项对应的结果，未找到或查询失败为 None：
+            {"tmdb_id", "media_type", "title", "original_title", "release_date",
+             "year", "poster_path", "overview", "popularity", "vote_average"}
+        """
+        years = years or [None] * len(titles)
+        keys = [(title_key(title), year) for title, year in zip(titles, years)]
+        positions: dict[tuple, list[int]] = {}
+        pending: dict[tuple, str] = {}
+        for index, (key, title) in enumerate(zip(keys, titles)):
+            positions.setdefault(key, []).append(index)
+            if key[0] and key not in pending:
+                pending[key] = title
+
+        def notify(key: tuple, result: Optional[dict]) -> None:
+            if on_resolved is not None:
+                for index in positions[key]:
+                    on_resolved(index, result)
+
+        results: dict[tuple, Optional[dict]] = {}
+        misses = []
+        for key in positions:
+            if key not in pending:
+                notify(key, None)  # 归一化后为空的标题
+                continue
+            cached = self._cache_get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                results[key] = cached[1]
+                notify(key, cached[1])
+            else:
+                misses.append(key)
+
+        async def resolve(key: tuple) -> Optional[dict]:
+            result = await self._resolve(key, pending[key])
+            notify(key, result)
+            return result
+
+        resolved = await asyncio.gather(*(resolve(key) for key in misses))
+        results.update(zip(misses, resolved))
+        return [results.get(key) for key in keys]
+
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "cache_hits": self.cache_hits,
+            "errors": self.errors,
+            "cached_titles": len(self._cache),
+            "search": self.limiter.stats(),
+        }
+
+    # ========== 内部方法 ==========
+
+    async def _resolve(self, key: tuple, title: str) -> Optional[dict]:
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._search(title, key[1])
+        except asyncio.CancelledError:
+            # 等待同一查询的其他任务不能因为本任务被取消而收到 CancelledError：
+            # 按未找到处理（不缓存），由它们各自继续
+            future.set_result(None)
+            raise
+        except Exception:
+            self.errors += 1
+            logger.warning("TMDB lookup failed for %r", title, exc_info=True)
+            result = None
+            future.set_result(result)
+        else:
+            self._cache_put(key, result)
+            future.set_result(result)
+        finally:
+            del self._inflight[key]
+        return result
+
+    async def _search(self, title: str, year: Optional[int]) -> Optional[dict]:
+        async with self.limiter:
+            self.lookups += 1
+            response = await self.tmdb.search_multi(title)
+        best, best_score = None, 0.0
+        for candidate in response.results:
+            if candidate.media_type not in ("movie", "tv"):
+                continue
+            score = score_candidate(title, year, candidate)
+            if score > best_score:
+                best, best_score = candidate, score
+        if best is None:
+            return None
+        return {
+            "tmdb_id": best.id,
+            "media_type": best.media_type,
+            "title": best.display_title,
+            "original_title": best.original_title or best.original_name,
+            "release_date": best.display_date,
+            "year": _release_year(best.display_date),
+            "poster_path": best.poster_path,
+            "overview": best.overview,
+            "popularity": best.popularity,
+            "vote_average": best.vote_average,
+        }
+
+    def _cache_get(self, key: tuple) -> Optional[tuple[float, Optional[dict]]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.cache_ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry
+
+    def _cache_put(self, key: tuple, result: Optional[dict]) -> None:
+        self._cache[key] = (time.monotonic(), result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_items:
+            self._cache.popitem(last=False)
+
+
+def parse_release_date(date: Optional[str]) -> Optional[datetime]:
+    """解析 TMDB 日期（YYYY-MM-DD），无法解析时返回 None"""
+    if not date:
+        return None
+    try:
+        return datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+@lru_cache
+def get_title_resolver() -> TitleResolver:
+    """获取标题解析单例（依赖注入用）"""
+    return TitleResolver(
+        tmdb=get_tmdb_service(),
+        concurrency=settings.tmdb_search_concurrency,
+        cache_items=settings.tmdb_resolution_cache_items,
+        cache_ttl=settings.tmdb_resolution_cache_ttl,
+    )
@@ -0,0 +1,222 @@
+# Token 预算
+# 调用 LLM 前估算 token 并压缩输入（去链接/样板文字/重复行、按相关度截断评论），
+# 限制单次调用和每分钟的 token 用量，并记录接口返回的实际用量
+
+import asyncio
+import math
+import re
+import time
+import unicodedata
+from collections import deque
+from typing import Optional
+
+from .local_ai import LexiconSentimentAnalyzer
+from .tokens import estimate_tokens
+
+
+class TokenBudgetExceeded(Exception):
+    """单次调用超出 token 预算"""
+
+    def __init__(self, tokens: int, limit: int):
+        self.tokens = tokens
+        self.limit = limit
+        super().__init__(f"Prompt needs ~{tokens} tokens, per-call budget is {limit}")
+
+
+# ========== 输入压缩 ==========
+
+_URL = re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)
+_MARKDOWN_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_INLINE_SPACE = re.compile(r"[ \t　]+")
+# 博文/社交平台常见的样板行（整行匹配才删除，避免误删正文）
+_BOILERPLATE = re.compile(
+    r"^(?:点赞|收藏|转发|评论|分享|关注|举报|回复|展开|收起|阅读全文|查看更多|原文链接|本文链接|"
+    r"未经授权禁止转载.*|转载请注明.*|版权所有.*|著作权归作者所有.*|"
+    r"(?:点击|欢迎)?关注.{0,20}(?:公众号|微博|账号).*|"
+    r"share|like|reply|subscribe|follow|read more|copyright.*|all rights reserved.*)"
+    r"[\s\d:：,，.。!！]*$",
+    re.IGNORECASE,
+)
+_DEDUPE_KEY = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def compact_text(text: str) -> str:
+    """
+    压缩粘贴内容
+
+    删除 URL、Markdown 图片、样板行（点赞/转发/版权声明等），合并行内空白，
+    去掉重复行（按归一化内容判断，保留第一次出现），连续空行只保留一个；
+    列表和段落的行结构保持不变
+    """
+    lines = []
+    seen: set[str] = set()
+    blank = False
+    for line in text.splitlines():
+        line = _INLINE_SPACE.sub(" ", _URL.sub("", _MARKDOWN_IMAGE.sub("", line))).rstrip()
+        stripped = line.strip()
+        if not stripped:
+            blank = bool(lines)
+            continue
+        if _BOILERPLATE.match(stripped):
+            continue
+        key = _DEDUPE_KEY.sub("", unicodedata.normalize("NFKC", stripped).lower())
+        if key in seen:
+            continue
+        if key:
+            seen.add(key)
+        if blank:
+            lines.append("")
+            blank = False
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """截断到 max_tokens 以内，优先在行尾截断"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    kept = []
+    used = 0
+    for line in text.splitlines():
+        tokens = estimate_tokens(line) + 1
+        if used + tokens > max_tokens:
+            if not kept:
+                # 第一行就超出：按字符截断（每个字符不超过 1 token）
+                kept.append(line[:max_tokens])
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join(kept)
+
+
+_sentiment = LexiconSentimentAnalyzer()
+
+
+def comment_relevance(comment: str) -> float:
+    """
+    评论的相关度：观点越明确、信息量越大越相关
+
+    = 0.6 × 本地情感分析置信度 + 0.4 × 长度得分（约 60 token 饱和）
+    少于 4 个字的评论（"好看"、"+1"）长度得分为 0
+    """
+    _, confidence = _sentiment.analyze(comment)
+    length = len(comment.strip())
+    length_score = 0.0 if length < 4 else min(1.0, math.log1p(estimate_tokens(comment)) / math.log1p(60))
+    return 0.6 * confidence + 0.4 * length_score
+
+
+def select_comments(comments: list[str], max_tokens: int) -> list[str]:
+    """
+    在 token 预算内按相关度挑选评论
+
+    先去重（归一化后相同的只保留一条），再按相关度从高到低装入预算，
+    返回结果保持原有顺序；单条超出预算的评论截断后装入
+    """
+    unique: dict[str, int] = {}
+    for i, comment in enumerate(comments):
+        key = _DEDUPE_KEY.sub("", unicodedata.normalize("NFKC", comment).lower())
+        if key:
+            unique.setdefault(key, i)
+    indices = list(unique.values())
+    if sum(estimate_tokens(comments[i]) + 1 for i in indices) <= max_tokens:
+        return [comments[i] for i in indices]
+
+    ranked = sorted(indices, key=lambda i: comment_relevance(comments[i]), reverse=True)
+    chosen: dict[int, str] = {}
+    used = 0
+    for i in ranked:
+        tokens = estimate_tokens(comments[i]) + 1
+        if used + tokens <= max_tokens:
+            chosen[i] = comments[i]
+            used += tokens
+        elif not chosen:
+            chosen[i] = truncate_to_tokens(comments[i], max_tokens - 1)
+            used = max_tokens
+    return [chosen[i] for i in sorted(chosen)]
+
+
+def estimate_message_tokens(messages: list[dict]) -> int:
+    """估算 chat messages 的 prompt token（每条消息约 4 个格式 token）"""
+    return sum(estimate_tokens(message.get("content") or "") + 4 for message in messages) + 2
+
+
+# ========== 预算 ==========
+
+class TokenBudget:
+    """
+    Token 预算
+
+    - 单次调用：prompt 估算超过 max_prompt_tokens 时抛出 TokenBudgetExceeded（调用方应先压缩）
+    - 每分钟：最近 60 秒内 prompt + completion 的 token 超过 tokens_per_minute 时等待，
+      调用前按估算预占，调用后用接口返回的实际用量校正
+    - 统计：调用次数、估算与实际的 prompt/completion token 总量
+    """
+
+    WINDOW = 60.0
+
+    def __init__(
+        self,
+        max_prompt_tokens: int = 8000,
+        tokens_per_minute: int = 0,
+        default_completion_tokens: int = 1024,
+    ):
+        """
+        Args:
+            max_prompt_tokens: 单次调用 prompt token 上限，0 表示不限
+            tokens_per_minute: 每分钟 token 上限，0 表示不限
+            default_completion_tokens: 调用未指定 max_tokens 时为输出预占的 token 数
+        """
+        self.max_prompt_tokens = max_prompt_tokens
+        self.tokens_per_minute = tokens_per_minute
+        self.default_completion_tokens = default_completion_tokens
+        self._window: deque[list] = deque()  # [时间, token 数]
+        self._lock = asyncio.Lock()
+
+        self.calls = 0
+        self.estimated_prompt_tokens = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    async def acquire(self, prompt_tokens: int, max_completion_tokens: Optional[int] = None) -> list:
+        """
+        预占一次调用的预算，必要时等待每分钟额度
+
+        Returns:
+            预占记录，调用结束后传给 record
+        """
+        if self.max_prompt_tokens and prompt_tokens > self.max_prompt_tokens:
+            raise TokenBudgetExceeded(prompt_tokens, self.max_prompt_tokens)
+        reserved = prompt_tokens + (max_completion_tokens or self.default_completion_tokens)
+        async with self._lock:
+            if self.tokens_per_minute:
+                # 单次预占超过每分钟额度时按额度计，避免永远等待
+                reserved = min(reserved, self.tokens_per_minute)
+                while True:
+                    now = time.monotonic()
+                    while self._window and self._window[0][0] <= now - self.WINDOW:
+                        self._window.popleft()
+                    used = sum(tokens for _, tokens in self._window)
+                    if used + reserved <= self.tokens_per_minute:
+                        break
+                    await asyncio.sleep(self._window[0][0] + self.WINDOW - now)
+            entry = [time.monotonic(), reserved]
+            # 未限制每分钟额度时不需要滑动窗口，不保留记录
+            if self.tokens_per_minute:
+                self._window.append(entry)
+        self.calls += 1
+        self.estimated_prompt_tokens += prompt_tokens
+        return entry
+
+    def record(self, entry: list, prompt_tokens: int, completion_tokens: int) -> None:
+        """记录实际用量，并用其校正预占"""
+        entry[1] = prompt_tokens + completion_tokens
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "estimated_prompt_tokens": self.estimated_prompt_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
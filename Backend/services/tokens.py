@@ -0,0 +1,17 @@
+# Token 估算
+# 不依赖具体分词器的近似估算，用于批量大小和预算控制
+
+import re
+
+
+_CJK = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数
+
+    中日韩字符约 1 字 1 token，其余字符约 4 个 1 token（OpenAI 分词器的经验值）
+    """
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
@@ -0,0 +1,428 @@
+# 网页抓取
+# 收集箱提交链接时下载页面并提取正文，交给 extract_media_info 处理
+
+import asyncio
+import ipaddress
+import logging
+import re
+import socket
+import time
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import Optional
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+import httpx
+
+from ..config import settings
+from .resilience import ConcurrencyLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class UrlFetchError(Exception):
+    """网页抓取失败"""
+
+    def __init__(self, message: str, url: str, status_code: Optional[int] = None):
+        self.message = message
+        self.url = url
+        self.status_code = status_code
+        super().__init__(f"{message}: {url}")
+
+
+# ========== 正文提取 ==========
+
+# 内容整体忽略的标签
+_SKIP_TAGS = frozenset({
+    "script", "style", "noscript", "template", "svg", "iframe", "form", "button", "select",
+    "nav", "header", "footer", "aside",
+})
+# 块级标签：开始/结束时结束当前文本块
+_BLOCK_TAGS = frozenset({
+    "p", "div", "li", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "td", "th",
+    "tr", "dt", "dd", "br", "hr", "section", "article", "main", "figcaption", "table", "ul", "ol",
+})
+# 正文容器：页面有这些容器且其中文字足够多时只取容器内的文字
+_ARTICLE_TAGS = frozenset({"article", "main"})
+_VOID_TAGS = frozenset({"br", "hr", "img", "meta", "link", "input", "source", "wbr"})
+_SPACE = re.compile(r"\s+")
+
+MIN_ARTICLE_CHARS = 200  # 正文容器内文字少于该长度时视为不可信，改用整页
+MAX_LINK_DENSITY = 0.5  # 链接文字占比超过该值的块视为导航/推荐链接，丢弃
+
+
+class _ArticleParser(HTMLParser):
+    """把 HTML 切成文本块，记录每块是否在正文容器内、链接文字占比"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks: list[tuple[str, bool, float]] = []  # (文本, 是否在正文容器内, 链接文字占比)
+        self.title = ""
+        self._skip_depth = 0
+        self._article_depth = 0
+        self._link_depth = 0
+        self._in_title = False
+        self._lists: list[list] = []  # [是否有序, 当前序号]
+        self._prefix = ""
+        self._parts: list[str] = []
+        self._link_chars = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            if tag not in _VOID_TAGS:
+                self._skip_depth += 1
+            return
+        if tag == "title":
+            self._in_title = True
+            return
+        if tag in _BLOCK_TAGS:
+            self._flush()
+        if tag in _ARTICLE_TAGS:
+            self._article_depth += 1
+        elif tag in ("ul", "ol"):
+            self._lists.append([tag == "ol", 0])
+        elif tag == "li" and self._lists:
+            current = self._lists[-1]
+            current[1] += 1
+            self._prefix = f"{current[1]}. " if current[0] else "- "
+        elif tag == "a":
+            self._link_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+        if tag == "title":
+            self._in_title = False
+            return
+        if tag in _BLOCK_TAGS:
+            self._flush()
+        if tag in _ARTICLE_TAGS:
+            self._article_depth = max(0, self._article_depth - 1)
+        elif tag in ("ul", "ol") and self._lists:
+            self._lists.pop()
+        elif tag == "a":
+            self._link_depth = max(0, self._link_depth - 1)
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+            return
+        if self._skip_depth:
+            return
+        self._parts.append(data)
+        if self._link_depth:
+            self._link_chars += len(data.strip())
+
+    def close(self):
+        super().close()
+        self._flush()
+        self.title = _SPACE.sub(" ", self.title).strip()
+
+    def _flush(self) -> None:
+        text = _SPACE.sub(" ", "".join(self._parts)).strip()
+        if text:
+            link_density = min(1.0, self._link_chars / len(text))
+            self.blocks.append((self._prefix + text, self._article_depth > 0, link_density))
+        self._parts = []
+        self._link_chars = 0
+        self._prefix = ""
+
+
+def extract_article(html: str) -> tuple[str, str]:
+    """
+    提取网页正文
+
+    去掉脚本/样式/导航/页眉页脚/侧栏，按块级标签分行，列表项保留编号（"1. " / "- "）
+    以便榜单解析；有 <article>/<main> 且其中文字足够多时只取其中的文字，
+    丢弃链接文字占比过高的块（导航、相关文章链接）
+
+    Returns:
+        (正文, 页面标题)
+    """
+    parser = _ArticleParser()
+    parser.feed(html)
+    parser.close()
+    blocks = [(text, in_article) for text, in_article, density in parser.blocks if density <= MAX_LINK_DENSITY]
+    article = [text for text, in_article in blocks if in_article]
+    if sum(len(text) for text in article) < MIN_ARTICLE_CHARS:
+        article = [text for text, _ in blocks]
+    return "\n".join(article), parser.title
+
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+
+def _decode(body: bytes, charset: Optional[str]) -> str:
+    """按响应头 charset、<meta charset> 的顺序确定编码，默认 UTF-8"""
+    if not charset:
+        match = _META_CHARSET.search(body[:4096])
+        charset = match.group(1).decode("ascii") if match else "utf-8"
+    try:
+        return body.decode(charset, errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+# ========== 抓取 ==========
+
+class UrlFetcher:
+    """
+    网页抓取器
+
+    - 连接池：所有请求共用一个 httpx.AsyncClient（keep-alive 复用连接）
+    - 限流：每个主机的并发上限和每秒请求数上限，避免被目标站点封禁
+    - 大小限制：流式读取，超过 max_bytes 后停止读取并截断
+    - 缓存：按 URL 缓存提取结果；fresh_seconds 内直接返回，过期后带
+      If-None-Match / If-Modified-Since 重新请求，304 时复用缓存
+    - 安全：只允许 http/https，默认拒绝解析到内网/回环地址的主机（含重定向目标）
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        per_host_concurrency: int = 2,
+        per_host_rate: float = 2.0,
+        max_bytes: int = 2_000_000,
+        timeout: float = 15.0,
+        max_redirects: int = 5,
+        cache_items: int = 1000,
+        fresh_seconds: float = 3600.0,
+        user_agent: str = "Zoetrope/0.1",
+        allow_private_hosts: bool = False,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Args:
+            per_host_rate: 每个主机每秒最多发起的请求数，0 表示不限
+            transport: 自定义 httpx transport（测试时可替换为本地替身）
+        """
+        self.max_connections = max_connections
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_rate = per_host_rate
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.cache_items = cache_items
+        self.fresh_seconds = fresh_seconds
+        self.user_agent = user_agent
+        self.allow_private_hosts = allow_private_hosts
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limiters: dict[str, ConcurrencyLimiter] = {}
+        self._host_next_slot: dict[str, float] = {}
+        self._cache: OrderedDict[str, dict] = OrderedDict()
+
+        self.fetches = 0
+        self.cache_hits = 0
+        self.revalidated = 0
+        self.bytes_downloaded = 0
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        """获取或创建 HTTP 客户端"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                headers={
+                    "User-Agent": self.user_agent,
+                    "Accept": "text/html,application/xhtml+xml,text/plain;q=0.9,*/*;q=0.5",
+                },
+                transport=self._transport,
+            )
+        return self._client
+
+    async def close(self):
+        """关闭 HTTP 客户端"""
+        if self._client and not self._client.is_closed:
+            await self._client.aclose()
+
+    async def fetch(self, url: str) -> dict:
+        """
+        抓取网页并提取正文
+
+        Returns:
+            {"url", "final_url", "title", "text", "truncated", "cached"}
+
+        Raises:
+            UrlFetchError: URL 不合法、主机被拒绝、HTTP 错误或不是文本内容
+        """
+        url = urldefrag(url.strip())[0]
+        self._check_scheme(url)
+        cached = self._cache.get(url)
+        if cached is not None:
+            self._cache.move_to_end(url)
+            if time.monotonic() - cached["fetched_at"] < self.fresh_seconds:
+                self.cache_hits += 1
+                return self._result(url, cached, True)
+
+        client = await self._get_client()
+        target = url
+        for _ in range(self.max_redirects + 1):
+            host = urlsplit(target).hostname or ""
+            await self._check_host(host)
+            headers = self._conditional_headers(cached, target)
+            async with self._host_limiter(host):
+                await self._throttle(host)
+                self.fetches += 1
+                async with client.stream("GET", target, headers=headers) as response:
+                    if response.status_code == 304 and cached is not None:
+                        self.revalidated += 1
+                        cached["fetched_at"] = time.monotonic()
+                        return self._result(url, cached, True)
+                    if response.is_redirect:
+                        location = response.headers.get("location")
+                        if not location:
+                            raise UrlFetchError("Redirect without location", target, response.status_code)
+                        target = urldefrag(urljoin(target, location))[0]
+                        self._check_scheme(target)
+                        continue
+                    if response.status_code >= 400:
+                        raise UrlFetchError(f"HTTP {response.status_code}", target, response.status_code)
+                    entry = await self._read(target, response)
+            self._store(url, entry)
+            return self._result(url, entry, False)
+        raise UrlFetchError("Too many redirects", url)
+
+    def stats(self) -> dict:
+        return {
+            "fetches": self.fetches,
+            "cache_hits": self.cache_hits,
+            "revalidated": self.revalidated,
+            "bytes_downloaded": self.bytes_downloaded,
+            "cached_urls": len(self._cache),
+        }
+
+    # ========== 内部方法 ==========
+
+    async def _read(self, url: str, response: httpx.Response) -> dict:
+        """流式读取响应（超过 max_bytes 截断）并提取正文"""
+        content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type and not (content_type.startswith("text/") or content_type == "application/xhtml+xml"):
+            raise UrlFetchError(f"Unsupported content type {content_type}", url, response.status_code)
+
+        chunks = []
+        size = 0
+        truncated = False
+        async for chunk in response.aiter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= self.max_bytes:
+                truncated = size > self.max_bytes
+                break
+        self.bytes_downloaded += size
+        body = b"".join(chunks)[: self.max_bytes]
+
+        text = _decode(body, response.charset_encoding)
+        if content_type == "text/plain":
+            title = ""
+        else:
+            text, title = extract_article(text)
+        return {
+            "final_url": str(response.url),
+            "title": title,
+            "text": text,
+            "truncated": truncated,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "fetched_at": time.monotonic(),
+        }
+
+    def _store(self, url: str, entry: dict) -> None:
+        self._cache[url] = entry
+        self._cache.move_to_end(url)
+        while len(self._cache) > self.cache_items:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _result(url: str, entry: dict, cached: bool) -> dict:
+        return {
+            "url": url,
+            "final_url": entry["final_url"],
+            "title": entry["title"],
+            "text": entry["text"],
+            "truncated": entry["truncated"],
+            "cached": cached,
+        }
+
+    @staticmethod
+    def _conditional_headers(cached: Optional[dict], target: str) -> dict:
+        """缓存对应的最终地址（重定向后）才带校验头"""
+        headers = {}
+        if cached is not None and target == cached["final_url"]:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+    @staticmethod
+    def _check_scheme(url: str) -> None:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise UrlFetchError("Only http(s) URLs are supported", url)
+
+    async def _check_host(self, host: str) -> None:
+        """拒绝解析到非公网地址的主机"""
+        if self.allow_private_hosts:
+            return
+        try:
+            addresses = [ipaddress.ip_address(host)]
+        except ValueError:
+            try:
+                infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+            except socket.gaierror as e:
+                raise UrlFetchError(f"Cannot resolve host ({e})", host) from e
+            addresses = [ipaddress.ip_address(info[4][0]) for info in infos]
+        if any(not address.is_global for address in addresses):
+            raise UrlFetchError("Refusing to fetch non-public address", host)
+
+    def _host_limiter(self, host: str) -> ConcurrencyLimiter:
+        limiter = self._host_limiters.get(host)
+        if limiter is None:
+            limiter = ConcurrencyLimiter(host, self.per_host_concurrency)
+            self._host_limiters[host] = limiter
+        return limiter
+
+    async def _throttle(self, host: str) -> None:
+        """按每秒请求数为该主机预约下一个发起时间，未到时间则等待"""
+        if self.per_host_rate <= 0:
+            return
+        now = time.monotonic()
+        slot = max(now, self._host_next_slot.get(host, 0.0))
+        self._host_next_slot[host] = slot + 1.0 / self.per_host_rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+# 全局实例
+_url_fetcher: Optional[UrlFetcher] = None
+
+
+def get_url_fetcher() -> UrlFetcher:
+    """获取网页抓取器单例"""
+    global _url_fetcher
+    if _url_fetcher is None:
+        _url_fetcher = UrlFetcher(
+            max_connections=settings.url_fetch_max_connections,
+            per_host_concurrency=settings.url_fetch_per_host_concurrency,
+            per_host_rate=settings.url_fetch_per_host_rate,
+            max_bytes=settings.url_fetch_max_bytes,
+            timeout=settings.url_fetch_timeout,
+            cache_items=settings.url_fetch_cache_items,
+            fresh_seconds=settings.url_fetch_cache_fresh_seconds,
+            user_agent=settings.url_fetch_user_agent,
+            allow_private_hosts=settings.url_fetch_allow_private_hosts,
+        )
+    return _url_fetcher
+
+
+async def close_url_fetcher() -> None:
+    """关闭网页抓取器"""
+    global _url_fetcher
+    if _url_fetcher:
+        await _url_fetcher.close()
+        _url_fetcher = None
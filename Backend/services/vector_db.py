@@ -1,6 +1,7 @@
 # 向量数据库服务
 # 用于媒体条目的语义检索和去重
 
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Optional
 from functools import lru_cache
@@ -56,6 +57,51 @@ class BaseVectorDB(ABC):
         """删除向量"""
         pass
 
+    # ========== 批量操作 ==========
+    # 导入列表、重建索引等场景必须使用批量接口，避免逐条往返
+    # 默认实现逐条调用单条接口，支持批量 API 的实现应覆盖
+
+    async def upsert_many(
+        self,
+        ids: list[str],
+        matrix: list[list[float]],
+        metadatas: list[dict],
+    ) -> None:
+        """批量插入或更新向量（ids / matrix 行 / metadatas 一一对应）"""
+        for id, vector, metadata in zip(ids, matrix, metadatas):
+            await self.upsert(id, vector, metadata)
+
+    async def search_many(
+        self,
+        matrix: list[list[float]],
+        top_k: int = 10,
+        filter: Optional[dict] = None,
+    ) -> list[list[dict]]:
+        """
+        批量向量相似度搜索
+
+        Returns:
+            与查询矩阵逐行对应的结果列表，每项格式同 search()
+        """
+        return list(await asyncio.gather(*(self.search(vector, top_k, filter) for vector in matrix)))
+
+    async def delete_many(self, ids: list[str]) -> None:
+        """批量删除向量"""
+        for id in ids:
+            await self.delete(id)
+
+    # 是否支持读取已存储的向量（fetch_many），相似条目图依赖此能力
+    supports_fetch: bool = False
+
+    async def fetch_many(self, ids: list[str]) -> list[Optional[list[float]]]:
+        """
+        批量读取已存储的向量（supports_fetch 为 True 的实现应覆盖）
+
+        Returns:
+            与 ids 逐项对应的向量，不存在的 id 为 None
+        """
+        raise VectorDBError(f"{type(self).__name__} 不支持读取已存储的向量（fetch_many）")
+
 
 class ChromaVectorDB(BaseVectorDB):
     """
@@ -245,7 +291,20 @@ def create_vector_db() -> BaseVectorDB:
     """
     provider = settings.vector_db_provider.lower()
 
-    if provider == "chroma":
+    if provider == "local":
+        from .local_vector_db import LocalNumpyVectorDB
+
+        return LocalNumpyVectorDB(
+            persist_directory=settings.local_vector_db_directory,
+            index_type=settings.local_vector_db_index,
+            hnsw_m=settings.local_vector_db_hnsw_m,
+            hnsw_ef_construction=settings.local_vector_db_hnsw_ef_construction,
+            hnsw_ef_search=settings.local_vector_db_hnsw_ef_search,
+            quantization=settings.local_vector_db_quantization,
+            pq_subvectors=settings.local_vector_db_pq_subvectors,
+            rerank_factor=settings.local_vector_db_rerank_factor,
+        )
+    elif provider == "chroma":
         return ChromaVectorDB(
             persist_directory=settings.chroma_persist_directory,
         )